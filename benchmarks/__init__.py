@@ -0,0 +1 @@
+"""infractl benchmarks."""
@@ -0,0 +1,95 @@
+"""Benchmark submission throughput of `infractl.map()` for different concurrency limits.
+
+By default, the benchmark uses a simulated runner that sleeps for `--latency` seconds for each
+submission, which approximates a round trip to the runtime API. With `--program` the benchmark
+deploys the program to a real infrastructure and submits detached runs.
+
+Examples:
+    python -m benchmarks.map_throughput
+    python -m benchmarks.map_throughput --runs 200 --concurrency 1 8 32 --latency 0.1
+    python -m benchmarks.map_throughput --program flow.py --runtime kubernetes --runs 20
+"""
+
+import argparse
+import asyncio
+import time
+from typing import List, Optional
+
+import infractl
+import infractl.base
+
+
+class SimulatedRunner(infractl.base.Runnable):
+    """Runner that simulates submission latency."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    async def run(self, parameters=None, timeout=None, detach=False):
+        await asyncio.sleep(self.latency)
+
+
+def create_parser() -> argparse.ArgumentParser:
+    """Creates argument parser."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=100, help='Number of runs (default: 100)')
+    parser.add_argument(
+        '--concurrency',
+        type=int,
+        nargs='+',
+        default=[1, 2, 4, 8, 16, 32, 64],
+        help='Concurrency limits to measure',
+    )
+    parser.add_argument(
+        '--latency',
+        type=float,
+        default=0.05,
+        help='Simulated submission latency in seconds (default: 0.05)',
+    )
+    parser.add_argument('--program', help='Program to deploy instead of the simulated runner')
+    parser.add_argument('--runtime', default='prefect', help='Runtime kind (default: prefect)')
+    parser.add_argument('--address', help='Infrastructure address')
+    return parser
+
+
+async def deploy(args: argparse.Namespace) -> infractl.base.DeployedProgram:
+    """Returns a deployed program to benchmark."""
+    if not args.program:
+        return infractl.base.DeployedProgram(
+            program=infractl.program('simulated.py'),
+            runner=SimulatedRunner(args.latency),
+        )
+    infrastructure = infractl.infrastructure(address=args.address) if args.address else None
+    return await infractl.deploy(
+        infractl.program(args.program),
+        runtime=infractl.runtime(kind=args.runtime),
+        infrastructure=infrastructure,
+    )
+
+
+async def measure(program: infractl.base.DeployedProgram, runs: int, concurrency: int) -> float:
+    """Returns the number of submitted runs per second."""
+    start = time.perf_counter()
+    await infractl.map(program, [None] * runs, max_concurrency=concurrency, detach=True)
+    return runs / (time.perf_counter() - start)
+
+
+async def main_async(argv: Optional[List[str]] = None):
+    """Runs the benchmark and prints results."""
+    args = create_parser().parse_args(argv)
+    program = await deploy(args)
+    print(f'{"concurrency":>12} {"runs/s":>10} {"speedup":>8}')
+    baseline = None
+    for concurrency in args.concurrency:
+        throughput = await measure(program, args.runs, concurrency)
+        baseline = baseline or throughput
+        print(f'{concurrency:>12} {throughput:>10.1f} {throughput / baseline:>7.1f}x')
+
+
+def main():
+    """Entry point."""
+    asyncio.run(main_async())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+"""Benchmark the Kubernetes runtime bootstrap in a container.
+
+The benchmark prepares a deployment in a local `file://` store (a program, the engine and a bundle
+with runtime files) with a run manifest of `file://` URLs and runs the inline bootstrap in a fresh
+Python process, the same way as a container does. It reports the best wall time of the bootstrap
+and of a bare `python -c pass`, the difference is the bootstrap overhead before user code runs.
+With `--pip` it also measures `pip install s3cmd pydantic`, which containers used to run before
+downloading the program.
+
+Examples:
+    python -m benchmarks.pod_bootstrap
+    python -m benchmarks.pod_bootstrap --files 1000 --file-size 4096 --repeat 5
+    python -m benchmarks.pod_bootstrap --pip
+"""
+
+import argparse
+import json
+import os
+import pathlib
+import shutil
+import subprocess  # nosec B404
+import sys
+import tempfile
+import time
+from typing import List, Optional
+
+import fsspec
+
+import infractl.base
+import infractl.fs
+from infractl import bundle
+from infractl.plugins.kubernetes_runtime import bootstrap, engine
+
+PROGRAM = """
+def main():
+    return 'ok'
+"""
+
+
+def create_parser() -> argparse.ArgumentParser:
+    """Creates argument parser."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        '--files', type=int, default=100, help='Number of runtime files (default: 100)'
+    )
+    parser.add_argument(
+        '--file-size', type=int, default=1024, help='Runtime file size in bytes (default: 1024)'
+    )
+    parser.add_argument(
+        '--repeat', type=int, default=3, help='Runs per step, the best is reported (default: 3)'
+    )
+    parser.add_argument(
+        '--pip', action='store_true', help='Measure `pip install s3cmd pydantic` for comparison'
+    )
+    return parser
+
+
+def best_time(command: List[str], repeat: int, cwd: Optional[pathlib.Path] = None, env=None):
+    """Returns the best wall time of a command in seconds."""
+    best = None
+    for _ in range(repeat):
+        if cwd:
+            shutil.rmtree(cwd, ignore_errors=True)
+            cwd.mkdir()
+        start = time.perf_counter()
+        subprocess.run(command, cwd=cwd, env=env, check=True, capture_output=True)  # nosec B603
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best
+
+
+def prepare(path: pathlib.Path, files: int, file_size: int) -> List[str]:
+    """Prepares a deployment in a local store, returns the bootstrap arguments."""
+    code = path / 'store' / 'code'
+    data = path / 'store' / 'data'
+    code.mkdir(parents=True)
+    data.mkdir(parents=True)
+    (code / 'program.py').write_text(PROGRAM)
+    shutil.copy(engine.__file__, data / 'engine.py')
+    shutil.copy(bundle.__file__, data / 'bundle.py')
+    blobs = path / 'store' / 'blobs'
+
+    local = path / 'local'
+    local.mkdir()
+    for number in range(files):
+        (local / f'file{number}').write_bytes(os.urandom(file_size))
+    infractl.fs.upload_bundle(
+        [infractl.base.RuntimeFile(src=f'{local}/')],
+        fsspec.filesystem('file'),
+        str(data / bundle.INDEX_NAME),
+        str(blobs),
+    )
+    index = bundle.Bundle.loads((data / bundle.INDEX_NAME).read_bytes())
+    manifest = {
+        'code': {'program.py': f'file://{code}/program.py'},
+        'data': {name: f'file://{data}/{name}' for name in os.listdir(data)},
+        'blobs': {name: f'file://{blobs}/{name}' for name in index.blob_paths()},
+        'parameters': None,
+        'result': f'file://{path}/store/result.bin',
+        'wheelhouse': None,
+    }
+    (path / 'store' / 'manifest.json').write_text(json.dumps(manifest))
+    return [
+        '--manifest',
+        f'file://{path}/store/manifest.json',
+        '--',
+        'program.py',
+        '--entrypoint',
+        'main',
+    ]
+
+
+def main(argv: Optional[List[str]] = None):
+    """Runs the benchmark and prints results."""
+    args = create_parser().parse_args(argv)
+    with tempfile.TemporaryDirectory() as dirname:
+        path = pathlib.Path(dirname)
+        bootstrap_args = prepare(path, args.files, args.file_size)
+        env = os.environ.copy()
+        env.pop(bootstrap.MANIFEST_ENV, None)
+
+        python = best_time([sys.executable, '-c', 'pass'], args.repeat)
+        seconds = best_time(
+            [
+                sys.executable,
+                '-c',
+                pathlib.Path(bootstrap.__file__).read_text(encoding='utf-8'),
+                *bootstrap_args,
+            ],
+            args.repeat,
+            cwd=path / 'working',
+            env=env,
+        )
+        print(f'{"step":<32} {"seconds":>8}')
+        print(f'{"python -c pass":<32} {python:>8.3f}')
+        print(f'{f"bootstrap ({args.files} files)":<32} {seconds:>8.3f}')
+        print(f'{"bootstrap overhead":<32} {seconds - python:>8.3f}')
+
+        if args.pip:
+            target = path / 'pip'
+            pip = best_time(
+                [
+                    sys.executable,
+                    '-m',
+                    'pip',
+                    'install',
+                    '--target',
+                    str(target),
+                    's3cmd',
+                    'pydantic',
+                ],
+                args.repeat,
+            )
+            print(f'{"pip install s3cmd pydantic":<32} {pip:>8.3f}')
+
+
+if __name__ == '__main__':
+    main()
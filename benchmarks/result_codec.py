@@ -0,0 +1,112 @@
+"""Benchmark encoding and decoding of Kubernetes engine results.
+
+The benchmark writes a result with a large buffer and a list of records, the way a container does,
+and reads it back the way `KubernetesProgramRun.result()` does. It compares JSON with the binary
+container for each codec and compression, and reports the best time of each step and the size.
+NumPy arrays are used for the buffer if NumPy is installed, otherwise a `bytearray` pickled
+out-of-band.
+
+Examples:
+    python -m benchmarks.result_codec
+    python -m benchmarks.result_codec --size 100 --records 100000 --repeat 5
+"""
+
+import argparse
+import io
+import pathlib
+import pickle  # nosec B403
+import tempfile
+import time
+from typing import Any, Callable, List, Optional
+
+from infractl.plugins.kubernetes_runtime import engine
+
+
+class Buffer:
+    """Buffer pickled out-of-band, like a NumPy array."""
+
+    def __init__(self, data):
+        self.data = data
+
+    def __reduce_ex__(self, protocol):
+        return Buffer, (pickle.PickleBuffer(self.data),)
+
+
+def create_parser() -> argparse.ArgumentParser:
+    """Creates argument parser."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        '--size', type=int, default=50, help='Buffer size in megabytes (default: 50)'
+    )
+    parser.add_argument(
+        '--records', type=int, default=10000, help='Number of records (default: 10000)'
+    )
+    parser.add_argument(
+        '--repeat', type=int, default=3, help='Runs per step, the best is reported (default: 3)'
+    )
+    return parser
+
+
+def create_result(size: int, records: int) -> Any:
+    """Returns a result with a buffer of `size` megabytes and a list of records."""
+    try:
+        import numpy  # pylint: disable=import-outside-toplevel
+
+        buffer: Any = numpy.ones(size * 2**20 // 8)
+    except ImportError:
+        buffer = Buffer(bytearray(size * 2**20))
+    return {
+        'buffer': buffer,
+        'records': [{'id': index, 'name': f'record{index}'} for index in range(records)],
+    }
+
+
+def best_time(function: Callable[[], Any], repeat: int) -> float:
+    """Returns the best time of a function in seconds."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best
+
+
+def main(argv: Optional[List[str]] = None):
+    """Runs the benchmark and prints results."""
+    args = create_parser().parse_args(argv)
+    result = create_result(args.size, args.records)
+    print(f'{"format":<24} {"write":>8} {"read":>8} {"megabytes":>10}')
+
+    # JSON of the whole result in memory, the buffer is base64 encoded
+    buffer = result['buffer']
+    raw = bytes(buffer.data) if isinstance(buffer, Buffer) else buffer.tobytes()
+    json_result = {'buffer': raw, 'records': result['records']}
+    data = engine.dumps(json_result)
+    write = best_time(lambda: engine.dumps(json_result), args.repeat)
+    read = best_time(lambda: engine.loads(data), args.repeat)
+    print(f'{"json":<24} {write:>8.3f} {read:>8.3f} {len(data) / 2**20:>10.1f}')
+
+    with tempfile.TemporaryDirectory() as dirname:
+        path = pathlib.Path(dirname) / engine.RESULT_NAME
+        for codec, compression in (('pickle', None), ('pickle', 'zlib')):
+
+            def write_file(codec=codec, compression=compression):
+                with path.open('wb') as file:
+                    engine.write(result, file, codec=codec, compression=compression)
+
+            write = best_time(write_file, args.repeat)
+            read = best_time(lambda: engine.read_file(path), args.repeat)
+            size = path.stat().st_size
+            name = f'{codec}+{compression}' if compression else codec
+            print(f'{name:<24} {write:>8.3f} {read:>8.3f} {size / 2**20:>10.1f}')
+
+    # the container in memory, for comparison with the memory-mapped file
+    container = io.BytesIO()
+    engine.write(result, container)
+    read = best_time(lambda: engine.read(container.getbuffer()), args.repeat)
+    print(f'{"pickle (in memory)":<24} {"":>8} {read:>8.3f}')
+
+
+if __name__ == '__main__':
+    main()
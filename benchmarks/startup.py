@@ -0,0 +1,227 @@
+"""Benchmark import time and cold start of infractl.
+
+Each scenario runs several times in a fresh Python process with `-X importtime`. The benchmark
+reports the best wall time of the measured step, peak RSS of the process and, optionally, the
+slowest imports. Results can be saved as a baseline and compared with it later; the benchmark
+exits with code 1 if a scenario is slower or uses more memory than the baseline by more than
+`--threshold`, or if a scenario fails (and did not fail in the baseline).
+
+Examples:
+    python -m benchmarks.startup
+    python -m benchmarks.startup --scenarios import runtime-kubernetes --imports 10
+    python -m benchmarks.startup --save startup.json
+    python -m benchmarks.startup --baseline startup.json --threshold 0.2
+"""
+
+import argparse
+import json
+import pathlib
+import subprocess  # nosec B404
+import sys
+import tempfile
+import textwrap
+from typing import Dict, List, Optional, Tuple
+
+import pydantic
+
+SAMPLE_FLOW = """
+import prefect
+
+
+@prefect.flow
+def sample_flow(x: int = 1):
+    return x
+"""
+
+# Scenario name -> (setup code, measured code). `{flow}` is replaced with a sample flow path.
+SCENARIOS: Dict[str, Tuple[str, str]] = {
+    'import': ('', 'import infractl'),
+    'runtime-prefect': (
+        'import infractl, infractl.base',
+        'infractl.base.RegisteredClass.get('
+        'infractl.base.RuntimeImplementation, infractl.runtime(kind="prefect").kind)',
+    ),
+    'runtime-kubernetes': (
+        'import infractl, infractl.base',
+        'infractl.base.RegisteredClass.get('
+        'infractl.base.RuntimeImplementation, infractl.runtime(kind="kubernetes").kind)',
+    ),
+    'runtime-ssh': (
+        'import infractl, infractl.base',
+        'infractl.base.RegisteredClass.get('
+        'infractl.base.RuntimeImplementation, infractl.runtime(kind="ssh").kind)',
+    ),
+    'load-prefect-program': (
+        'import infractl.plugins.prefect_runtime.program as prefect_program',
+        'prefect_program.load_program({flow!r})',
+    ),
+    'load-kubernetes-program': (
+        'import infractl; import infractl.plugins.kubernetes_runtime.program as k8s_program',
+        'k8s_program.load(infractl.program({flow!r}))',
+    ),
+    'get-logger': (
+        'import infractl.logging',
+        'infractl.logging.get_logger("benchmark")',
+    ),
+}
+
+# Number of slowest imports to keep in results
+MAX_IMPORTS = 50
+
+# Code to run in a subprocess, prints the measurement as JSON to stdout.
+RUNNER = """
+import json, resource, sys, time
+{setup}
+start = time.perf_counter()
+{code}
+seconds = time.perf_counter() - start
+# ru_maxrss is in bytes on macOS, in kilobytes on Linux
+peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+peak_rss *= 1 if sys.platform == 'darwin' else 1024
+json.dump({{'seconds': seconds, 'peak_rss': peak_rss}}, sys.stdout)
+"""
+
+
+class ImportTime(pydantic.BaseModel):
+    """Import time of a single module, from `-X importtime` output."""
+
+    module: str
+    self_us: int
+    cumulative_us: int
+
+
+class Result(pydantic.BaseModel):
+    """Scenario result."""
+
+    seconds: Optional[float] = None
+    peak_rss: Optional[int] = None
+    imports: List[ImportTime] = []
+    error: Optional[str] = None
+
+
+def parse_importtime(output: str) -> List[ImportTime]:
+    """Parses `-X importtime` output, returns modules sorted by cumulative import time."""
+    imports = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, module = line[len('import time:') :].split('|', 2)
+        imports.append(
+            ImportTime(
+                module=module.strip(), self_us=int(self_us), cumulative_us=int(cumulative_us)
+            )
+        )
+    return sorted(imports, key=lambda item: item.cumulative_us, reverse=True)[:MAX_IMPORTS]
+
+
+def run_scenario(name: str, flow: str, repeat: int) -> Result:
+    """Runs a scenario `repeat` times in fresh processes, returns the best result."""
+    setup, code = SCENARIOS[name]
+    script = RUNNER.format(setup=setup, code=code.format(flow=flow))
+    best: Optional[Result] = None
+    for _ in range(repeat):
+        process = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', textwrap.dedent(script)],
+            capture_output=True,
+            text=True,
+            check=False,
+        )
+        if process.returncode != 0:
+            error = process.stderr.strip().splitlines()[-1] if process.stderr.strip() else ''
+            return Result(error=error or f'exit code {process.returncode}')
+        result = Result(**json.loads(process.stdout), imports=parse_importtime(process.stderr))
+        if best is None or result.seconds < best.seconds:
+            best = result
+    return best
+
+
+def check_regressions(
+    results: Dict[str, Result], baseline: Dict[str, Result], threshold: float
+) -> List[str]:
+    """Returns a list of regressions compared to the baseline.
+
+    A failed scenario is a regression, unless it also failed in the baseline (for example, an
+    optional dependency is not installed).
+    """
+    regressions = []
+    for name, result in results.items():
+        expected = baseline.get(name)
+        if result.error:
+            if expected is None or not expected.error:
+                regressions.append(f'{name}: {result.error}')
+            continue
+        if expected is None or expected.error:
+            continue
+        for metric in ('seconds', 'peak_rss'):
+            value, expected_value = getattr(result, metric), getattr(expected, metric)
+            if expected_value and value > expected_value * (1 + threshold):
+                regressions.append(
+                    f'{name}: {metric} {value:.3f} > {expected_value:.3f} * {1 + threshold:.2f}'
+                )
+    return regressions
+
+
+def create_parser() -> argparse.ArgumentParser:
+    """Creates argument parser."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        '--scenarios',
+        nargs='+',
+        choices=list(SCENARIOS),
+        default=list(SCENARIOS),
+        help='Scenarios to run (default: all)',
+    )
+    parser.add_argument(
+        '--repeat', type=int, default=3, help='Runs per scenario, the best is reported (default: 3)'
+    )
+    parser.add_argument(
+        '--imports', type=int, default=0, help='Number of slowest imports to show per scenario'
+    )
+    parser.add_argument('--save', type=pathlib.Path, help='Save results as JSON')
+    parser.add_argument('--baseline', type=pathlib.Path, help='Compare results with a baseline')
+    parser.add_argument(
+        '--threshold',
+        type=float,
+        default=0.25,
+        help='Allowed relative regression compared to the baseline (default: 0.25)',
+    )
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Runs the benchmark and prints results, returns exit code."""
+    args = create_parser().parse_args(argv)
+
+    results: Dict[str, Result] = {}
+    with tempfile.TemporaryDirectory() as dirname:
+        flow = pathlib.Path(dirname) / 'sample_flow.py'
+        flow.write_text(SAMPLE_FLOW)
+        print(f'{"scenario":<24} {"seconds":>8} {"peak RSS, MiB":>14}')
+        for name in args.scenarios:
+            result = run_scenario(name, str(flow), args.repeat)
+            results[name] = result
+            if result.error:
+                print(f'{name:<24} {"error":>8} {"":>14} {result.error}')
+                continue
+            print(f'{name:<24} {result.seconds:>8.3f} {result.peak_rss / 2**20:>14.1f}')
+            for item in result.imports[: args.imports]:
+                print(f'    {item.cumulative_us / 1000:>8.1f} ms  {item.module}')
+
+    if args.save:
+        args.save.write_text(
+            json.dumps({name: result.model_dump() for name, result in results.items()}, indent=2)
+        )
+
+    baseline: Dict[str, Result] = {}
+    if args.baseline:
+        baseline = {
+            name: Result(**value) for name, value in json.loads(args.baseline.read_text()).items()
+        }
+    regressions = check_regressions(results, baseline, args.threshold)
+    for regression in regressions:
+        print(f'REGRESSION {regression}', file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
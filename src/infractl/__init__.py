@@ -2,6 +2,7 @@
 
 from infractl.api.deploy import deploy
 from infractl.api.infrastructure import infrastructure
+from infractl.api.map import map, map_as_completed  # pylint: disable=redefined-builtin
 from infractl.api.program import program
 from infractl.api.run import run
 from infractl.api.runtime import runtime
@@ -12,4 +13,6 @@ __all__ = [
     'program',
     'deploy',
     'run',
+    'map',
+    'map_as_completed',
 ]
@@ -8,6 +8,7 @@ from typing import Optional
 import infractl.api.infrastructure
 import infractl.api.runtime
 import infractl.base
+import infractl.cache
 
 
 async def deploy(
@@ -15,6 +16,7 @@ async def deploy(
     runtime: Optional[infractl.base.Runtime] = None,
     infrastructure: Optional[infractl.base.Infrastructure] = None,
     timeout: Optional[float] = None,
+    cache: Optional[bool] = None,
     **kwargs,
 ) -> infractl.base.DeployedProgram:
     """Deploys a program.
@@ -24,6 +26,10 @@ async def deploy(
         runtime: an optional program runtime to use for deployment.
         infrastructure: an optional infrastructure to use for deployment.
         timeout: an optional timeout to use for deployment.
+        cache: `True` to return the existing deployed program if the program, runtime and
+            infrastructure are not changed since the last deployment, `False` to always deploy;
+            defaults to the setting `deployment_cache.enabled` (off by default), see
+            `infractl.cache`.
         kwargs: other parameters for deployment.
     """
     if not isinstance(program, infractl.base.Program):
@@ -40,4 +46,19 @@ async def deploy(
         runtime, infrastructure_implementation
     )
 
-    return await asyncio.wait_for(runtime_implementation.deploy(program, **kwargs), timeout=timeout)
+    if cache is None:
+        cache = infractl.cache.is_enabled()
+    fingerprint = (
+        infractl.cache.fingerprint(program, runtime_implementation, **kwargs) if cache else None
+    )
+    if fingerprint:
+        deployed_program = infractl.cache.default_cache().get(fingerprint[0])
+        if deployed_program:
+            return deployed_program
+
+    deployed_program = await asyncio.wait_for(
+        runtime_implementation.deploy(program, **kwargs), timeout=timeout
+    )
+    if fingerprint:
+        infractl.cache.default_cache().put(*fingerprint, deployed_program)
+    return deployed_program
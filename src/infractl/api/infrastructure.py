@@ -9,17 +9,9 @@ def default_infrastructure() -> infractl.base.Infrastructure:
 
 
 def infrastructure(*args, kind: str = 'ICL', **kwargs) -> infractl.base.Infrastructure:
-    if kind == 'ICL':
-        # import required plugin
-        # pylint: disable=import-outside-toplevel, unused-import
-        from infractl.plugins import icl_infrastructure  # noqa
-
-        return infractl.base.Infrastructure(*args, kind=kind, **kwargs)
-    elif kind == 'ssh':
-        # import required plugin
-        # pylint: disable=import-outside-toplevel, unused-import
-        from infractl.plugins import ssh  # noqa
-
-        return infractl.base.Infrastructure(*args, kind=kind, **kwargs)
-
-    raise NotImplementedError(f'Infrastructure {kind} is not implemented')
+    # the infrastructure implementation is imported on deployment
+    if not infractl.base.RegisteredClass.is_available(
+        infractl.base.InfrastructureImplementation, kind
+    ):
+        raise NotImplementedError(f'Infrastructure {kind} is not implemented')
+    return infractl.base.Infrastructure(*args, kind=kind, **kwargs)
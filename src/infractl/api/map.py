@@ -0,0 +1,126 @@
+"""ICL map (fan-out)."""
+
+from __future__ import annotations
+
+import asyncio
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Union
+
+import infractl.base
+from infractl.api.deploy import deploy
+
+Parameters = Union[Dict[str, Any], List[str], None]
+
+
+async def _deploy(
+    program: Union[infractl.base.Program, infractl.base.DeployedProgram],
+    runtime: Optional[infractl.base.Runtime],
+    infrastructure: Optional[infractl.base.Infrastructure],
+    timeout: Optional[float],
+    **kwargs,
+) -> infractl.base.DeployedProgram:
+    """Deploys a program, unless it is already deployed."""
+    if isinstance(program, infractl.base.DeployedProgram):
+        return program
+    return await deploy(
+        program=program,
+        runtime=runtime,
+        infrastructure=infrastructure,
+        timeout=timeout,
+        **kwargs,
+    )
+
+
+def _start_runs(
+    deployed_program: infractl.base.DeployedProgram,
+    parameters: Iterable[Parameters],
+    max_concurrency: int,
+    timeout: Optional[float],
+    detach: bool,
+) -> List[asyncio.Future]:
+    """Starts a task for each set of parameters, at most `max_concurrency` of them run at once."""
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run(item: Parameters) -> infractl.base.ProgramRun:
+        async with semaphore:
+            return await deployed_program.run(parameters=item, timeout=timeout, detach=detach)
+
+    return [asyncio.ensure_future(run(item)) for item in parameters]
+
+
+# pylint: disable=redefined-builtin
+async def map(
+    program: Union[infractl.base.Program, infractl.base.DeployedProgram],
+    parameters: Iterable[Parameters],
+    max_concurrency: int = 10,
+    runtime: Optional[infractl.base.Runtime] = None,
+    infrastructure: Optional[infractl.base.Infrastructure] = None,
+    timeout: Optional[float] = None,
+    detach: bool = False,
+    **kwargs,
+) -> List[infractl.base.ProgramRun]:
+    """Deploys a program once and runs it for each set of parameters.
+
+    Returns program runs in the order of `parameters`, see `map_as_completed` to get program runs
+    as they complete.
+
+    Args:
+        program: a program to deploy, or an already deployed program.
+        parameters: an iterable of parameters, the program runs once for each item. Each item is a
+            dictionary of named arguments if a program's entry point is a function, a list of
+            arguments otherwise.
+        max_concurrency: maximum number of runs in flight. With `detach=False` this is the maximum
+            number of programs running at the same time, with `detach=True` this is the maximum
+            number of concurrent submissions.
+        runtime: an optional program runtime to use for deployment.
+        infrastructure: an optional infrastructure to use for deployment.
+        timeout: an optional timeout to use for deployment and for each run.
+        detach: `False` (default) to wait for each program completion, `True` to start the
+            programs and detach from them.
+        kwargs: other parameters for deployment.
+
+    Examples:
+        runs = await infractl.map(infractl.program('my_flow.py'), [{'x': 1}, {'x': 2}])
+    """
+    if max_concurrency < 1:
+        raise ValueError(f'{max_concurrency=} must be positive')
+
+    deployed_program = await _deploy(program, runtime, infrastructure, timeout, **kwargs)
+    tasks = _start_runs(deployed_program, parameters, max_concurrency, timeout, detach)
+    try:
+        return list(await asyncio.gather(*tasks))
+    finally:
+        # cancel the remaining runs if one of them failed
+        for task in tasks:
+            task.cancel()
+
+
+async def map_as_completed(
+    program: Union[infractl.base.Program, infractl.base.DeployedProgram],
+    parameters: Iterable[Parameters],
+    max_concurrency: int = 10,
+    runtime: Optional[infractl.base.Runtime] = None,
+    infrastructure: Optional[infractl.base.Infrastructure] = None,
+    timeout: Optional[float] = None,
+    detach: bool = False,
+    **kwargs,
+) -> AsyncIterator[infractl.base.ProgramRun]:
+    """Deploys a program once, runs it for each set of parameters and yields runs as they complete.
+
+    Arguments are the same as for `map`. Runs that are not completed yet are cancelled if one of
+    them fails or the iteration stops early.
+
+    Examples:
+        async for run in infractl.map_as_completed(program, [{'x': 1}, {'x': 2}]):
+            print(run)
+    """
+    if max_concurrency < 1:
+        raise ValueError(f'{max_concurrency=} must be positive')
+
+    deployed_program = await _deploy(program, runtime, infrastructure, timeout, **kwargs)
+    tasks = _start_runs(deployed_program, parameters, max_concurrency, timeout, detach)
+    try:
+        for task in asyncio.as_completed(tasks):
+            yield await task
+    finally:
+        for task in tasks:
+            task.cancel()
@@ -4,14 +4,28 @@ from __future__ import annotations
 
 from typing import TYPE_CHECKING, Any, Callable, Dict
 
+from infractl.base.address_settings import (
+    AddressSettings,
+    AddressSettingsError,
+    get_address_settings,
+    invalidate_address_settings,
+)
 from infractl.base.infrastructure import (
     Infrastructure,
     InfrastructureImplementation,
     get_infrastructure_implementation,
 )
-from infractl.base.program import DeployedProgram, Program, ProgramRun, Runnable
+from infractl.base.program import (
+    DeployedProgram,
+    Program,
+    ProgramRun,
+    ProgramRunGroup,
+    Runnable,
+    group,
+)
 from infractl.base.registry import RegisteredClass
 from infractl.base.runtime import (
+    ImageStrategy,
     Runtime,
     RuntimeDependencies,
     RuntimeFile,
@@ -47,12 +61,19 @@ def __getattr__(name) -> Any:
 
 
 __all__ = [
+    'AddressSettings',
+    'AddressSettingsError',
+    'get_address_settings',
+    'invalidate_address_settings',
     'DeployedProgram',
     'Infrastructure',
     'InfrastructureImplementation',
     'get_infrastructure_implementation',
+    'group',
+    'ImageStrategy',
     'Program',
     'ProgramRun',
+    'ProgramRunGroup',
     'RegisteredClass',
     'Runnable',
     'Runtime',
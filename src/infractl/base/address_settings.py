@@ -0,0 +1,138 @@
+"""Settings for infrastructure addresses.
+
+Settings for an infrastructure address are stored in `infractl.base.SETTINGS` under the address
+key, for example:
+
+    localtest.me:
+      prefect_image: pbchekin/icl-prefect:latest
+      prefect_shared_volume_mount: /data
+
+`get_address_settings()` validates them once and returns an immutable snapshot shared by runtimes
+and builders, unknown keys are logged and ignored. Call `invalidate_address_settings()` after
+changing `infractl.base.SETTINGS` in runtime.
+"""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any, Dict, Optional
+
+import pydantic
+
+from infractl import defaults
+from infractl.logging import get_logger
+
+if TYPE_CHECKING:
+    import dynaconf
+
+logger = get_logger()
+
+# address -> settings snapshot, for the global settings only
+_SNAPSHOTS: Dict[str, AddressSettings] = {}
+# global settings object the snapshots are created from
+_SNAPSHOTS_SOURCE: Optional[dynaconf.Dynaconf] = None
+
+
+class AddressSettingsError(ValueError):
+    """Invalid settings for an infrastructure address."""
+
+
+class AddressSettings(pydantic.BaseModel):
+    """Settings for an infrastructure address."""
+
+    model_config = pydantic.ConfigDict(frozen=True, extra='ignore')
+
+    address: str
+    """Infrastructure address."""
+
+    prefect_image: Optional[str] = defaults.PREFECT_IMAGE
+    """Docker image for Prefect jobs."""
+
+    prefect_queue: str = 'prod'
+    """Prefect work queue."""
+
+    prefect_storage_basepath: str = 's3://prefect'
+    """Base path for Prefect storage blocks."""
+
+    prefect_storage_fsspec: Dict[str, Any] = {}
+    """fsspec settings for Prefect remote storage blocks."""
+
+    prefect_shared_volume_mount: Optional[str] = None
+    """Mount path for the shared volume in Prefect jobs, None to not mount the shared volume."""
+
+    registry_internal_endpoint: str = (
+        'http://docker-registry.docker-registry.svc.cluster.local:5000'
+    )
+    """Docker registry endpoint for pods."""
+
+    registry_external_endpoint: Optional[str] = None
+    """Docker registry endpoint outside of the cluster, default is `http://registry.{address}`."""
+
+    registry_node_endpoint: str = 'localhost:5000'
+    """Docker registry for Kubernetes nodes, used in references to images built by infractl."""
+
+    @classmethod
+    def load(cls, address: str, settings: dynaconf.Dynaconf) -> AddressSettings:
+        """Loads and validates settings for the address."""
+        values = settings.get(address, None) if address else None
+        if values is None:
+            values = {}
+        elif not isinstance(values, dict):
+            raise AddressSettingsError(f'Settings for address "{address}" must be a mapping')
+        # environment variables could set keys in upper case
+        values = {key.lower(): _to_dict(value) for key, value in values.items()}
+        unknown = sorted(set(values) - set(cls.model_fields))
+        if unknown:
+            logger.warning(
+                'Ignoring unknown settings for address "%s": %s', address, ', '.join(unknown)
+            )
+        try:
+            return cls(address=address, **values)
+        except pydantic.ValidationError as error:
+            raise AddressSettingsError(
+                f'Invalid settings for address "{address}": {error}'
+            ) from error
+
+
+def _to_dict(value: Any) -> Any:
+    """Converts dynaconf boxes to plain dictionaries and lists."""
+    if isinstance(value, dict):
+        return {key: _to_dict(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_to_dict(item) for item in value]
+    return value
+
+
+def get_address_settings(
+    address: str, settings: Optional[dynaconf.Dynaconf] = None
+) -> AddressSettings:
+    """Returns settings for the address.
+
+    Args:
+        address: infrastructure address.
+        settings: custom settings to use instead of global `infractl.base.SETTINGS`, settings
+            loaded from custom settings are not cached.
+    """
+    if settings is not None:
+        return AddressSettings.load(address, settings)
+
+    global _SNAPSHOTS_SOURCE
+    # pylint: disable=import-outside-toplevel
+    import infractl.base
+
+    if _SNAPSHOTS_SOURCE is not infractl.base.SETTINGS:
+        # global settings are replaced
+        _SNAPSHOTS.clear()
+        _SNAPSHOTS_SOURCE = infractl.base.SETTINGS
+    snapshot = _SNAPSHOTS.get(address)
+    if snapshot is None:
+        snapshot = AddressSettings.load(address, _SNAPSHOTS_SOURCE)
+        _SNAPSHOTS[address] = snapshot
+    return snapshot
+
+
+def invalidate_address_settings(address: Optional[str] = None) -> None:
+    """Drops cached settings for the address, or for all addresses if address is None."""
+    if address is None:
+        _SNAPSHOTS.clear()
+    else:
+        _SNAPSHOTS.pop(address, None)
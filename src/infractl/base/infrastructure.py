@@ -6,7 +6,7 @@ from typing import Optional, Tuple, Union
 
 import pydantic
 
-from infractl.base import registry
+from infractl.base import address_settings, registry
 
 
 class Infrastructure(pydantic.BaseModel, extra='allow'):
@@ -34,8 +34,19 @@ class Infrastructure(pydantic.BaseModel, extra='allow'):
         return gpus
 
 
-class InfrastructureImplementation(metaclass=registry.RegisteredClass):
-    """Infrastructure implementation (for internal usage)."""
+class InfrastructureImplementation(
+    metaclass=registry.RegisteredClass,
+    entry_point_group='infractl.infrastructures',
+    plugins={
+        'ICL': 'infractl.plugins.icl_infrastructure:IclInfrastructureImplementation',
+        'ssh': 'infractl.plugins.ssh:SshInfrastructureImplementation',
+    },
+):
+    """Infrastructure implementation (for internal usage).
+
+    Infrastructure implementations are loaded on the first use, other packages can provide
+    infrastructure implementations with entry points in group `infractl.infrastructures`.
+    """
 
     def __init__(
         self,
@@ -47,6 +58,11 @@ class InfrastructureImplementation(metaclass=registry.RegisteredClass):
     def address(self) -> str:
         return self.infrastructure.address
 
+    @property
+    def address_settings(self) -> address_settings.AddressSettings:
+        """Returns settings for this infrastructure address."""
+        return address_settings.get_address_settings(self.address, getattr(self, '_settings', None))
+
 
 def get_infrastructure_implementation(
     infrastructure: Infrastructure,
@@ -3,7 +3,21 @@
 from __future__ import annotations
 
 import abc
-from typing import Any, Dict, List, Optional, Union
+import asyncio
+import contextlib
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, List, Optional, Type, Union
+
+# The first poll interval for adaptive polling, it grows up to `poll_interval`.
+MIN_POLL_INTERVAL = 0.1
+POLL_BACKOFF_FACTOR = 1.5
+
+
+def poll_intervals(poll_interval: float) -> Iterator[float]:
+    """Yields poll intervals growing from MIN_POLL_INTERVAL up to `poll_interval`."""
+    interval = min(MIN_POLL_INTERVAL, poll_interval)
+    while True:
+        yield interval
+        interval = min(interval * POLL_BACKOFF_FACTOR, poll_interval)
 
 
 class ProgramRun:
@@ -53,6 +67,18 @@ class ProgramRun:
     async def wait(self) -> None:
         """Wait for this program."""
 
+    async def cancel(self) -> None:
+        """Cancels this program run."""
+        raise NotImplementedError(f'{type(self).__name__} cannot be cancelled')
+
+    async def update(self) -> None:
+        """Updates the program state."""
+
+    @classmethod
+    def group_class(cls) -> Type[ProgramRunGroup]:
+        """Returns a class to group runs of this class, see `group()`."""
+        return ProgramRunGroup
+
     @abc.abstractmethod
     async def result(self) -> Any:
         """Returns program result."""
@@ -70,6 +96,123 @@ class ProgramRun:
         """
 
 
+class ProgramRunGroup:
+    """A group of program runs.
+
+    Updates the state of all runs in the group at once. Runtime-specific groups update the state
+    with a single bulk request instead of a request per program run.
+    """
+
+    runs: List[ProgramRun]
+    poll_interval: float
+
+    def __init__(self, runs: Iterable[ProgramRun], poll_interval: float = 5):
+        """Creates a group of program runs.
+
+        Args:
+            runs: program runs.
+            poll_interval: maximum time in seconds between state updates while waiting.
+        """
+        self.runs = list(runs)
+        self.poll_interval = poll_interval
+
+    def __len__(self) -> int:
+        return len(self.runs)
+
+    def __iter__(self) -> Iterator[ProgramRun]:
+        return iter(self.runs)
+
+    def __repr__(self) -> str:
+        """Returns a string representation.
+
+        Note that JupyterLab uses __repr__ instead of __str__.
+        """
+        return f'{type(self).__name__}({len(self.pending())} of {len(self.runs)} pending)'
+
+    def pending(self) -> List[ProgramRun]:
+        """Returns program runs which are not in the final state."""
+        return [run for run in self.runs if not run.is_final()]
+
+    async def refresh(self, runs: Optional[List[ProgramRun]] = None) -> None:
+        """Updates the state of program runs.
+
+        Args:
+            runs: program runs from this group to update, by default the pending ones.
+        """
+        runs = self.pending() if runs is None else runs
+        await asyncio.gather(*(run.update() for run in runs))
+
+    async def as_completed(self) -> AsyncIterator[ProgramRun]:
+        """Yields program runs as they reach the final state."""
+        pending = []
+        for run in self.runs:
+            if run.is_final():
+                yield run
+            else:
+                pending.append(run)
+
+        for interval in poll_intervals(self.poll_interval):
+            if not pending:
+                return
+            await asyncio.sleep(interval)
+            await self.refresh(pending)
+            still_pending = []
+            for run in pending:
+                if run.is_final():
+                    yield run
+                else:
+                    still_pending.append(run)
+            pending = still_pending
+
+    async def wait_all(self, timeout: Optional[float] = None) -> List[ProgramRun]:
+        """Waits until all program runs reach the final state.
+
+        Args:
+            timeout: timeout in seconds, `None` (default) to wait forever.
+
+        Returns:
+            All program runs.
+        """
+
+        async def wait():
+            async with contextlib.aclosing(self.as_completed()) as runs:
+                async for _ in runs:
+                    pass
+
+        await asyncio.wait_for(wait(), timeout=timeout)
+        return self.runs
+
+    async def wait_any(self, timeout: Optional[float] = None) -> ProgramRun:
+        """Waits until any program run reaches the final state.
+
+        Args:
+            timeout: timeout in seconds, `None` (default) to wait forever.
+
+        Returns:
+            The first program run in the final state.
+        """
+
+        async def wait():
+            async with contextlib.aclosing(self.as_completed()) as runs:
+                async for run in runs:
+                    return run
+            raise ValueError('Cannot wait for an empty group')
+
+        return await asyncio.wait_for(wait(), timeout=timeout)
+
+
+def group(runs: Iterable[ProgramRun], poll_interval: float = 5) -> ProgramRunGroup:
+    """Returns a group of program runs.
+
+    Runs of the same runtime are grouped with a runtime-specific group class, which updates the
+    state of all runs with a single request.
+    """
+    runs = list(runs)
+    group_classes = {type(run).group_class() for run in runs}
+    group_class = group_classes.pop() if len(group_classes) == 1 else ProgramRunGroup
+    return group_class(runs, poll_interval=poll_interval)
+
+
 class Program:
     """Program.
 
@@ -85,6 +228,9 @@ class Program:
 class Runnable:
     """Runnable."""
 
+    parallel: bool = False
+    """True if `run` supports sharded runs with `parallelism`."""
+
     async def run(
         self,
         parameters: Union[Dict[str, Any], List[str], None] = None,
@@ -93,6 +239,8 @@ class Runnable:
     ) -> ProgramRun:
         """Runs this runnable.
 
+        Runnables with `parallel` set to True also accept `parallelism`, see `DeployedProgram.run`.
+
         Args:
             parameters: a dictionary of named arguments if a program's entry point is a function,
                 a list of arguments otherwise.
@@ -118,6 +266,26 @@ class DeployedProgram(Runnable):
         parameters: Union[Dict[str, Any], List[str], None] = None,
         timeout: Optional[float] = None,
         detach: bool = False,
+        parallelism: Optional[int] = None,
     ) -> ProgramRun:
-        """Runs Program."""
-        return await self.runner.run(parameters=parameters, timeout=timeout, detach=detach)
+        """Runs Program.
+
+        Args:
+            parameters: a dictionary of named arguments if a program's entry point is a function,
+                a list of arguments otherwise. With `parallelism`, a list of such parameters, one
+                per shard.
+            timeout: timeout in seconds to wait for a program completion, `None` (default) to wait
+                forever.
+            detach: `False` (default) to wait for a program completion, `True` to start the program
+                and detach from it.
+            parallelism: maximum number of shards running at once, `None` (default) for a single
+                run. The program runs once for each item of `parameters` and the program run
+                aggregates the state and results of all shards.
+        """
+        if parallelism is None:
+            return await self.runner.run(parameters=parameters, timeout=timeout, detach=detach)
+        if not getattr(self.runner, 'parallel', False):
+            raise NotImplementedError(f'{type(self.runner).__name__} does not support parallelism')
+        return await self.runner.run(
+            parameters=parameters, timeout=timeout, detach=detach, parallelism=parallelism
+        )
@@ -1,5 +1,7 @@
 """Register and discover classes in runtime."""
 
+import importlib
+import importlib.metadata
 from typing import Any, Dict, Optional, Tuple, Type
 
 
@@ -50,6 +52,27 @@ class RegisteredClass(type):
     class. You can override this with ``registration_name='Foo'``.
 
 
+    Subclasses can also be discovered lazily, so a module with a subclass is imported only when the
+    subclass is looked up for the first time. The root class declares a package entry point group
+    and, optionally, a table of built-in plugins::
+
+        class AbstractWorker(
+            metaclass=RegisteredClass,
+            entry_point_group='myapp.workers',
+            plugins={'real': 'myapp.workers.real:RealWorker'},
+        ):
+            ...
+
+    Then ``RegisteredClass.get(AbstractWorker, 'real')`` imports ``myapp.workers.real`` if
+    ``real`` is not registered yet. Other packages provide subclasses with entry points, for
+    example in ``pyproject.toml``::
+
+        [project.entry-points."myapp.workers"]
+        remote = "otherapp.workers:RemoteWorker"
+
+    A loaded subclass is registered under the entry point name, unless it is already registered
+    under that name. Entry points take precedence over built-in plugins.
+
     MYPY WARNING: There are some bugs in the way mypy handles dynamic type declarations. As a
     result, if you use any of the class methods (rather than ``RegistrationClass.*``) or if you
     pass any arguments like `register` or `registration_name`, you have to mark the line as
@@ -59,6 +82,8 @@ class RegisteredClass(type):
     # Type signature to make mypy happy: All types that use this as a metaclass will have this
     # as a class variable.
     _registry: Dict[str, 'RegisteredClass']
+    _entry_point_group: Optional[str]
+    _plugins: Dict[str, str]
 
     @staticmethod
     def get(superclass: 'RegisteredClass', name: str) -> 'RegisteredClass':
@@ -69,11 +94,47 @@ class RegisteredClass(type):
           name: The name under which a subclass was registered -- usually the name of the class,
             unless you've set registration_name in its class declaration.
         """
+        if name not in superclass._registry:
+            RegisteredClass._load_plugin(superclass, name)
         if name not in superclass._registry:
             raise KeyError(f'No subclass "{name}" of "{superclass.__name__}" has been registered.')
         result = superclass._registry[name]
         return result
 
+    @staticmethod
+    def is_available(superclass: 'RegisteredClass', name: str) -> bool:
+        """Returns True if a named subclass is registered or can be loaded, without loading it."""
+        return (
+            name in superclass._registry
+            or RegisteredClass._find_plugin(superclass, name) is not None
+        )
+
+    @staticmethod
+    def _find_plugin(superclass: 'RegisteredClass', name: str) -> Optional[str]:
+        """Returns an object reference ("module:attribute") for a named subclass or None."""
+        group = getattr(superclass, '_entry_point_group', None)
+        if group:
+            for entry_point in importlib.metadata.entry_points(group=group, name=name):
+                return entry_point.value
+        return getattr(superclass, '_plugins', {}).get(name)
+
+    @staticmethod
+    def _load_plugin(superclass: 'RegisteredClass', name: str) -> None:
+        """Imports a named subclass, which registers it."""
+        reference = RegisteredClass._find_plugin(superclass, name)
+        if reference is None:
+            return
+        module_name, _, attribute = reference.partition(':')
+        value: Any = importlib.import_module(module_name)
+        for part in filter(None, attribute.split('.')):
+            value = getattr(value, part)
+        if (
+            name not in superclass._registry
+            and isinstance(value, type)
+            and issubclass(value, superclass)  # type: ignore
+        ):
+            superclass._registry[name] = value
+
     @staticmethod
     def subclasses(superclass: 'RegisteredClass') -> Dict[str, 'RegisteredClass']:
         """Return all the subclasses of a given registered class."""
@@ -96,10 +157,14 @@ class RegisteredClass(type):
         namespace: Dict[str, Any],
         register: bool = True,
         registration_name: Optional[str] = None,
+        entry_point_group: Optional[str] = None,
+        plugins: Optional[Dict[str, str]] = None,
     ) -> Any:
         # This function gets called when a new registered class (ie one whose metaclass is
         # RegisteredClass) is declared. We set up its registry and its subclass initializer.
         class_ = type(name, bases, namespace)
+        setattr(class_, '_entry_point_group', entry_point_group)
+        setattr(class_, '_plugins', dict(plugins or {}))
 
         def init_subclass(
             cls: type, register: bool = True, registration_name: Optional[str] = None
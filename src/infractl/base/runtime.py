@@ -3,8 +3,9 @@
 from __future__ import annotations
 
 import abc
+import enum
 import os
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Union
 
 import pydantic
 
@@ -12,6 +13,19 @@ import infractl.base.infrastructure
 from infractl.base import registry
 
 
+class ImageStrategy(str, enum.Enum):
+    """How runtime dependencies and files get into the runtime image."""
+
+    INSTALL = 'install'
+    """Install dependencies and fetch files when a container starts (default)."""
+
+    BAKE = 'bake'
+    """Build a derived image with dependencies, see `infractl.docker.bake`."""
+
+    BAKE_FILES = 'bake-files'
+    """Build a derived image with dependencies and local files, see `infractl.docker.bake`."""
+
+
 class RuntimeDependencies(pydantic.BaseModel):
     """Runtime dependencies.
 
@@ -32,7 +46,7 @@ class RuntimeFile(pydantic.BaseModel):
     Additional files that must exist in the runtime.
     """
 
-    # TODO: support for different schemas, such as 'zip', 's3', and so on
+    # TODO: support for archives, such as 'zip'
     src: Optional[str] = pydantic.Field(
         default=None,
         title='File source',
@@ -40,6 +54,9 @@ class RuntimeFile(pydantic.BaseModel):
             'Can be one of: '
             '1. absolute path '
             '2. relative path to the current working directory '
+            '3. s3://, http:// or https:// URI of a file, downloaded in runtime '
+            '4. pvc://<claim>/<path> of a file or a directory on a persistent volume claim, '
+            'mounted in runtime'
         ),
     )
 
@@ -49,6 +66,24 @@ class RuntimeFile(pydantic.BaseModel):
         description='Default destination is the runtime current directory',
     )
 
+    ignore: Optional[List[str]] = pydantic.Field(
+        default=None,
+        title='Ignore patterns',
+        description=(
+            'Gitignore-style patterns of files to skip if the source is a directory, '
+            'default is `infractl.fs.RUNTIME_IGNORE_PATTERNS`'
+        ),
+    )
+
+    ignore_files: Optional[List[str]] = pydantic.Field(
+        default=None,
+        title='Ignore files',
+        description=(
+            'Names of gitignore-style files with patterns of files to skip if the source is a '
+            'directory, default is `infractl.fs.RUNTIME_IGNORE_FILES` (none)'
+        ),
+    )
+
 
 def parse_dependencies(dependencies: Optional[RuntimeDependencies | Dict]) -> RuntimeDependencies:
     """Parses runtime dependencies."""
@@ -100,6 +135,7 @@ class Runtime:
         dependencies: Optional[RuntimeDependencies | Dict] = None,
         files: Optional[List[RuntimeFile | Dict | str]] = None,
         kind: Optional[str] = None,
+        image_strategy: Union[ImageStrategy, str] = ImageStrategy.INSTALL,
     ):
         """Creates a new runtime for any compatible infrastructure.
 
@@ -107,15 +143,31 @@ class Runtime:
             environment: optional dictionary of environment variables
             dependencies: optional runtime dependencies
             files: optional list of runtime files
+            image_strategy: 'install' to install dependencies when a container starts, 'bake' to
+                build a derived image with dependencies, 'bake-files' to build a derived image with
+                dependencies and local files
         """
         self.environment = environment or {}
         self.dependencies = parse_dependencies(dependencies)
         self.files = parse_files(files)
         self.kind = kind
-
-
-class RuntimeImplementation(metaclass=registry.RegisteredClass):
-    """Runtime implementation (for internal usage)."""
+        self.image_strategy = ImageStrategy(image_strategy)
+
+
+class RuntimeImplementation(
+    metaclass=registry.RegisteredClass,
+    entry_point_group='infractl.runtimes',
+    plugins={
+        'prefect': 'infractl.plugins.prefect_runtime.runtime:PrefectRuntimeImplementation',
+        'kubernetes': 'infractl.plugins.kubernetes_runtime.runtime:KubernetesRuntimeImplementation',
+        'ssh': 'infractl.plugins.ssh.runtime:SshRuntimeImplementation',
+    },
+):
+    """Runtime implementation (for internal usage).
+
+    Runtime implementations are loaded on the first use, other packages can provide runtime
+    implementations with entry points in group `infractl.runtimes`.
+    """
 
     def __init__(
         self,
@@ -133,6 +185,10 @@ class RuntimeImplementation(metaclass=registry.RegisteredClass):
     ) -> infractl.base.DeployedProgram:
         """Deploys a program."""
 
+    def program_paths(self, path: str) -> List[str]:
+        """Returns local paths deployed with a program, used to detect program changes."""
+        return [path]
+
 
 def get_runtime_implementation(
     runtime: Runtime,
@@ -0,0 +1,422 @@
+"""Content-addressed bundles of runtime files.
+
+A bundle consists of an index and blobs. The index lists files with their sizes, modes and
+SHA256 hashes of fixed-size chunks, blobs are the chunks stored once by their hash, so the same
+content is never uploaded twice, even by different deployments sharing a blob store. Blobs are
+compressed with gzip, hashes are calculated for uncompressed chunks.
+
+This module is also executed in runtime to extract a bundle, so it must depend only on the
+standard library:
+
+    python bundle.py bundle.json --blobs s3://bucket/_blobs --fetch-command "s3cmd get --force"
+
+Files that are already present in the target directory and chunks that are already in the local
+blob cache (`ICL_BLOB_CACHE`) are not fetched.
+
+A bundle can also reference remote files, which are never uploaded by the client. HTTP(S) URLs are
+downloaded in runtime with parallel ranged requests and cached in the local cache by their ETag,
+local files (such as files on mounted persistent volumes) are linked.
+"""
+
+from __future__ import annotations
+
+import argparse
+import concurrent.futures
+import dataclasses
+import gzip
+import hashlib
+import json
+import os
+import pathlib
+import shlex
+import shutil
+import subprocess  # nosec B404
+import sys
+import tempfile
+import urllib.error
+import urllib.parse
+import urllib.request
+import zlib
+from typing import BinaryIO, Callable, Dict, List, Optional, Tuple, Union
+
+# Bundle format version
+VERSION = 3
+
+# Default chunk size, files larger than this are split into several blobs
+CHUNK_SIZE = 8 * 1024 * 1024
+
+# Blob compression, "gzip" or "" for uncompressed blobs
+COMPRESSION = 'gzip'
+
+# Compression level, the fastest level is used since blobs are compressed on each upload
+COMPRESSLEVEL = 1
+
+# Part size for parallel ranged downloads of remote files
+PART_SIZE = 16 * 1024 * 1024
+
+# Timeout in seconds for HTTP requests
+HTTP_TIMEOUT = 60
+
+# Name of the index file
+INDEX_NAME = 'bundle.json'
+
+# Environment variable with the local blob cache in runtime
+BLOB_CACHE_ENV = 'ICL_BLOB_CACHE'
+
+
+class BundleError(Exception):
+    """Bundle error."""
+
+
+@dataclasses.dataclass
+class BundleFile:
+    """File in a bundle."""
+
+    path: str
+    """Relative path in the target directory, always with forward slashes."""
+
+    size: int
+    mode: int
+    chunks: List[str] = dataclasses.field(default_factory=list)
+    """SHA256 hashes of the file chunks."""
+
+
+@dataclasses.dataclass
+class RemoteFile:
+    """Remote file in a bundle, fetched in runtime."""
+
+    path: str
+    """Relative path in the target directory, always with forward slashes."""
+
+    url: str
+    """HTTP(S) URL to download or file URL to link."""
+
+    key: str
+    """Cache key, such as the URL without a signature, the file is cached by the key and ETag."""
+
+
+@dataclasses.dataclass
+class Bundle:
+    """Bundle index."""
+
+    files: List[BundleFile] = dataclasses.field(default_factory=list)
+    remote: List[RemoteFile] = dataclasses.field(default_factory=list)
+    chunk_size: int = CHUNK_SIZE
+    compression: str = COMPRESSION
+    version: int = VERSION
+
+    def dumps(self) -> bytes:
+        """Serializes the index."""
+        return json.dumps(dataclasses.asdict(self), sort_keys=True).encode('utf-8')
+
+    @classmethod
+    def loads(cls, data: Union[str, bytes]) -> Bundle:
+        """Deserializes the index."""
+        value = json.loads(data)
+        if value.get('version') != VERSION:
+            raise BundleError(f'Unsupported bundle version {value.get("version")}')
+        return cls(
+            files=[BundleFile(**file) for file in value['files']],
+            remote=[RemoteFile(**file) for file in value['remote']],
+            chunk_size=value['chunk_size'],
+            compression=value['compression'],
+            version=value['version'],
+        )
+
+    def blob_paths(self) -> List[str]:
+        """Returns unique paths of blobs with file chunks, relative to the blob store."""
+        digests = dict.fromkeys(chunk for file in self.files for chunk in file.chunks)
+        return [blob_path(digest, self.compression) for digest in digests]
+
+
+@dataclasses.dataclass
+class ExtractStats:
+    """Statistics of a bundle extraction."""
+
+    extracted: int = 0
+    unchanged: int = 0
+    fetched: int = 0
+    fetched_bytes: int = 0
+    cached: int = 0
+    downloaded: int = 0
+    downloaded_bytes: int = 0
+    linked: int = 0
+
+
+def blob_path(digest: str, compression: str = COMPRESSION) -> str:
+    """Returns a blob path relative to the blob store."""
+    suffix = {'gzip': '.gz', '': ''}[compression]
+    return f'{digest[:2]}/{digest}{suffix}'
+
+
+def write_blob(
+    source: BinaryIO, target: BinaryIO, size: int, compression: str = COMPRESSION
+) -> None:
+    """Copies up to `size` bytes from the source to a blob, compressing them on the fly."""
+    if compression == 'gzip':
+        with gzip.GzipFile(fileobj=target, mode='wb', compresslevel=COMPRESSLEVEL, mtime=0) as gz:
+            write_blob(source, gz, size, compression='')
+        return
+    while size > 0:
+        data = source.read(min(size, 1024 * 1024))
+        if not data:
+            break
+        target.write(data)
+        size -= len(data)
+
+
+def read_blob(data: bytes, compression: str = COMPRESSION) -> bytes:
+    """Returns blob content."""
+    if compression == 'gzip':
+        try:
+            return gzip.decompress(data)
+        except (OSError, EOFError, zlib.error) as error:
+            raise BundleError(f'Cannot decompress blob: {error}') from error
+    return data
+
+
+def hash_chunks(path: Union[str, os.PathLike], chunk_size: int = CHUNK_SIZE) -> List[str]:
+    """Returns SHA256 hashes of the file chunks."""
+    with open(path, 'rb') as file:
+        return [
+            hashlib.sha256(chunk).hexdigest() for chunk in iter(lambda: file.read(chunk_size), b'')
+        ]
+
+
+def _target_path(target: pathlib.Path, path: str) -> pathlib.Path:
+    """Returns a path in the target directory, refusing paths outside of it."""
+    result = (target / path).resolve()
+    if target != result and target not in result.parents:
+        raise BundleError(f'File {path} is outside of the target directory')
+    return result
+
+
+def _is_unchanged(path: pathlib.Path, file: BundleFile, chunk_size: int) -> bool:
+    """Returns True if the local file has the same content as the bundle file."""
+    if not path.is_file() or path.stat().st_size != file.size:
+        return False
+    return hash_chunks(path, chunk_size) == file.chunks
+
+
+def extract(
+    bundle: Bundle,
+    target: Union[str, os.PathLike],
+    fetch: Callable[[str], bytes],
+    cache_dir: Union[str, os.PathLike, None] = None,
+    max_workers: int = 8,
+) -> ExtractStats:
+    """Extracts a bundle to the target directory.
+
+    Args:
+        bundle: bundle index.
+        target: target directory.
+        fetch: function to fetch a blob by its path relative to the blob store.
+        cache_dir: local blob cache, blobs are cached in a temporary directory if not specified.
+        max_workers: maximum number of concurrent fetches.
+    """
+    target = pathlib.Path(target).resolve()
+    stats = ExtractStats()
+
+    pending: Dict[pathlib.Path, BundleFile] = {}
+    for file in bundle.files:
+        path = _target_path(target, file.path)
+        if _is_unchanged(path, file, bundle.chunk_size):
+            stats.unchanged += 1
+        else:
+            pending[path] = file
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache = pathlib.Path(cache_dir or tmp_dir)
+        cache.mkdir(parents=True, exist_ok=True)
+        if pending:
+            _extract_files(bundle, pending, fetch, cache, max_workers, stats)
+        for remote in bundle.remote:
+            path = _target_path(target, remote.path)
+            if remote.url.startswith('file://'):
+                _link(urllib.parse.urlparse(remote.url).path, path)
+                stats.linked += 1
+            else:
+                size = download(remote.url, path, key=remote.key, cache_dir=cache_dir)
+                stats.downloaded += 1
+                stats.downloaded_bytes += size
+    return stats
+
+
+def _extract_files(
+    bundle: Bundle,
+    pending: Dict[pathlib.Path, BundleFile],
+    fetch: Callable[[str], bytes],
+    cache: pathlib.Path,
+    max_workers: int,
+    stats: ExtractStats,
+):
+    """Fetches missing blobs to the cache and assembles files from them."""
+
+    def fetch_blob(digest: str) -> int:
+        data = fetch(blob_path(digest, bundle.compression))
+        size = len(data)
+        data = read_blob(data, bundle.compression)
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise BundleError(f'Blob {digest} is corrupted')
+        # write and rename, so a cache shared by several pods never has partial blobs
+        with tempfile.NamedTemporaryFile(dir=cache, delete=False) as blob_file:
+            blob_file.write(data)
+        os.replace(blob_file.name, cache / digest)
+        return size
+
+    digests = dict.fromkeys(chunk for file in pending.values() for chunk in file.chunks)
+    missing = [digest for digest in digests if not (cache / digest).exists()]
+    stats.cached += len(digests) - len(missing)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for size in executor.map(fetch_blob, missing):
+            stats.fetched += 1
+            stats.fetched_bytes += size
+
+    for path, file in pending.items():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'wb') as target_file:
+            for digest in file.chunks:
+                target_file.write((cache / digest).read_bytes())
+        path.chmod(file.mode)
+        stats.extracted += 1
+
+
+def _link(source: str, path: pathlib.Path):
+    """Creates a symbolic link, replacing an existing file."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.is_symlink() or path.is_file():
+        path.unlink()
+    path.symlink_to(source)
+
+
+def _open_url(url: str, start: Optional[int] = None, end: Optional[int] = None):
+    """Opens URL, optionally for a range of bytes (inclusive)."""
+    request = urllib.request.Request(url)
+    if start is not None:
+        request.add_header('Range', f'bytes={start}-{end}')
+    return urllib.request.urlopen(request, timeout=HTTP_TIMEOUT)  # nosec B310
+
+
+def _probe_url(url: str) -> Tuple[Optional[int], str]:
+    """Returns size (None if ranges are not supported) and ETag of a URL.
+
+    Uses a GET request for the first byte instead of HEAD, since presigned URLs are signed for GET.
+    """
+    try:
+        with _open_url(url, 0, 0) as response:
+            etag = response.headers.get('ETag', '').strip('"')
+            content_range = response.headers.get('Content-Range', '')
+            if response.status != 206 or not content_range.split('/')[-1].isdigit():
+                return None, etag
+            return int(content_range.split('/')[-1]), etag
+    except urllib.error.HTTPError as error:
+        if error.code == 416:
+            # empty file
+            return None, error.headers.get('ETag', '').strip('"')
+        raise
+
+
+def download(
+    url: str,
+    path: Union[str, os.PathLike],
+    key: Optional[str] = None,
+    cache_dir: Union[str, os.PathLike, None] = None,
+    part_size: int = PART_SIZE,
+    max_workers: int = 8,
+) -> int:
+    """Downloads a URL to a file, returns the number of downloaded bytes.
+
+    Large files are downloaded in parts concurrently, if the server supports ranges. If the cache
+    directory is specified and the server returns ETag, the file is cached by `key` (default is the
+    URL) and ETag, so a file with the same ETag is not downloaded again.
+    """
+    path = pathlib.Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    size, etag = _probe_url(url)
+
+    cache_path = None
+    if cache_dir and etag:
+        cache_key = hashlib.sha256(f'{key or url}\n{etag}'.encode('utf-8')).hexdigest()
+        cache_path = pathlib.Path(cache_dir) / 'remote' / cache_key
+        if cache_path.exists():
+            shutil.copyfile(cache_path, path)
+            return 0
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+
+    with tempfile.NamedTemporaryFile(dir=(cache_path or path).parent, delete=False) as tmp_file:
+        if size is None:
+            with _open_url(url) as response:
+                shutil.copyfileobj(response, tmp_file, 1024 * 1024)
+        else:
+            tmp_file.truncate(size)
+    downloaded = os.path.getsize(tmp_file.name)
+
+    def download_part(start: int):
+        end = min(start + part_size, size) - 1
+        with _open_url(url, start, end) as response, open(tmp_file.name, 'r+b') as part_file:
+            if response.status != 206:
+                raise BundleError(f'Ranges are not supported for {url}')
+            part_file.seek(start)
+            shutil.copyfileobj(response, part_file, 1024 * 1024)
+
+    try:
+        if size is not None:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+                list(executor.map(download_part, range(0, size, part_size)))
+        if cache_path:
+            os.replace(tmp_file.name, cache_path)
+            shutil.copyfile(cache_path, path)
+        else:
+            os.replace(tmp_file.name, path)
+    finally:
+        if os.path.exists(tmp_file.name):
+            os.remove(tmp_file.name)
+    return downloaded
+
+
+def fetch_command(command: str, blobs: str) -> Callable[[str], bytes]:
+    """Returns a function to fetch a blob with a command, such as `s3cmd get --force`.
+
+    The command is called with a blob URL and a local file name.
+    """
+
+    def fetch(path: str) -> bytes:
+        with tempfile.TemporaryDirectory() as dirname:
+            local_path = pathlib.Path(dirname) / 'blob'
+            subprocess.run(  # nosec B603
+                [*shlex.split(command), f'{blobs.rstrip("/")}/{path}', str(local_path)],
+                stdout=subprocess.DEVNULL,
+                check=True,
+            )
+            return local_path.read_bytes()
+
+    return fetch
+
+
+def create_parser() -> argparse.ArgumentParser:
+    """Creates argument parser."""
+    parser = argparse.ArgumentParser(description='Extracts a bundle')
+    parser.add_argument('index', help='Bundle index')
+    parser.add_argument('--blobs', required=True, help='Blob store URL')
+    parser.add_argument(
+        '--fetch-command', required=True, help='Command to download a blob URL to a file'
+    )
+    parser.add_argument('--target', default='.', help='Target directory (default is ".")')
+    parser.add_argument(
+        '--cache', default=os.environ.get(BLOB_CACHE_ENV), help='Local blob cache directory'
+    )
+    return parser
+
+
+def main(argv: Optional[List[str]] = None):
+    """Entry point."""
+    args = create_parser().parse_args(argv)
+    bundle = Bundle.loads(pathlib.Path(args.index).read_bytes())
+    stats = extract(
+        bundle, args.target, fetch_command(args.fetch_command, args.blobs), cache_dir=args.cache
+    )
+    print(f'[infractl.bundle] {stats}', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
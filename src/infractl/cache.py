@@ -0,0 +1,307 @@
+"""Deployment cache.
+
+Caches deployed programs by a fingerprint of the program source, runtime and infrastructure, so
+deploying the same program again returns the existing deployed program instead of redeploying it.
+Cached deployed programs are not validated against the remote deployment, which can be deleted or
+overwritten, for example, by recreating the infrastructure, so the cache is opt-in.
+
+Deployed programs are kept in memory. If `deployment_cache.path` is set, deployed programs that
+can be pickled are also kept on disk, so the cache survives restarting a Python process (for
+example, a Jupyter kernel), the on-disk cache is off by default. The cache is configured with the
+following settings:
+
+* `deployment_cache.enabled` - `True` to use the cache in `infractl.deploy()`, `False` (default).
+* `deployment_cache.path` - on-disk cache location, for example `~/.cache/infractl/deployments`,
+  not set (default) to keep the cache only in memory.
+* `deployment_cache.max_entries` - maximum number of cached deployments (default is 64).
+* `deployment_cache.ttl` - time in seconds to keep a cached deployment (default is 86400).
+"""
+
+from __future__ import annotations
+
+import collections
+import hashlib
+import inspect
+import json
+import os
+import pathlib
+import pickle  # nosec B403 - cache files are written and read by the current user only
+import time
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import pydantic
+
+import infractl.base
+import infractl.fs
+from infractl.logging import get_logger
+
+logger = get_logger()
+
+DEFAULT_CACHE: Optional[DeploymentCache] = None
+
+
+class CacheStats(pydantic.BaseModel):
+    """Deployment cache statistics."""
+
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+
+class CacheEntry(pydantic.BaseModel):
+    """Deployment cache entry."""
+
+    model_config = pydantic.ConfigDict(arbitrary_types_allowed=True)
+
+    key: str
+    slot: str
+    created: float
+    deployed_program: Any
+
+
+def _path_fingerprint(
+    path: Union[str, os.PathLike],
+    patterns: Optional[List[str]] = None,
+    ignore_files: Optional[List[str]] = None,
+) -> List[Any]:
+    """Returns a fingerprint for a file or a directory.
+
+    A file is identified by its content, a directory by names, sizes and modification times of
+    its files, which is much cheaper for large directories. Files ignored with `patterns` and
+    `ignore_files` (see `infractl.fs.walk_files`) are skipped.
+    """
+    path = pathlib.Path(path).absolute()
+    if path.is_file():
+        return [str(path), infractl.fs.hash_file(path)]
+    if path.is_dir():
+        result: List[Any] = [str(path)]
+        # ignored files, such as virtual environments, are not uploaded
+        for item in infractl.fs.walk_files(path, patterns, ignore_files):
+            stat = (path / item).stat()
+            result.append([item, stat.st_size, stat.st_mtime_ns])
+        return result
+    return [str(path), None]
+
+
+def _program_path(program: infractl.base.Program) -> Optional[str]:
+    """Returns a file name with the program source."""
+    if isinstance(program.path, str):
+        return program.path
+    # Python objects, such as Prefect flows or functions
+    try:
+        return inspect.getsourcefile(getattr(program.path, 'fn', program.path))
+    except TypeError:
+        return None
+
+
+def fingerprint(
+    program: infractl.base.Program,
+    runtime_implementation: infractl.base.RuntimeImplementation,
+    **kwargs,
+) -> Optional[Tuple[str, str]]:
+    """Returns a fingerprint for deployment.
+
+    Returns a tuple (key, slot), where key identifies the deployment and slot identifies the
+    deployment target (for example, a Prefect flow name). Deployments to the same slot overwrite
+    each other, so the cache keeps only one deployment per slot. Returns None if the deployment
+    cannot be cached, for example, if deployment arguments are not serializable.
+    """
+    program_path = _program_path(program)
+    if program_path is None:
+        return None
+
+    runtime = runtime_implementation.runtime
+    infrastructure_implementation = runtime_implementation.infrastructure_implementation
+    address = infrastructure_implementation.address
+    slot_data = {
+        'cwd': os.getcwd(),
+        'program': [program_path, program.name],
+        'runtime': runtime.kind,
+        'address': address,
+        'name': kwargs.get('name'),
+    }
+    data = {
+        'slot': slot_data,
+        'program': [
+            _path_fingerprint(path) for path in runtime_implementation.program_paths(program_path)
+        ],
+        'environment': runtime.environment,
+        'dependencies': runtime.dependencies.model_dump(mode='json'),
+        'image_strategy': runtime.image_strategy.value,
+        'files': [
+            [
+                file.dst,
+                (
+                    _path_fingerprint(file.src, *infractl.fs.runtime_ignore(file))
+                    if file.src
+                    else None
+                ),
+            ]
+            for file in runtime.files
+        ],
+        'infrastructure': infrastructure_implementation.infrastructure.model_dump(mode='json'),
+        'settings': infrastructure_implementation.address_settings.model_dump(mode='json'),
+        'kwargs': kwargs,
+    }
+    try:
+        key = json.dumps(data, sort_keys=True)
+        slot = json.dumps(slot_data, sort_keys=True)
+    except (TypeError, ValueError):
+        # For example, a callable in kwargs
+        return None
+    return (
+        hashlib.sha256(key.encode('utf-8')).hexdigest(),
+        hashlib.sha256(slot.encode('utf-8')).hexdigest()[:16],
+    )
+
+
+class DeploymentCache:
+    """Deployment cache."""
+
+    path: Optional[pathlib.Path]
+    max_entries: int
+    ttl: Optional[float]
+    stats: CacheStats
+
+    def __init__(
+        self,
+        path: Union[str, os.PathLike, None] = None,
+        max_entries: int = 64,
+        ttl: Optional[float] = 86400,
+    ):
+        """Creates a deployment cache.
+
+        Args:
+            path: cache location, None to keep the cache only in memory.
+            max_entries: maximum number of cached deployments.
+            ttl: time in seconds to keep a cached deployment, None to keep forever.
+        """
+        self.path = pathlib.Path(path).expanduser() if path else None
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self._entries: collections.OrderedDict[str, CacheEntry] = collections.OrderedDict()
+
+    def __repr__(self) -> str:
+        return (
+            f'DeploymentCache(path={self.path}, entries={len(self._entries)},'
+            f' hits={self.stats.hits}, misses={self.stats.misses})'
+        )
+
+    def _file(self, entry: CacheEntry) -> pathlib.Path:
+        return self.path / f'{entry.slot}-{entry.key}.pickle'
+
+    def _is_expired(self, entry: CacheEntry) -> bool:
+        return self.ttl is not None and time.time() - entry.created > self.ttl
+
+    def _load(self, key: str) -> Optional[CacheEntry]:
+        """Loads entry from disk."""
+        if not self.path:
+            return None
+        for file in self.path.glob(f'*-{key}.pickle'):
+            try:
+                with file.open('rb') as cache_file:
+                    entry = CacheEntry.model_validate(pickle.load(cache_file))  # nosec B301
+            except Exception as error:  # pylint: disable=broad-exception-caught
+                logger.debug('Ignoring broken cache file %s: %s', file, error)
+                file.unlink(missing_ok=True)
+                continue
+            # update modification time to evict least recently used files first
+            os.utime(file)
+            return entry
+        return None
+
+    def _save(self, entry: CacheEntry):
+        """Saves entry to disk, if the deployed program can be pickled."""
+        if not self.path:
+            return
+        try:
+            data = pickle.dumps(entry.model_dump())
+        except Exception as error:  # pylint: disable=broad-exception-caught
+            logger.debug('Deployed program is kept in memory only: %s', error)
+            return
+        self.path.mkdir(parents=True, exist_ok=True)
+        file = self._file(entry)
+        tmp_file = file.with_suffix('.tmp')
+        tmp_file.write_bytes(data)
+        tmp_file.replace(file)
+
+    def get(self, key: str) -> Optional[infractl.base.DeployedProgram]:
+        """Returns a cached deployed program or None."""
+        entry = self._entries.get(key) or self._load(key)
+        if entry and self._is_expired(entry):
+            self.evict(key)
+            entry = None
+        if entry is None:
+            self.stats.misses += 1
+            return None
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        self.stats.hits += 1
+        return entry.deployed_program
+
+    def put(self, key: str, slot: str, deployed_program: infractl.base.DeployedProgram):
+        """Adds a deployed program to the cache.
+
+        Other entries for the same slot are evicted, since the new deployment overwrites them.
+        """
+        for other_key in [k for k, entry in self._entries.items() if entry.slot == slot]:
+            self.evict(other_key)
+        if self.path:
+            for file in self.path.glob(f'{slot}-*.pickle'):
+                file.unlink(missing_ok=True)
+                self.stats.evictions += 1
+
+        entry = CacheEntry(
+            key=key, slot=slot, created=time.time(), deployed_program=deployed_program
+        )
+        self._entries[key] = entry
+        self._save(entry)
+        self._shrink()
+
+    def evict(self, key: str):
+        """Removes a deployed program from the cache."""
+        entry = self._entries.pop(key, None)
+        files = list(self.path.glob(f'*-{key}.pickle')) if self.path else []
+        for file in files:
+            file.unlink(missing_ok=True)
+        if entry or files:
+            self.stats.evictions += 1
+
+    def clear(self):
+        """Removes all deployed programs from the cache."""
+        for key in list(self._entries):
+            self.evict(key)
+        if self.path:
+            for file in self.path.glob('*.pickle'):
+                file.unlink(missing_ok=True)
+                self.stats.evictions += 1
+
+    def _shrink(self):
+        """Evicts least recently used entries above the limit."""
+        while len(self._entries) > self.max_entries:
+            key = next(iter(self._entries))
+            self.evict(key)
+        if self.path:
+            files = sorted(self.path.glob('*.pickle'), key=lambda file: file.stat().st_mtime)
+            for file in files[: max(len(files) - self.max_entries, 0)]:
+                file.unlink(missing_ok=True)
+                self.stats.evictions += 1
+
+
+def default_cache() -> DeploymentCache:
+    """Returns default deployment cache, configured with settings."""
+    global DEFAULT_CACHE
+    if DEFAULT_CACHE is None:
+        settings: Dict[str, Any] = infractl.base.SETTINGS.get('deployment_cache', {})
+        DEFAULT_CACHE = DeploymentCache(
+            path=settings.get('path'),
+            max_entries=settings.get('max_entries', 64),
+            ttl=settings.get('ttl', 86400),
+        )
+    return DEFAULT_CACHE
+
+
+def is_enabled() -> bool:
+    """Returns True if the deployment cache is enabled in settings."""
+    return infractl.base.SETTINGS.get('deployment_cache.enabled', False)
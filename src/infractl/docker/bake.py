@@ -0,0 +1,150 @@
+"""Runtime images baked from runtime dependencies and files.
+
+With `infractl.runtime(..., image_strategy='bake')` runtime dependencies are installed in a derived
+image instead of each container start, with `image_strategy='bake-files'` local runtime files are
+copied to the image as well. The image is tagged by a hash of its content (the base image,
+normalized requirements and local files), so it is built once with `infractl.docker.builder` and
+reused while it exists in the registry.
+"""
+
+import copy
+import hashlib
+import json
+import pathlib
+import shutil
+import tempfile
+from typing import List, Optional
+
+import infractl.base
+import infractl.docker
+import infractl.fs
+from infractl import wheelhouse
+from infractl.logging import get_logger
+
+logger = get_logger()
+
+# Image name for baked runtime images
+IMAGE_NAME = 'infractl-runtime'
+
+# Length of the content hash in the image tag
+TAG_LENGTH = 32
+
+
+def _local_files(runtime: infractl.base.Runtime) -> List[infractl.base.RuntimeFile]:
+    """Returns local runtime files, which are baked with `ImageStrategy.BAKE_FILES`."""
+    if runtime.image_strategy != infractl.base.ImageStrategy.BAKE_FILES:
+        return []
+    return [file for file in runtime.files if not infractl.fs.is_remote(file.src)]
+
+
+def needs_image(runtime: infractl.base.Runtime) -> bool:
+    """Returns True if the runtime requires a baked image."""
+    if runtime.image_strategy == infractl.base.ImageStrategy.INSTALL:
+        return False
+    return bool(runtime.dependencies.pip or _local_files(runtime))
+
+
+def remaining_runtime(runtime: infractl.base.Runtime) -> infractl.base.Runtime:
+    """Returns a copy of the runtime without dependencies and files baked in the image."""
+    if not needs_image(runtime):
+        return runtime
+    result = copy.copy(runtime)
+    result.dependencies = infractl.base.RuntimeDependencies()
+    baked = _local_files(runtime)
+    result.files = [file for file in runtime.files if file not in baked]
+    return result
+
+
+def image_tag(
+    runtime: infractl.base.Runtime, base_image: str, working_dir: Optional[str] = None
+) -> str:
+    """Returns a tag for the baked image, which is a hash of the image content."""
+    index, _ = infractl.fs.create_bundle(_local_files(runtime))
+    data = {
+        'base_image': base_image,
+        'requirements': wheelhouse.normalize(runtime.dependencies.pip),
+        'working_dir': working_dir,
+        'files': sorted([file.path, file.mode, file.chunks] for file in index.files),
+    }
+    digest = hashlib.sha256(json.dumps(data, sort_keys=True).encode('utf-8')).hexdigest()
+    return f'{IMAGE_NAME}:{digest[:TAG_LENGTH]}'
+
+
+def dockerfile(
+    base_image: str, requirements: bool, files: bool, working_dir: Optional[str] = None
+) -> str:
+    """Returns a Dockerfile for the baked image."""
+    lines = [f'FROM {base_image}']
+    if requirements:
+        lines += [
+            'COPY requirements.txt /tmp/infractl-requirements.txt',
+            'RUN pip install --no-cache-dir -r /tmp/infractl-requirements.txt'
+            ' && rm /tmp/infractl-requirements.txt',
+        ]
+    if files:
+        if working_dir:
+            lines.append(f'WORKDIR {working_dir}')
+        lines.append('COPY files/ ./')
+    return '\n'.join(lines) + '\n'
+
+
+def write_context(
+    runtime: infractl.base.Runtime,
+    path: pathlib.Path,
+    base_image: str,
+    working_dir: Optional[str] = None,
+):
+    """Writes a Docker build context for the baked image."""
+    requirements = runtime.dependencies.pip
+    files = infractl.fs.runtime_file_paths(_local_files(runtime))
+    if requirements:
+        (path / 'requirements.txt').write_text('\n'.join(requirements) + '\n')
+    for runtime_path, local_path in files.items():
+        target = path / 'files' / runtime_path
+        target.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copy2(local_path, target)
+    (path / 'Dockerfile').write_text(
+        dockerfile(base_image, bool(requirements), bool(files), working_dir)
+    )
+
+
+def image_reference(builder: infractl.docker.Builder, image: infractl.docker.Image) -> str:
+    """Returns a reference to the image in the registry for Kubernetes nodes."""
+    if builder.registry:
+        registry = builder.registry.split('://', 1)[-1].rstrip('/')
+    else:
+        registry = builder.infrastructure.address_settings.registry_node_endpoint
+    return f'{registry}/{image.name}:{image.tag}'
+
+
+def bake(
+    runtime: infractl.base.Runtime,
+    base_image: str,
+    infrastructure: infractl.base.Infrastructure,
+    working_dir: Optional[str] = None,
+    builder: Optional[infractl.docker.Builder] = None,
+) -> str:
+    """Returns a reference to the baked image for the runtime, builds the image if missing.
+
+    Args:
+        runtime: runtime with `image_strategy` other than 'install'.
+        base_image: image to derive from.
+        infrastructure: infrastructure to build the image for.
+        working_dir: runtime working directory for local files, default is WORKDIR of the base
+            image.
+        builder: Docker builder, default is `infractl.docker.builder(infrastructure)`.
+    """
+    if not needs_image(runtime):
+        return base_image
+    if builder is None:
+        builder = infractl.docker.builder(infrastructure=infrastructure)
+    tag = image_tag(runtime, base_image, working_dir)
+    image = infractl.docker.Image.from_full_name(tag)
+    if builder.image_exists(tag):
+        logger.debug('Using the existing runtime image %s', tag)
+        return image_reference(builder, image)
+    logger.info('Building runtime image %s from %s', tag, base_image)
+    with tempfile.TemporaryDirectory() as dirname:
+        write_context(runtime, pathlib.Path(dirname), base_image, working_dir)
+        builder.build(path=dirname, tag=tag)
+    return image_reference(builder, image)
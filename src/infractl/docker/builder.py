@@ -16,14 +16,12 @@ import enum
 import os
 import re
 import shutil
-from typing import Any, Callable, Optional, Union
+from typing import Callable, Optional, Union
 
 import pydantic
 import python_docker.registry
 import requests.exceptions
 
-import infractl.api
-import infractl.api.infrastructure
 import infractl.base
 
 StreamCallback = Callable[[str], None]
@@ -130,9 +128,12 @@ class Builder:
             infrastructure: ICL infrastructure, default one is used when not specified.
             registry: Docker registry, default one from infrastructure is used when not specified.
         """
-        self.infrastructure = infractl.base.get_infrastructure_implementation(
-            infrastructure or infractl.api.infrastructure.default_infrastructure()
-        )
+        if infrastructure is None:
+            # pylint: disable=import-outside-toplevel
+            from infractl.api.infrastructure import default_infrastructure
+
+            infrastructure = default_infrastructure()
+        self.infrastructure = infractl.base.get_infrastructure_implementation(infrastructure)
         self.registry = registry
 
     def build(self, stream_callback: Optional[StreamCallback] = stdout_callback) -> Image:
@@ -167,24 +168,16 @@ class Builder:
     @property
     def registry_internal_endpoint(self):
         """Registry internal endpoint."""
-        return self.settings(
-            'registry_internal_endpoint',
-            'http://docker-registry.docker-registry.svc.cluster.local:5000',
-        )
+        return self.infrastructure.address_settings.registry_internal_endpoint
 
     @property
     def registry_external_endpoint(self):
-        """Registry internal endpoint."""
-        return self.settings(
-            'registry_external_endpoint',
-            f'http://registry.{self.infrastructure.address}',
+        """Registry external endpoint."""
+        return (
+            self.infrastructure.address_settings.registry_external_endpoint
+            or f'http://registry.{self.infrastructure.address}'
         )
 
-    def settings(self, name: str, default_value: Any = None) -> Any:
-        """Return a setting value for this infrastructure address."""
-        # TODO: this needs to be supported by settings (see also HCL configuration)
-        return infractl.base.SETTINGS.get(f'{self.infrastructure.address}.{name}', default_value)
-
 
 def builder(
     infrastructure: Optional[infractl.base.Infrastructure] = None,
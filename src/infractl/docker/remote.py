@@ -1,6 +1,7 @@
 """Builds and pushes a Docker image to Docker registry using ICL cluster.
 
-1. Upload the specified context recursively (with .dockerignore) to the cluster storage.
+1. Upload the specified context recursively (without files matching .dockerignore) to the cluster
+   storage.
 2. Create a Kubernetes Job that
     a. downloads the context to a temporary directory
     b. builds a Docker image
@@ -78,7 +79,13 @@ class Builder(infractl.docker.Builder):
                 'pip': ['psutil'],
             },
             files=[
-                {'src': build_args['path'], 'dst': 'context/'},
+                # Docker build context honors only .dockerignore
+                {
+                    'src': build_args['path'],
+                    'dst': 'context/',
+                    'ignore': [],
+                    'ignore_files': ['.dockerignore'],
+                },
             ],
         )
 
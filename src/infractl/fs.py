@@ -1,12 +1,125 @@
 """File system functions."""
 
+import asyncio
+import functools
+import hashlib
+import io
+import itertools
+import os
 import pathlib
+import posixpath
+import re
 import sys
-import tarfile
 import urllib.parse
-from typing import List
+from typing import (
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Pattern,
+    Tuple,
+    TypeVar,
+    Union,
+)
+
+import fsspec
+import fsspec.asyn
+import pydantic
 
 import infractl.base
+from infractl import bundle
+from infractl.logging import get_logger
+
+logger = get_logger()
+
+T = TypeVar('T')
+
+# Upload is a local file, bytes or a function returning bytes, see `put_all`
+Upload = Union[pathlib.Path, bytes, Callable[[], bytes]]
+
+# Default maximum number of concurrent uploads
+MAX_CONCURRENT_UPLOADS = 16
+
+# URI schemes of runtime files, which are fetched in runtime instead of uploading
+REMOTE_SCHEMES = ('s3', 'http', 'https', 'pvc')
+
+# Mount path in runtime for persistent volume claims of `pvc://` runtime files
+PVC_MOUNT_PATH = '/mnt/infractl/pvc'
+
+# Expiration in seconds of presigned URLs for `s3://` runtime files (maximum for SigV4)
+PRESIGN_EXPIRATION = 7 * 24 * 3600
+
+# Suffix of a manifest file, which is stored next to the synchronized directory
+MANIFEST_SUFFIX = '.manifest.json'
+
+# Files and directories that are not uploaded from directories with program code by default
+DEFAULT_IGNORE_PATTERNS = [
+    # Version control
+    '.git/',
+    '.hg/',
+    '.svn/',
+    # Ignore files
+    '.gitignore',
+    '.dockerignore',
+    '.prefectignore',
+    # Python artifacts
+    '__pycache__/',
+    '*.py[cod]',
+    '*$py.class',
+    '*.egg-info/',
+    '*.egg',
+    '.pytest_cache/',
+    '.tox/',
+    # Type checking artifacts
+    '.mypy_cache/',
+    '.dmypy.json',
+    'dmypy.json',
+    '.pyre/',
+    # IPython
+    'profile_default/',
+    'ipython_config.py',
+    '.ipynb_checkpoints/',
+    # Environments
+    '.python-version',
+    '.env',
+    '.venv',
+    'env/',
+    'venv/',
+    '.conda/',
+    # MacOS
+    '.DS_Store',
+    # Dask
+    'dask-worker-space/',
+    # Editors
+    '.idea/',
+    '.vscode/',
+    '.vscode-server/',
+]
+
+# Files and directories that are not uploaded from directories with runtime files by default,
+# runtime files can be data, so only version control, caches and environments are skipped
+RUNTIME_IGNORE_PATTERNS = [
+    '.git/',
+    '.hg/',
+    '.svn/',
+    '__pycache__/',
+    '.venv/',
+    'venv/',
+    '.ipynb_checkpoints/',
+]
+
+# Gitignore-style files with patterns of files to skip in directories
+IGNORE_FILES = ['.gitignore', '.dockerignore', '.prefectignore']
+
+# Ignore files read from directories with runtime files by default, none: data directories often
+# have a `*` .gitignore to keep the data out of version control
+RUNTIME_IGNORE_FILES: List[str] = []
+
+# Ignore files, which are read only in the root directory and where all patterns are relative to
+# the root directory, as Docker does
+ANCHORED_IGNORE_FILES = {'.dockerignore'}
 
 
 def strip_file_scheme(uri: str) -> str:
@@ -24,21 +137,560 @@ def strip_file_scheme(uri: str) -> str:
     return path
 
 
-def prepare_to_upload(files: List[infractl.base.RuntimeFile], target_path: pathlib.Path):
-    """Uploads files to the specified directory."""
-    # The specified directory has the following structure:
-    # cwd.tar  - tarball to extract to the current directory in runtime.
-    with tarfile.open(name=target_path / 'cwd.tar', mode='w') as cwd:
-        for file in files:
-            if file.src.endswith('/'):
-                src = pathlib.Path(file.src)
-                dst = ''
-                if file.dst:
-                    # dst is expected to be a directory, adding a trailing / if missing
-                    dst = file.dst if file.dst.endswith('/') else f'{file.dst}/'
-                for path in src.rglob('*'):
-                    relative_path = path.relative_to(src)
-                    cwd.add(name=path, arcname=f'{dst}{relative_path}')
+def _translate_pattern(pattern: str) -> str:
+    """Translates a gitignore-style glob pattern to a regular expression."""
+    result = []
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith('**/', i):
+            # zero or more directories
+            result.append('(?:.*/)?')
+            i += 3
+        elif pattern.startswith('**', i) and i + 2 == len(pattern):
+            # everything inside
+            result.append('.*')
+            i += 2
+        elif pattern[i] == '*':
+            result.append('[^/]*')
+            i += 1
+        elif pattern[i] == '?':
+            result.append('[^/]')
+            i += 1
+        elif pattern[i] == '[' and ']' in pattern[i + 2 :]:
+            end = pattern.index(']', i + 2)
+            chars = pattern[i + 1 : end]
+            if chars[0] in '!^':
+                chars = f'^{chars[1:]}'
+            result.append(f'[{chars}]'.replace('\\', '\\\\'))
+            i = end + 1
+        elif pattern[i] == '\\' and i + 1 < len(pattern):
+            result.append(re.escape(pattern[i + 1]))
+            i += 2
+        else:
+            result.append(re.escape(pattern[i]))
+            i += 1
+    return ''.join(result)
+
+
+class IgnoreRules:
+    """Precompiled gitignore-style ignore patterns.
+
+    Supports comments, negation with "!", directory-only patterns with a trailing "/", patterns
+    anchored to the base directory with a leading or a middle "/", "*", "?", "[...]" and "**".
+    As in git, the last matching pattern wins. Consecutive patterns of the same kind are combined
+    into a single regular expression, so matching is fast for long pattern lists.
+    """
+
+    base: str
+    # (regex, negate, dir_only) in the pattern order
+    _groups: List[Tuple[Pattern[str], bool, bool]]
+
+    def __init__(self, patterns: Iterable[str] = (), base: str = '', anchored: bool = False):
+        """Compiles patterns.
+
+        Args:
+            patterns: gitignore-style patterns.
+            base: directory the patterns are relative to, relative to the walk root, with a
+                trailing "/", empty string for the root.
+            anchored: True to treat all patterns as relative to the base directory, such as in
+                .dockerignore.
+        """
+        self.base = base
+        compiled: List[Tuple[str, bool, bool]] = []
+        for line in patterns:
+            pattern = line.rstrip()
+            if not pattern or pattern.startswith('#'):
+                continue
+            negate = pattern.startswith('!')
+            if negate:
+                pattern = pattern[1:]
+            dir_only = pattern.endswith('/')
+            pattern = pattern.rstrip('/')
+            if not pattern:
+                continue
+            is_anchored = anchored or '/' in pattern
+            regex = _translate_pattern(pattern.lstrip('/'))
+            compiled.append((regex if is_anchored else f'(?:.*/)?{regex}', negate, dir_only))
+
+        self._groups = []
+        for (negate, dir_only), group in itertools.groupby(compiled, key=lambda item: item[1:]):
+            regex = '|'.join(f'(?:{item[0]})' for item in group)
+            self._groups.append((re.compile(regex, re.DOTALL), negate, dir_only))
+
+    @classmethod
+    def from_file(
+        cls, path: Union[str, os.PathLike], base: str = '', anchored: bool = False
+    ) -> 'IgnoreRules':
+        """Reads patterns from an ignore file."""
+        with open(path, encoding='utf-8', errors='replace') as file:
+            return cls(file.read().splitlines(), base=base, anchored=anchored)
+
+    def match(self, path: str, is_dir: bool) -> Optional[bool]:
+        """Returns True if the path is ignored, False if it is explicitly not ignored with "!",
+        None if no patterns match.
+
+        Args:
+            path: path relative to the walk root, with forward slashes.
+            is_dir: True if the path is a directory.
+        """
+        if not path.startswith(self.base):
+            return None
+        path = path[len(self.base) :]
+        for regex, negate, dir_only in reversed(self._groups):
+            if (is_dir or not dir_only) and regex.fullmatch(path):
+                return not negate
+        return None
+
+
+def is_ignored(rules: List[IgnoreRules], path: str, is_dir: bool) -> bool:
+    """Returns True if the path is ignored, rules for nested directories take precedence."""
+    for rule in reversed(rules):
+        result = rule.match(path, is_dir)
+        if result is not None:
+            return result
+    return False
+
+
+def walk_files(
+    root: Union[str, os.PathLike],
+    patterns: Optional[Iterable[str]] = None,
+    ignore_files: Optional[Iterable[str]] = None,
+) -> List[str]:
+    """Returns files in a directory recursively, without ignored files.
+
+    Ignored directories are pruned, so their content is never listed.
+
+    Args:
+        root: directory.
+        patterns: gitignore-style patterns relative to the root, default is
+            `DEFAULT_IGNORE_PATTERNS`.
+        ignore_files: names of ignore files to read from directories, default is `IGNORE_FILES`.
+            Ignore files apply to the directory they are located in and its subdirectories.
+
+    Returns:
+        Sorted file paths relative to the root, with forward slashes.
+    """
+    patterns = DEFAULT_IGNORE_PATTERNS if patterns is None else patterns
+    ignore_files = IGNORE_FILES if ignore_files is None else ignore_files
+    result: List[str] = []
+
+    def walk(directory: str, prefix: str, rules: List[IgnoreRules]):
+        rules = list(rules)
+        for name in ignore_files:
+            anchored = name in ANCHORED_IGNORE_FILES
+            if anchored and prefix:
+                continue
+            ignore_path = os.path.join(directory, name)
+            if os.path.isfile(ignore_path):
+                rules.append(IgnoreRules.from_file(ignore_path, base=prefix, anchored=anchored))
+        with os.scandir(directory) as entries:
+            for entry in sorted(entries, key=lambda entry: entry.name):
+                path = f'{prefix}{entry.name}'
+                is_dir = entry.is_dir(follow_symlinks=False)
+                if not is_dir and not entry.is_file():
+                    # symbolic links to directories, sockets, and so on
+                    continue
+                if is_ignored(rules, path, is_dir):
+                    continue
+                if is_dir:
+                    walk(entry.path, f'{path}/', rules)
+                else:
+                    result.append(path)
+
+    walk(str(root), '', [IgnoreRules(patterns)])
+    return result
+
+
+class BundleStats(pydantic.BaseModel):
+    """Statistics of a bundle upload."""
+
+    files: int = 0
+    blobs: int = 0
+    uploaded: int = 0
+    uploaded_bytes: int = 0
+
+
+def runtime_file_paths(files: List[infractl.base.RuntimeFile]) -> Dict[str, pathlib.Path]:
+    """Returns local files for runtime files, mapped by relative paths in runtime.
+
+    A source with a trailing "/" is a directory, its content without ignored files is copied to
+    `dst` or to the current directory in runtime, otherwise a file is copied to `dst` or to a file
+    with the same name. Default ignore patterns are `RUNTIME_IGNORE_PATTERNS`, default ignore files
+    are `RUNTIME_IGNORE_FILES`.
+    """
+    result: Dict[str, pathlib.Path] = {}
+    for file in files:
+        if is_remote(file.src):
+            continue
+        if file.src.endswith('/'):
+            src = pathlib.Path(file.src)
+            dst = ''
+            if file.dst:
+                # dst is expected to be a directory, adding a trailing / if missing
+                dst = file.dst if file.dst.endswith('/') else f'{file.dst}/'
+            for path in walk_files(src, *runtime_ignore(file)):
+                result[f'{dst}{path}'] = src / path
+        else:
+            dst = file.dst or file.src
+            result[pathlib.Path(dst).name] = pathlib.Path(file.src)
+    return result
+
+
+def runtime_ignore(file: infractl.base.RuntimeFile) -> Tuple[List[str], List[str]]:
+    """Returns ignore patterns and ignore files for a directory with runtime files."""
+    patterns = RUNTIME_IGNORE_PATTERNS if file.ignore is None else file.ignore
+    ignore_files = RUNTIME_IGNORE_FILES if file.ignore_files is None else file.ignore_files
+    return patterns, ignore_files
+
+
+def is_remote(src: str) -> bool:
+    """Returns True if a runtime file source is a remote URI, which is fetched in runtime."""
+    return urllib.parse.urlparse(src).scheme in REMOTE_SCHEMES
+
+
+def pvc_claims(files: List[infractl.base.RuntimeFile]) -> List[str]:
+    """Returns persistent volume claims to mount in runtime for `pvc://` runtime files."""
+    return sorted(
+        {
+            urllib.parse.urlparse(file.src).netloc
+            for file in files
+            if urllib.parse.urlparse(file.src).scheme == 'pvc'
+        }
+    )
+
+
+def pvc_volume_name(claim: str) -> str:
+    """Returns a volume name for a persistent volume claim."""
+    return f'pvc-{claim}'[:63].rstrip('-')
+
+
+def remote_file(
+    file: infractl.base.RuntimeFile, sign: Optional[Callable[[str], str]] = None
+) -> bundle.RemoteFile:
+    """Returns a bundle entry for a remote runtime file.
+
+    Args:
+        file: runtime file with a remote URI as a source.
+        sign: function to get a presigned HTTP URL for an `s3://` URI.
+    """
+    url = urllib.parse.urlparse(file.src)
+    name = posixpath.basename(url.path.rstrip('/')) or url.netloc
+    dst = file.dst or name
+    if dst.endswith('/'):
+        dst = f'{dst}{name}'
+    if url.scheme == 'pvc':
+        # persistent volume claims are mounted in runtime, the file or directory is linked
+        return bundle.RemoteFile(
+            path=dst,
+            url=f'file://{PVC_MOUNT_PATH}/{url.netloc}{url.path}',
+            key=file.src,
+        )
+    if file.src.endswith('/'):
+        raise ValueError(f'Runtime file {file.src}: directories are supported only for pvc://')
+    if url.scheme == 's3':
+        if sign is None:
+            raise ValueError(f'Runtime file {file.src}: s3:// is not supported by the runtime')
+        return bundle.RemoteFile(path=dst, url=sign(file.src), key=file.src)
+    return bundle.RemoteFile(path=dst, url=file.src, key=file.src)
+
+
+def create_bundle(
+    files: List[infractl.base.RuntimeFile],
+    chunk_size: int = bundle.CHUNK_SIZE,
+    sign: Optional[Callable[[str], str]] = None,
+) -> Tuple[bundle.Bundle, Dict[str, Tuple[pathlib.Path, int]]]:
+    """Creates a bundle index for runtime files.
+
+    Returns the index and the blob sources, which map blob hashes to local files and offsets.
+    Remote files are added to the index as references, see `remote_file`.
+    """
+    index = bundle.Bundle(
+        chunk_size=chunk_size,
+        remote=[remote_file(file, sign) for file in files if is_remote(file.src)],
+    )
+    sources: Dict[str, Tuple[pathlib.Path, int]] = {}
+    for path, local_path in runtime_file_paths(files).items():
+        stat = local_path.stat()
+        chunks = bundle.hash_chunks(local_path, chunk_size)
+        for number, digest in enumerate(chunks):
+            sources.setdefault(digest, (local_path.absolute(), number * chunk_size))
+        index.files.append(
+            bundle.BundleFile(
+                path=path,
+                size=stat.st_size,
+                mode=stat.st_mode & 0o777,
+                chunks=chunks,
+            )
+        )
+    return index, sources
+
+
+def read_blob(index: bundle.Bundle, local_path: pathlib.Path, offset: int) -> bytes:
+    """Returns a compressed blob for the file chunk at the offset."""
+    data = io.BytesIO()
+    with open(local_path, 'rb') as file:
+        file.seek(offset)
+        bundle.write_blob(file, data, index.chunk_size, index.compression)
+    return data.getvalue()
+
+
+def upload_bundle(
+    files: List[infractl.base.RuntimeFile],
+    fs: fsspec.AbstractFileSystem,
+    index_path: str,
+    blobs_path: str,
+    chunk_size: int = bundle.CHUNK_SIZE,
+    sign: Optional[Callable[[str], str]] = None,
+) -> BundleStats:
+    """Uploads runtime files as a content-addressed bundle.
+
+    Writes the bundle index to `index_path` and uploads only blobs missing in `blobs_path`, see
+    `infractl.bundle` for details. `sign` returns presigned URLs for `s3://` runtime files.
+    """
+    blobs_path = blobs_path.rstrip('/')
+    index, sources = create_bundle(files, chunk_size, sign)
+
+    targets = {
+        f'{blobs_path}/{bundle.blob_path(digest, index.compression)}': source
+        for digest, source in sources.items()
+    }
+    # only blobs of the bundle are checked, since blobs_path is shared by all bundles
+    missing = set(_sync(fs, find_missing, fs, list(targets)))
+
+    stats = BundleStats(files=len(index.files), blobs=len(sources))
+    for target, (local_path, offset) in targets.items():
+        if target not in missing:
+            continue
+        fs.makedirs(posixpath.dirname(target), exist_ok=True)
+        # stream the compressed chunk to the remote file, without a temporary copy
+        with open(local_path, 'rb') as file, fs.open(target, 'wb') as blob_file:
+            file.seek(offset)
+            bundle.write_blob(file, blob_file, chunk_size, index.compression)
+            stats.uploaded_bytes += blob_file.tell()
+        stats.uploaded += 1
+
+    fs.makedirs(posixpath.dirname(index_path), exist_ok=True)
+    fs.pipe_file(index_path, index.dumps())
+    return stats
+
+
+async def bundle_uploads(
+    files: List[infractl.base.RuntimeFile],
+    fs: fsspec.asyn.AsyncFileSystem,
+    index_path: str,
+    blobs_path: str,
+    chunk_size: int = bundle.CHUNK_SIZE,
+    sign: Optional[Callable[[str], str]] = None,
+    max_concurrency: int = MAX_CONCURRENT_UPLOADS,
+) -> Dict[str, Upload]:
+    """Returns uploads for runtime files as a content-addressed bundle, for `put_all`.
+
+    Same as `upload_bundle`, but for an asynchronous file system, blobs that already exist in
+    `blobs_path` are skipped. Only blobs of the bundle are checked, with at most `max_concurrency`
+    concurrent requests, since `blobs_path` is shared by all bundles.
+    """
+    blobs_path = blobs_path.rstrip('/')
+    index, sources = await asyncio.to_thread(create_bundle, files, chunk_size, sign)
+    targets = {
+        f'{blobs_path}/{bundle.blob_path(digest, index.compression)}': source
+        for digest, source in sources.items()
+    }
+    missing = await find_missing(fs, list(targets), max_concurrency)
+
+    uploads: Dict[str, Upload] = {index_path: index.dumps()}
+    for target in missing:
+        local_path, offset = targets[target]
+        uploads[target] = functools.partial(read_blob, index, local_path, offset)
+    return uploads
+
+
+async def find_missing(
+    fs: fsspec.asyn.AsyncFileSystem,
+    paths: List[str],
+    max_concurrency: int = MAX_CONCURRENT_UPLOADS,
+) -> List[str]:
+    """Returns paths that do not exist, checking at most `max_concurrency` paths at once.
+
+    Args:
+        fs: asynchronous file system or a synchronous one, which is called in threads.
+        paths: remote paths.
+        max_concurrency: maximum number of concurrent requests.
+    """
+    # pylint: disable=protected-access
+    semaphore = asyncio.Semaphore(max_concurrency)
+    is_async = isinstance(fs, fsspec.asyn.AsyncFileSystem)
+
+    async def exists(path: str) -> bool:
+        async with semaphore:
+            if is_async:
+                return await fs._exists(path)
+            return await asyncio.to_thread(fs.exists, path)
+
+    found = await asyncio.gather(*(exists(path) for path in paths))
+    return [path for path, path_exists in zip(paths, found) if not path_exists]
+
+
+async def put_all(
+    fs: fsspec.asyn.AsyncFileSystem,
+    uploads: Dict[str, Upload],
+    max_concurrency: int = MAX_CONCURRENT_UPLOADS,
+) -> int:
+    """Uploads files concurrently, returns the number of uploaded bytes.
+
+    Args:
+        fs: asynchronous file system, such as `s3fs.S3FileSystem(asynchronous=True)`, or a
+            synchronous one, which is called in threads.
+        uploads: remote paths mapped to uploads, an upload is a local file (uploaded in parts if
+            the file system supports it), bytes or a function returning bytes (called in a thread).
+        max_concurrency: maximum number of concurrent uploads.
+    """
+    # pylint: disable=protected-access
+    semaphore = asyncio.Semaphore(max_concurrency)
+    is_async = isinstance(fs, fsspec.asyn.AsyncFileSystem)
+
+    async def put(rpath: str, upload: Upload) -> int:
+        async with semaphore:
+            if isinstance(upload, pathlib.Path):
+                if is_async:
+                    await fs._put_file(str(upload), rpath)
+                else:
+                    await asyncio.to_thread(fs.put_file, str(upload), rpath)
+                return upload.stat().st_size
+            if callable(upload):
+                upload = await asyncio.to_thread(upload)
+            if is_async:
+                await fs._pipe_file(rpath, upload)
             else:
-                dst = file.dst or file.src
-                cwd.add(name=file.src, arcname=pathlib.Path(dst).name)
+                await asyncio.to_thread(fs.pipe_file, rpath, upload)
+            return len(upload)
+
+    sizes = await asyncio.gather(*(put(rpath, upload) for rpath, upload in uploads.items()))
+    return sum(sizes)
+
+
+def _sync(fs: fsspec.AbstractFileSystem, function: Callable[..., Awaitable[T]], *args) -> T:
+    """Runs a coroutine function, such as `put_all`, for a synchronous file system."""
+    # a synchronous file system based on fsspec.asyn.AsyncFileSystem runs its own event loop
+    loop = fs.loop if isinstance(fs, fsspec.asyn.AsyncFileSystem) else fsspec.asyn.get_loop()
+    return fsspec.asyn.sync(loop, function, *args)
+
+
+def hash_file(path: Union[str, os.PathLike]) -> str:
+    """Returns SHA256 of the file content."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ManifestEntry(pydantic.BaseModel):
+    """File in a manifest."""
+
+    sha256: str
+    size: int
+    mtime_ns: int
+
+
+class Manifest(pydantic.BaseModel):
+    """Manifest of a synchronized directory, maps relative file paths to file entries."""
+
+    files: Dict[str, ManifestEntry] = {}
+
+
+class SyncStats(pydantic.BaseModel):
+    """Statistics of a directory synchronization."""
+
+    uploaded: int = 0
+    uploaded_bytes: int = 0
+    deleted: int = 0
+    unchanged: int = 0
+
+
+def read_manifest(fs: fsspec.AbstractFileSystem, manifest_path: str) -> Optional[Manifest]:
+    """Returns a manifest or None if it does not exist or cannot be read."""
+    try:
+        return Manifest.model_validate_json(fs.cat_file(manifest_path))
+    except FileNotFoundError:
+        return None
+    except (pydantic.ValidationError, ValueError) as error:
+        logger.warning('Ignoring invalid manifest %s: %s', manifest_path, error)
+        return None
+
+
+def sync_files(
+    local_path: Union[str, os.PathLike],
+    files: Iterable[str],
+    fs: fsspec.AbstractFileSystem,
+    remote_path: str,
+    manifest_path: Optional[str] = None,
+) -> SyncStats:
+    """Synchronizes local files to a remote directory.
+
+    Uploads only files that are changed since the last synchronization and deletes remote files
+    that do not exist locally anymore. The remote state is tracked with a manifest of file content
+    hashes, stored next to the remote directory. A file is hashed only if its size or modification
+    time differ from the manifest, so synchronizing an unchanged directory reads the manifest only.
+    Changed files are uploaded concurrently, see `put_all`.
+
+    Args:
+        local_path: local directory.
+        files: file paths relative to `local_path` to synchronize, other remote files are deleted.
+        fs: remote file system.
+        remote_path: remote directory.
+        manifest_path: manifest location, default is `{remote_path}.manifest.json`.
+    """
+    local_path = pathlib.Path(local_path)
+    remote_path = remote_path.rstrip('/')
+    manifest_path = manifest_path or f'{remote_path}{MANIFEST_SUFFIX}'
+    stats = SyncStats()
+
+    previous = read_manifest(fs, manifest_path)
+    if previous is None:
+        # unknown remote state, delete everything that is not uploaded
+        try:
+            # find() returns paths without a protocol, as the name of the directory
+            root = fs.info(remote_path)['name']
+        except FileNotFoundError:
+            previous_files = {}
+        else:
+            previous_files = {posixpath.relpath(path, root): None for path in fs.find(root)}
+    else:
+        previous_files = previous.files
+
+    manifest = Manifest()
+    uploads: Dict[str, Upload] = {}
+    for relative_path in sorted({pathlib.PurePath(path).as_posix() for path in files}):
+        stat = (local_path / relative_path).stat()
+        entry = previous_files.get(relative_path)
+        if entry and entry.size == stat.st_size and entry.mtime_ns == stat.st_mtime_ns:
+            manifest.files[relative_path] = entry
+            stats.unchanged += 1
+            continue
+        new_entry = ManifestEntry(
+            sha256=hash_file(local_path / relative_path),
+            size=stat.st_size,
+            mtime_ns=stat.st_mtime_ns,
+        )
+        manifest.files[relative_path] = new_entry
+        if entry and entry.sha256 == new_entry.sha256:
+            # touched, but not changed
+            stats.unchanged += 1
+            continue
+        uploads[f'{remote_path}/{relative_path}'] = local_path / relative_path
+
+    if uploads:
+        for directory in sorted({posixpath.dirname(target) for target in uploads}):
+            fs.makedirs(directory, exist_ok=True)
+        stats.uploaded = len(uploads)
+        stats.uploaded_bytes = _sync(fs, put_all, fs, uploads)
+
+    deleted = [f'{remote_path}/{path}' for path in previous_files if path not in manifest.files]
+    if deleted:
+        fs.rm(deleted)
+        stats.deleted = len(deleted)
+
+    if previous is None or manifest != previous:
+        fs.makedirs(posixpath.dirname(manifest_path), exist_ok=True)
+        fs.pipe_file(manifest_path, manifest.model_dump_json().encode('utf-8'))
+    return stats
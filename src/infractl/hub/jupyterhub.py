@@ -1,5 +1,6 @@
 """icl-hub JupyterHub commands."""
 
+import asyncio
 import base64
 import logging
 import subprocess
@@ -11,10 +12,17 @@ from kubernetes import client, stream
 
 import infractl.kubernetes as kube
 from infractl.hub import config, root
+from infractl.logging import get_logger
 
 JUPYTERHUB_NAMESPACE = 'jupyterhub'
 ICL_HUB_NAMESPACE = 'icl-hub'
 
+# Label selectors of JupyterHub pods, which are served from the shared pod informers
+POD_LABEL_SELECTORS = ('component=singleuser-server', 'component=hub')
+
+# Event loop of the started pod informers, see `start_informers`
+_informer_loop: Optional[asyncio.AbstractEventLoop] = None
+
 
 @root.cli.group()
 def jupyterhub():
@@ -137,28 +145,79 @@ def get_user_pod(username: str) -> Optional[client.V1Pod]:
 
 def get_user_pods(namespace: str) -> List[client.V1Pod]:
     """Returns a list of pods with JupyterHub user sessions."""
-    response = (
-        kube.api()
-        .core_v1()
-        .list_namespaced_pod(
-            namespace=namespace,
-            label_selector='component=singleuser-server',
-        )
-    )
-    return response.items
+    return list_pods(namespace, 'component=singleuser-server')
 
 
 def get_hub_pod(namespace: str) -> client.V1Pod:
     """Returns JupyterHub pod."""
+    return list_pods(namespace, 'component=hub')[0]
+
+
+async def start_informers(namespace: str = JUPYTERHUB_NAMESPACE) -> bool:
+    """Starts the shared pod informers of JupyterHub pods in the running event loop.
+
+    Called on startup of the icl-hub REST API, so its endpoints read pods from the informer
+    caches instead of listing them on every request. Returns False if the informers cannot be
+    started, for example, if the Kubernetes API is unreachable; pods are listed on each call then.
+    """
+    global _informer_loop  # pylint: disable=global-statement
+    try:
+        for label_selector in POD_LABEL_SELECTORS:
+            await kube.async_api().informer('pod', namespace, label_selector).sync()
+    except Exception as error:  # pylint: disable=broad-exception-caught
+        get_logger().warning('Cannot start pod informers, pods will be listed: %s', error)
+        return False
+    _informer_loop = asyncio.get_running_loop()
+    return True
+
+
+async def _informer_pods(namespace: str, label_selector: str) -> List[client.V1Pod]:
+    informer = kube.async_api().informer('pod', namespace, label_selector)
+    await informer.sync()
+    return informer.items()
+
+
+async def async_list_pods(namespace: str, label_selector: str) -> List[client.V1Pod]:
+    """Returns pods matching a label selector, in the event loop of the started informers.
+
+    Pods are read from the shared pod informer when the informers are started in the running
+    event loop, see `start_informers`, otherwise they are listed.
+    """
+    if _informer_loop is asyncio.get_running_loop():
+        return await _informer_pods(namespace, label_selector)
+    # Implicit else
+    return await asyncio.to_thread(list_pods, namespace, label_selector)
+
+
+def list_pods(namespace: str, label_selector: str) -> List[client.V1Pod]:
+    """Returns pods matching a label selector.
+
+    Pods are read from the shared pod informer when the informers are started, see
+    `start_informers`, otherwise they are listed. Prefer `async_list_pods` in the event loop of
+    the informers.
+    """
+    if _informer_loop is not None and _informer_loop.is_running():
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        if running_loop is _informer_loop:
+            # waiting for the loop in its own thread would never return, the informers are synced
+            # in `start_informers`, so the cache is read without waiting
+            return kube.async_api().informer('pod', namespace, label_selector).items()
+        return asyncio.run_coroutine_threadsafe(
+            _informer_pods(namespace, label_selector), _informer_loop
+        ).result()
+    # Implicit else
     response = (
         kube.api()
         .core_v1()
         .list_namespaced_pod(
             namespace=namespace,
-            label_selector='component=hub',
+            label_selector=label_selector,
         )
     )
-    return response.items[0]
+    return response.items
 
 
 def get_node_ip(name: str, external: bool = False) -> str:
@@ -1,5 +1,6 @@
 """icl-hub REST API."""
 
+import contextlib
 from typing import Optional
 
 import fastapi
@@ -7,7 +8,15 @@ import pydantic
 
 from infractl.hub import config, jupyterhub
 
-app = fastapi.FastAPI()
+
+@contextlib.asynccontextmanager
+async def lifespan(_: fastapi.FastAPI):
+    """Starts the JupyterHub pod informers, endpoints read pods from their caches if started."""
+    await jupyterhub.start_informers()
+    yield
+
+
+app = fastapi.FastAPI(lifespan=lifespan)
 
 
 class JupyterHubEnableSshRequest(pydantic.BaseModel):
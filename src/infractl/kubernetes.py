@@ -2,29 +2,107 @@
 
 from __future__ import annotations
 
+import asyncio
+import concurrent.futures
+import contextlib
+import datetime
+import functools
+import math
 import os
-import time
-from typing import Optional
+import threading
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
 
-from kubernetes import client, config
+import urllib3
+from kubernetes import client, config, watch
+
+import infractl.logging
+
+logger = infractl.logging.get_logger(__name__)
 
 DEFAULT_KUBE_API: Optional[KubeApi] = None
+DEFAULT_ASYNC_KUBE_API: Optional[AsyncKubeApi] = None
+
+# Maximum number of concurrent requests of the asynchronous API, also the size of the connection
+# pool shared by the synchronous and asynchronous API
+MAX_CONCURRENT_REQUESTS = 64
+
+# Default timeout in seconds for a single request of the asynchronous API
+REQUEST_TIMEOUT = 60
+
+# Extra time in seconds for a watch request over its server-side timeout
+WATCH_TIMEOUT_MARGIN = 30
+
+# Server-side timeout in seconds of a single watch request of an informer, watches are resumed from
+# the last resource version
+WATCH_TIMEOUT = 600
+
+# Maximum number of items of a stream, such as watch events or log lines, which are read ahead
+STREAM_BUFFER_SIZE = 1000
+
+# Extra seconds of logs requested when a log is resumed, lines up to the last one are skipped
+LOG_RESUME_MARGIN = 5
+
+# Timeout in seconds to wait for the next line of a followed log, the log is resumed after it, so a
+# half-open connection does not hold a worker thread
+LOG_READ_TIMEOUT = 300
+
+# Maximum number of consecutive attempts to resume a log and the maximum delay in seconds between
+# them
+LOG_MAX_RETRIES = 10
+LOG_MAX_RETRY_DELAY = 30
+
+# Maximum delay in seconds before an informer retries a failed list or watch
+INFORMER_MAX_RETRY_DELAY = 30
+
+# Resource kind -> API group and list method of informers
+INFORMER_KINDS: Dict[str, Tuple[str, str]] = {
+    'pod': ('core_v1', 'list_namespaced_pod'),
+    'job': ('batch_v1', 'list_namespaced_job'),
+}
+
+
+class KubernetesError(Exception):
+    """Kubernetes error."""
 
 
 class KubeApi:
     """Wrapper for Kubernetes client.
 
-    TODO: handle caching and re-authentication.
+    Credentials are loaded on creation and can be reloaded with `reload()`, for example, when
+    a token expires.
     """
 
-    def __init__(self):
+    def __init__(self, connection_pool_maxsize: Optional[int] = None):
+        """Creates Kubernetes client.
+
+        Args:
+            connection_pool_maxsize: maximum number of connections, default is the client default.
+        """
+        self.connection_pool_maxsize = connection_pool_maxsize
+        self.reload()
+
+    def reload(self):
+        """Loads configuration and credentials, replaces the API client."""
         if 'KUBERNETES_SERVICE_HOST' in os.environ and 'KUBERNETES_SERVICE_PORT' in os.environ:
             config.load_incluster_config()
-            self.configuration = client.Configuration.get_default_copy()
+            configuration = client.Configuration.get_default_copy()
         else:
-            self.configuration = client.Configuration()
-            config.load_kube_config(client_configuration=self.configuration)
-        self.api_client = client.ApiClient(configuration=self.configuration)
+            configuration = client.Configuration()
+            config.load_kube_config(client_configuration=configuration)
+        if self.connection_pool_maxsize:
+            configuration.connection_pool_maxsize = self.connection_pool_maxsize
+        self.configuration = configuration
+        self.api_client = client.ApiClient(configuration=configuration)
 
     def core_v1(self) -> client.CoreV1Api:
         """Returns Kubernetes CoreV1Api client."""
@@ -34,39 +112,578 @@ class KubeApi:
         """Returns Kubernetes BatchV1Api client."""
         return client.BatchV1Api(api_client=self.api_client)
 
-    def recreate_secret(self, namespace: str, body: client.V1Secret) -> client.V1Secret:
-        """Recreates Kubernetes secret."""
-        name = body.metadata.name
+
+class AsyncApiGroup:
+    """Asynchronous methods of a Kubernetes API group, such as `core_v1`."""
+
+    def __init__(self, async_kube_api: AsyncKubeApi, group: str):
+        self._async_kube_api = async_kube_api
+        self._group = group
+
+    def __getattr__(self, method: str):
+        return functools.partial(self._async_kube_api.call, self._group, method)
+
+
+class AsyncKubeApi:
+    """Asynchronous Kubernetes API.
+
+    Calls the synchronous client in a thread pool, so requests do not block the event loop and
+    many of them run concurrently:
+
+        pods = await kubernetes.async_api().core_v1.list_namespaced_pod(namespace='default')
+
+    All calls share the connection pool of `KubeApi` and have a timeout, `timeout` overrides it for
+    a single call. A call that fails with HTTP 401 Unauthorized reloads credentials and is retried
+    once. Watches run in their own threads, so long watches do not hold the thread pool.
+    """
+
+    kube_api: KubeApi
+    request_timeout: float
+
+    def __init__(
+        self,
+        kube_api: Optional[KubeApi] = None,
+        max_workers: int = MAX_CONCURRENT_REQUESTS,
+        request_timeout: float = REQUEST_TIMEOUT,
+    ):
+        """Creates asynchronous API.
+
+        Args:
+            kube_api: synchronous API, default is `api()`.
+            max_workers: maximum number of concurrent requests.
+            request_timeout: default timeout in seconds for a single request.
+        """
+        self.kube_api = kube_api or api()
+        self.request_timeout = request_timeout
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix='kube-api'
+        )
+        self._reload_lock = threading.Lock()
+        self._informers: Dict[Tuple[str, str, Optional[str]], Informer] = {}
+
+    @property
+    def core_v1(self) -> AsyncApiGroup:
+        """Returns asynchronous CoreV1Api methods."""
+        return AsyncApiGroup(self, 'core_v1')
+
+    @property
+    def batch_v1(self) -> AsyncApiGroup:
+        """Returns asynchronous BatchV1Api methods."""
+        return AsyncApiGroup(self, 'batch_v1')
+
+    def _reload(self, api_client: client.ApiClient):
+        """Reloads credentials once for all calls that failed with the same API client."""
+        with self._reload_lock:
+            if self.kube_api.api_client is api_client:
+                self.kube_api.reload()
+
+    def _method(self, group: Optional[str], method: str):
+        """Returns a synchronous method of an API group, or of `KubeApi` if group is None."""
+        if group is None:
+            return getattr(self.kube_api, method)
+        return getattr(getattr(self.kube_api, group)(), method)
+
+    def _call(self, group: Optional[str], method: str, args: tuple, kwargs: Dict[str, Any]) -> Any:
+        api_client = self.kube_api.api_client
         try:
-            self.core_v1().delete_namespaced_secret(name, namespace)
+            return self._method(group, method)(*args, **kwargs)
         except client.exceptions.ApiException as error:
-            if error.status != 404:
-                raise error
-        return self.core_v1().create_namespaced_secret(namespace, body=body)
-
-    def recreate_job(self, namespace: str, body: client.V1Job) -> client.V1Job:
-        """Recreates Kubernetes job."""
-        name = body.metadata.name
-        # retry deleting the job to avoid HTTP 409 Conflict, object is being deleted
-        for retries_left in reversed(range(5)):
+            if error.status != 401:
+                raise
+        self._reload(api_client)
+        return self._method(group, method)(*args, **kwargs)
+
+    async def call(
+        self, group: Optional[str], method: str, *args, timeout: Optional[float] = None, **kwargs
+    ) -> Any:
+        """Calls a method of an API group, or of `KubeApi` if group is None.
+
+        Args:
+            group: API group, such as `core_v1`.
+            method: method name, such as `list_namespaced_pod`.
+            args: method arguments.
+            timeout: timeout in seconds for a request of an API group, default is
+                `request_timeout`.
+            kwargs: method keyword arguments.
+        """
+        if group is not None:
+            kwargs.setdefault('_request_timeout', timeout or self.request_timeout)
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, functools.partial(self._call, group, method, args, kwargs)
+        )
+
+    def informer(self, kind: str, namespace: str, label_selector: Optional[str] = None) -> Informer:
+        """Returns the shared informer for a resource kind in a namespace, starts it if needed.
+
+        Args:
+            kind: resource kind, see `INFORMER_KINDS`.
+            namespace: Kubernetes namespace.
+            label_selector: label selector of cached objects, all objects by default.
+        """
+        key = (kind, namespace, label_selector)
+        informer = self._informers.get(key)
+        if informer is None or not informer.is_running():
+            informer = Informer(self, kind, namespace, label_selector)
+            self._informers[key] = informer
+        informer.start()
+        return informer
+
+    async def _iterate(
+        self, iterate: Callable[[], Iterator[Any]], stop: Callable[[], None]
+    ) -> AsyncIterator[Any]:
+        """Yields items of a blocking iterator, which runs in its own thread.
+
+        The thread stops when STREAM_BUFFER_SIZE items are not consumed yet, so a slow consumer
+        does not buffer a whole stream in memory. `stop` is called when the iterator is closed.
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        # the number of items put to the queue and not consumed yet
+        buffered = 0
+        consumed = threading.Condition()
+        stopped = threading.Event()
+
+        def put(item: tuple) -> bool:
+            nonlocal buffered
+            with consumed:
+                while buffered >= STREAM_BUFFER_SIZE:
+                    if stopped.is_set():
+                        return False
+                    consumed.wait(timeout=1)
+                buffered += 1
+            with contextlib.suppress(RuntimeError):  # the event loop is closed
+                loop.call_soon_threadsafe(queue.put_nowait, item)
+            return not stopped.is_set()
+
+        def run():
+            api_client = self.kube_api.api_client
             try:
-                self.batch_v1().delete_namespaced_job(
-                    name,
-                    namespace,
-                    propagation_policy='Foreground',
-                )
+                for item in iterate():
+                    if not put(('item', item)):
+                        return
             except client.exceptions.ApiException as error:
-                if error.status == 404:
-                    break
-                elif retries_left == 0:
-                    raise error
-            time.sleep(1)
-        return self.batch_v1().create_namespaced_job(namespace, body=body)
+                if error.status == 401:
+                    self._reload(api_client)
+                put(('error', error))
+            except Exception as error:  # pylint: disable=broad-exception-caught
+                put(('error', error))
+            put(('done', None))
+
+        threading.Thread(target=run, name='kube-api-stream', daemon=True).start()
+        try:
+            while True:
+                kind, value = await queue.get()
+                with consumed:
+                    buffered -= 1
+                    consumed.notify()
+                if kind == 'done':
+                    return
+                if kind == 'error':
+                    raise value
+                yield value
+        finally:
+            stopped.set()
+            with consumed:
+                consumed.notify()
+            # the thread ends on the next item or when the request times out
+            stop()
+
+    async def watch(self, group: str, method: str, *args, **kwargs) -> AsyncIterator[Any]:
+        """Yields watch events of a list method, or lines of `read_namespaced_pod_log`.
+
+        The watch ends when its server-side `timeout_seconds` expires or the iterator is closed.
+        """
+        if 'timeout_seconds' in kwargs:
+            kwargs.setdefault('_request_timeout', kwargs['timeout_seconds'] + WATCH_TIMEOUT_MARGIN)
+        stream_watch = watch.Watch()
+        items = self._iterate(
+            functools.partial(stream_watch.stream, self._method(group, method), *args, **kwargs),
+            stream_watch.stop,
+        )
+        async with contextlib.aclosing(items):
+            async for item in items:
+                yield item
+
+    async def read_lines(self, group: str, method: str, *args, **kwargs) -> AsyncIterator[str]:
+        """Yields lines of a response, such as of `read_namespaced_pod_log`, as they are read."""
+        kwargs.setdefault('_request_timeout', self.request_timeout)
+        responses: List[Any] = []
+
+        def iterate() -> Iterator[str]:
+            response = self._method(group, method)(*args, _preload_content=False, **kwargs)
+            responses.append(response)
+            try:
+                yield from watch.watch.iter_resp_lines(response)
+            finally:
+                response.release_conn()
+
+        def stop():
+            for response in responses:
+                response.close()
+
+        items = self._iterate(iterate, stop)
+        async with contextlib.aclosing(items):
+            async for item in items:
+                yield item
+
+    async def follow_log(
+        self,
+        namespace: str,
+        name: str,
+        container: Optional[str] = None,
+        tail_lines: Optional[int] = None,
+        follow: bool = True,
+    ) -> AsyncIterator[str]:
+        """Yields log lines of a pod container.
+
+        A followed log is resumed when the connection is lost or no line is read for
+        `LOG_READ_TIMEOUT` seconds while the container is running or waiting to start: logs are
+        requested again since the timestamp of the last line and lines up to it are skipped.
+
+        Args:
+            namespace: pod namespace.
+            name: pod name.
+            container: container name, required if the pod has many containers.
+            tail_lines: number of last lines to start with, all lines by default.
+            follow: True to follow the log until the container terminates, False to return the
+                lines logged so far.
+        """
+        kwargs: Dict[str, Any] = {'name': name, 'namespace': namespace, 'timestamps': True}
+        if container is not None:
+            kwargs['container'] = container
+        if tail_lines is not None:
+            kwargs['tail_lines'] = tail_lines
+        if follow:
+            kwargs['_request_timeout'] = (self.request_timeout, LOG_READ_TIMEOUT)
+        # timestamp of the last line and the number of lines with this timestamp
+        last: Optional[LogTimestamp] = None
+        last_count = 0
+        failures = 0
+        while True:
+            skip = last_count
+            failed = False
+            lines = (
+                self.watch('core_v1', 'read_namespaced_pod_log', **kwargs)
+                if follow
+                else self.read_lines('core_v1', 'read_namespaced_pod_log', **kwargs)
+            )
+            try:
+                async with contextlib.aclosing(lines):
+                    async for line in lines:
+                        timestamp, _, text = line.partition(' ')
+                        try:
+                            key = LogTimestamp.parse(timestamp)
+                        except ValueError:
+                            yield line
+                            continue
+                        # skip lines logged before the log was resumed
+                        if last is not None and key < last:
+                            continue
+                        if key == last and skip > 0:
+                            skip -= 1
+                            continue
+                        if key != last:
+                            last, last_count = key, 0
+                        last_count += 1
+                        failures = 0
+                        yield text
+                if not follow:
+                    return
+            except Exception as error:  # pylint: disable=broad-exception-caught
+                if not follow:
+                    raise
+                # 400 Bad Request: the container is waiting to start
+                if isinstance(error, client.exceptions.ApiException) and (
+                    error.status != 400 and error.status < 500
+                ):
+                    raise
+                logger.debug('Reading log of %s failed: %s', name, error)
+                # waiting for the container or a quiet container is not a failure
+                if isinstance(error, client.exceptions.ApiException):
+                    failed = error.status != 400
+                else:
+                    failed = not isinstance(
+                        error, (urllib3.exceptions.ReadTimeoutError, TimeoutError)
+                    )
+            if not await self._container_active(namespace, name, container):
+                return
+            if failed:
+                failures += 1
+                if failures > LOG_MAX_RETRIES:
+                    raise KubernetesError(f'Log of pod {name} is not available')
+            await asyncio.sleep(min(2**failures, LOG_MAX_RETRY_DELAY))
+            if last is not None:
+                kwargs.pop('tail_lines', None)
+                kwargs['since_seconds'] = last.since_seconds() + LOG_RESUME_MARGIN
+
+    async def _container_active(self, namespace: str, name: str, container: Optional[str]) -> bool:
+        """Returns True if a pod container is running or waiting to start."""
+        try:
+            pod: client.V1Pod = await self.core_v1.read_namespaced_pod(name, namespace)
+        except client.exceptions.ApiException as error:
+            if error.status == 404:
+                return False
+            raise
+        if pod.status.phase in ('Succeeded', 'Failed'):
+            return False
+        for status in pod.status.container_statuses or []:
+            if container in (None, status.name):
+                return status.state is None or status.state.terminated is None
+        return True
+
+
+class LogTimestamp(NamedTuple):
+    """Timestamp of a log line, which sorts by time."""
+
+    time: datetime.datetime
+    nanoseconds: int
+
+    @classmethod
+    def parse(cls, text: str) -> LogTimestamp:
+        """Parses an RFC 3339 timestamp in UTC, such as `2024-01-02T03:04:05.123456789Z`."""
+        if not text.endswith('Z'):
+            raise ValueError(f'Invalid log timestamp: {text}')
+        seconds, _, fraction = text[:-1].partition('.')
+        time = datetime.datetime.fromisoformat(seconds).replace(tzinfo=datetime.timezone.utc)
+        return cls(time, int(fraction.ljust(9, '0')[:9]))
+
+    def since_seconds(self) -> int:
+        """Returns the number of seconds since this timestamp, rounded up."""
+        now = datetime.datetime.now(datetime.timezone.utc)
+        return max(1, math.ceil((now - self.time).total_seconds()))
+
+
+async def merge_lines(iterators: Dict[str, AsyncIterator[str]]) -> AsyncIterator[str]:
+    """Yields lines of many iterators as they come, prefixed with their keys.
+
+    Iterators are read concurrently, the first error of any of them is raised.
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=STREAM_BUFFER_SIZE)
+
+    async def read(prefix: str, lines: AsyncIterator[str]):
+        async with contextlib.aclosing(lines):
+            async for line in lines:
+                await queue.put(('line', f'{prefix}{line}'))
+
+    tasks = [asyncio.create_task(read(prefix, lines)) for prefix, lines in iterators.items()]
+
+    async def read_all():
+        try:
+            await asyncio.gather(*tasks)
+        except Exception as error:  # pylint: disable=broad-exception-caught
+            await queue.put(('error', error))
+        else:
+            await queue.put(('done', None))
+
+    reader = asyncio.create_task(read_all())
+    try:
+        while True:
+            kind, value = await queue.get()
+            if kind == 'done':
+                return
+            if kind == 'error':
+                raise value
+            yield value
+    finally:
+        for task in [*tasks, reader]:
+            task.cancel()
+
+
+EventHandler = Callable[[str, Any], None]
+
+
+class Informer:
+    """Cache of Kubernetes objects of one kind in a namespace, kept up to date with a watch.
+
+    An informer lists objects once and then watches them, resuming the watch from the last resource
+    version, so any number of users share a single list and watch request. Handlers are called with
+    the event type (`ADDED`, `MODIFIED` or `DELETED`) and the object for each change, and
+    `wait_for()` waits until a predicate holds after a change:
+
+        informer = kubernetes.async_api().informer('pod', 'default')
+        await informer.wait_for(lambda: 'pod-1' not in informer.objects, timeout=60)
+
+    Objects are listed again if the resource version expires (HTTP 410 Gone), failed requests are
+    retried with a backoff. If the first list fails, the informer stops and waiters get the error.
+    Informers are bound to the event loop they are started in.
+    """
+
+    objects: Dict[str, Any]
+    """Cached objects by name."""
+
+    def __init__(
+        self,
+        async_kube_api: AsyncKubeApi,
+        kind: str,
+        namespace: str,
+        label_selector: Optional[str] = None,
+    ):
+        """Creates informer, see `AsyncKubeApi.informer`."""
+        if kind not in INFORMER_KINDS:
+            raise ValueError(f'Unsupported informer kind: {kind}')
+        self.async_api = async_kube_api
+        self.kind = kind
+        self.namespace = namespace
+        self.label_selector = label_selector
+        self.objects = {}
+        self.handlers: List[EventHandler] = []
+        self._synced = False
+        self._error: Optional[Exception] = None
+        self._condition: Optional[asyncio.Condition] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Starts listing and watching objects in the running event loop, if not started yet."""
+        if self._task is None:
+            self._condition = asyncio.Condition()
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        """Stops watching objects."""
+        if self._task is not None:
+            self._task.cancel()
+
+    def is_running(self) -> bool:
+        """Returns True if the informer is running in the current event loop."""
+        if self._task is None or self._task.done():
+            return False
+        return self._task.get_loop() is asyncio.get_running_loop()
+
+    def add_handler(self, handler: EventHandler):
+        """Adds a handler of changes, which is called with the event type and the object."""
+        self.handlers.append(handler)
+
+    def remove_handler(self, handler: EventHandler):
+        """Removes a handler of changes."""
+        with contextlib.suppress(ValueError):
+            self.handlers.remove(handler)
+
+    def items(self, labels: Optional[Dict[str, str]] = None) -> List[Any]:
+        """Returns cached objects, only the ones with all `labels` if specified."""
+        return [
+            item
+            for item in self.objects.values()
+            if not labels
+            or all((item.metadata.labels or {}).get(key) == value for key, value in labels.items())
+        ]
+
+    def _check(self, predicate: Callable[[], bool]) -> bool:
+        if self._error is not None:
+            raise self._error
+        return self._synced and predicate()
+
+    async def wait_for(self, predicate: Callable[[], bool], timeout: Optional[float] = None):
+        """Waits until objects are listed and `predicate` returns True.
+
+        The predicate is checked after each change, once all handlers are called.
+
+        Raises:
+            asyncio.TimeoutError: if `timeout` in seconds expires.
+        """
+        self.start()
+
+        async def wait():
+            async with self._condition:
+                await self._condition.wait_for(functools.partial(self._check, predicate))
+
+        await asyncio.wait_for(wait(), timeout)
+
+    async def sync(self, timeout: Optional[float] = None):
+        """Waits until objects are listed."""
+        await self.wait_for(lambda: True, timeout=timeout)
+
+    async def _notify(self):
+        async with self._condition:
+            self._condition.notify_all()
+
+    def _handle(self, event_type: str, item: Any):
+        name = item.metadata.name
+        if event_type == 'DELETED':
+            self.objects.pop(name, None)
+        else:
+            self.objects[name] = item
+        for handler in list(self.handlers):
+            try:
+                handler(event_type, item)
+            except Exception:  # pylint: disable=broad-exception-caught
+                logger.exception('Informer handler failed for %s %s', self.kind, name)
+
+    async def _list(self) -> str:
+        """Lists objects and calls handlers for changes, returns the resource version."""
+        group, method = INFORMER_KINDS[self.kind]
+        item_list = await self.async_api.call(
+            group, method, namespace=self.namespace, label_selector=self.label_selector
+        )
+        names = set()
+        for item in item_list.items:
+            names.add(item.metadata.name)
+            cached = self.objects.get(item.metadata.name)
+            if cached is None:
+                self._handle('ADDED', item)
+            elif cached.metadata.resource_version != item.metadata.resource_version:
+                self._handle('MODIFIED', item)
+        for name in [name for name in self.objects if name not in names]:
+            self._handle('DELETED', self.objects[name])
+        self._synced = True
+        await self._notify()
+        return item_list.metadata.resource_version
+
+    async def _watch(self, resource_version: str) -> str:
+        """Watches objects until the watch times out, returns the last resource version."""
+        group, method = INFORMER_KINDS[self.kind]
+        events = self.async_api.watch(
+            group,
+            method,
+            namespace=self.namespace,
+            label_selector=self.label_selector,
+            resource_version=resource_version,
+            allow_watch_bookmarks=True,
+            timeout_seconds=WATCH_TIMEOUT,
+        )
+        async with contextlib.aclosing(events):
+            async for event in events:
+                item = event['object']
+                resource_version = item.metadata.resource_version
+                if event['type'] != 'BOOKMARK':
+                    self._handle(event['type'], item)
+                    await self._notify()
+        return resource_version
+
+    async def _run(self):
+        resource_version = None
+        failures = 0
+        while True:
+            try:
+                if resource_version is None:
+                    resource_version = await self._list()
+                resource_version = await self._watch(resource_version)
+                failures = 0
+            except Exception as error:  # pylint: disable=broad-exception-caught
+                if not self._synced:
+                    # waiters raise the error, `AsyncKubeApi.informer` replaces this informer
+                    self._error = error
+                    await self._notify()
+                    return
+                resource_version = None
+                # 410 Gone: the resource version is too old, list objects again
+                if isinstance(error, client.exceptions.ApiException) and error.status == 410:
+                    continue
+                failures += 1
+                logger.warning('Watching %s in %s failed: %s', self.kind, self.namespace, error)
+                await asyncio.sleep(min(2**failures, INFORMER_MAX_RETRY_DELAY))
 
 
 def api() -> KubeApi:
     """Returns default KubeApi object."""
     global DEFAULT_KUBE_API
     if DEFAULT_KUBE_API is None:
-        DEFAULT_KUBE_API = KubeApi()
+        DEFAULT_KUBE_API = KubeApi(connection_pool_maxsize=MAX_CONCURRENT_REQUESTS)
     return DEFAULT_KUBE_API
+
+
+def async_api() -> AsyncKubeApi:
+    """Returns default AsyncKubeApi object, which shares the connection pool with `api()`."""
+    global DEFAULT_ASYNC_KUBE_API
+    if DEFAULT_ASYNC_KUBE_API is None:
+        DEFAULT_ASYNC_KUBE_API = AsyncKubeApi()
+    return DEFAULT_ASYNC_KUBE_API
@@ -0,0 +1,294 @@
+"""Bootstraps a program in a Kubernetes runtime container.
+
+Downloads the program and its data, installs requirements, extracts runtime files, runs the engine
+and uploads the result. This module is the container entry point and runs before any runtime
+dependencies are installed, so it must depend only on the standard library. The container has no
+storage credentials: every object is accessed with a presigned URL from the run manifest, which is
+itself downloaded with a presigned URL. The runtime passes the source of this module inline:
+
+    python -c "$(cat bootstrap.py)" --manifest https://... -- program.py --entrypoint main
+
+The run manifest is a JSON object:
+* `code` - relative path -> URL of files to download to the working directory.
+* `data` - relative path -> URL of files to download to the data directory (engine and modules).
+* `blobs` - blob path -> URL of blobs for runtime files.
+* `parameters` - encoded program parameters or null.
+* `result` - URL to upload the result to.
+* `wheelhouse` - null or an object with the wheelhouse `key` and URLs `get` and, for the pod that
+  builds a missing wheelhouse, `put` of the wheelhouse archive.
+* `shards` - null or a list of objects with `parameters`, `result` and `wheelhouse` for each
+  completion index of an Indexed Job, which replace the ones above.
+
+Requirements are installed with `wheelhouse.py` and runtime files are extracted with `bundle.py`
+from the downloaded data, see `infractl.wheelhouse` and `infractl.bundle`. `file://` URLs are
+supported as well, for tests and benchmarks.
+
+Environment variables (set for each run by the runner):
+* `ICL_MANIFEST_URL` - URL of the run manifest, if `--manifest` is not specified.
+* `JOB_COMPLETION_INDEX` - completion index of an Indexed Job (set by Kubernetes).
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import json
+import os
+import pathlib
+import shutil
+import ssl
+import subprocess  # nosec B404
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from typing import Any, Dict, List, Optional, Union
+
+# Timeout in seconds for storage requests
+HTTP_TIMEOUT = 60
+
+# Number of attempts for storage requests
+HTTP_ATTEMPTS = 3
+
+# Environment variable with the URL of the run manifest
+MANIFEST_ENV = 'ICL_MANIFEST_URL'
+
+# Environment variable with the completion index of a pod in an Indexed Job
+COMPLETION_INDEX_ENV = 'JOB_COMPLETION_INDEX'
+
+# Name of the result file written by the engine in the data directory, see `engine.RESULT_NAME`
+RESULT_NAME = 'result.bin'
+
+
+class BootstrapError(Exception):
+    """Bootstrap error."""
+
+
+def strip_query(url: str) -> str:
+    """Returns a URL without the query, so presigned URLs are not logged with signatures."""
+    return url.split('?', 1)[0]
+
+
+class Storage:
+    """Object storage for presigned `http(s)://` URLs and `file://` URLs."""
+
+    def __init__(self, verify: bool = True):
+        """Creates storage.
+
+        Args:
+            verify: False to skip verification of the server certificate.
+        """
+        self.context = None
+        if not verify:
+            self.context = ssl._create_unverified_context()  # nosec B323
+
+    def request(
+        self, method: str, url: str, payload: Union[bytes, pathlib.Path, None] = None
+    ) -> Optional[bytes]:
+        """Sends a request, returns the response body or None if an object does not exist.
+
+        A payload file is streamed, so large results are not read into memory.
+        """
+        for attempt in range(HTTP_ATTEMPTS):
+            try:
+                with contextlib.ExitStack() as stack:
+                    data: Any = payload
+                    headers = {}
+                    if isinstance(payload, pathlib.Path):
+                        data = stack.enter_context(payload.open('rb'))
+                        headers['Content-Length'] = str(payload.stat().st_size)
+                    request = urllib.request.Request(url, data=data, headers=headers, method=method)
+                    with urllib.request.urlopen(  # nosec B310 - URLs from the run manifest
+                        request, timeout=HTTP_TIMEOUT, context=self.context
+                    ) as response:
+                        return response.read()
+            except urllib.error.HTTPError as error:
+                if error.code == 404:
+                    return None
+                if error.code < 500 or attempt == HTTP_ATTEMPTS - 1:
+                    raise BootstrapError(
+                        f'{method} {strip_query(url)}: HTTP {error.code}'
+                    ) from error
+            except OSError as error:
+                if attempt == HTTP_ATTEMPTS - 1:
+                    raise BootstrapError(f'{method} {strip_query(url)}: {error}') from error
+            time.sleep(2**attempt)
+        raise BootstrapError(f'{method} {strip_query(url)}: no attempts left')
+
+    def find(self, url: str) -> Optional[bytes]:
+        """Returns an object or None if it does not exist."""
+        if url.startswith('file://'):
+            path = pathlib.Path(urllib.parse.urlparse(url).path)
+            return path.read_bytes() if path.exists() else None
+        return self.request('GET', url)
+
+    def get(self, url: str) -> bytes:
+        """Returns an object."""
+        data = self.find(url)
+        if data is None:
+            raise BootstrapError(f'GET {strip_query(url)}: not found')
+        return data
+
+    def put(self, url: str, data: Union[bytes, pathlib.Path]):
+        """Uploads an object from bytes or from a file."""
+        if url.startswith('file://'):
+            path = pathlib.Path(urllib.parse.urlparse(url).path)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            if isinstance(data, pathlib.Path):
+                shutil.copyfile(data, path)
+            else:
+                path.write_bytes(data)
+            return
+        self.request('PUT', url, data)
+
+    def download(self, urls: Dict[str, str], target: pathlib.Path):
+        """Downloads objects to relative paths in a directory."""
+        for path, url in urls.items():
+            local_path = target / path
+            local_path.parent.mkdir(parents=True, exist_ok=True)
+            local_path.write_bytes(self.get(url))
+
+
+def select_shard(manifest: Dict[str, Any]) -> Dict[str, Any]:
+    """Returns the run manifest for the completion index of this pod, if the run is sharded."""
+    if manifest.get('shards') is None:
+        return manifest
+    index = os.environ.get(COMPLETION_INDEX_ENV)
+    if index is None:
+        raise BootstrapError(f'Sharded run requires ${COMPLETION_INDEX_ENV}')
+    return {**manifest, **manifest['shards'][int(index)]}
+
+
+def install_requirements(
+    storage: Storage, data_dir: pathlib.Path, wheelhouse_urls: Optional[Dict[str, str]]
+) -> bool:
+    """Installs requirements from the data directory, returns False if there are none."""
+    requirements_path = data_dir / 'requirements.txt'
+    if not requirements_path.exists():
+        return False
+    if not wheelhouse_urls:
+        subprocess.run(  # nosec B603
+            [sys.executable, '-m', 'pip', 'install', '-r', str(requirements_path)], check=True
+        )
+        return True
+    # pylint: disable=import-outside-toplevel
+    import wheelhouse
+
+    # the wheelhouse is stored as a single archive, since presigned URLs cannot list objects
+    def get(_: str, path: pathlib.Path):
+        data = storage.find(wheelhouse_urls['get'])
+        if data is not None:
+            wheelhouse.unpack(data, path)
+
+    def put(path: pathlib.Path, _: str):
+        storage.put(wheelhouse_urls['put'], wheelhouse.pack(path))
+
+    # only one pod of a run can upload the wheelhouse
+    wheelhouse.install(
+        requirements_path,
+        get,
+        put if wheelhouse_urls.get('put') else None,
+        wheelhouse_key=wheelhouse_urls['key'],
+    )
+    return True
+
+
+def extract_bundle(storage: Storage, data_dir: pathlib.Path, blobs: Dict[str, str]) -> bool:
+    """Extracts runtime files to the current directory, returns False if there are none."""
+    if not (data_dir / 'bundle.py').exists():
+        return False
+    # pylint: disable=import-outside-toplevel
+    import bundle
+
+    def fetch(path: str) -> bytes:
+        if path not in blobs:
+            raise BootstrapError(f'No URL for blob {path}')
+        return storage.get(blobs[path])
+
+    stats = bundle.extract(
+        bundle.Bundle.loads((data_dir / bundle.INDEX_NAME).read_bytes()),
+        '.',
+        fetch=fetch,
+        cache_dir=os.environ.get(bundle.BLOB_CACHE_ENV),
+    )
+    print(f'[infractl.bootstrap] {stats}', file=sys.stderr)
+    return True
+
+
+def create_parser() -> argparse.ArgumentParser:
+    """Creates argument parser."""
+    parser = argparse.ArgumentParser(description='Bootstraps a program in a container')
+    parser.add_argument(
+        '--manifest',
+        default=os.environ.get(MANIFEST_ENV),
+        help=f'URL of the run manifest (default: ${MANIFEST_ENV})',
+    )
+    parser.add_argument(
+        '--insecure', action='store_true', help='Do not verify the storage server certificate'
+    )
+    parser.add_argument('engine_args', nargs=argparse.REMAINDER, help='Engine arguments')
+    return parser
+
+
+def run(args: argparse.Namespace, storage: Storage) -> int:
+    """Runs the program, returns the exit code of the engine."""
+    if not args.manifest:
+        raise BootstrapError(f'Run manifest is required, use --manifest or ${MANIFEST_ENV}')
+
+    # stage -> time in seconds
+    timings: Dict[str, float] = {}
+    start = time.perf_counter()
+
+    def stage(name: str):
+        nonlocal start
+        now = time.perf_counter()
+        timings[name] = now - start
+        start = now
+
+    data_dir = pathlib.Path(tempfile.mkdtemp())
+    try:
+        manifest = select_shard(json.loads(storage.get(args.manifest)))
+        storage.download(manifest['code'], pathlib.Path('.'))
+        storage.download(manifest['data'], data_dir)
+        if manifest.get('parameters') is not None:
+            (data_dir / 'parameters.json').write_text(manifest['parameters'], encoding='utf-8')
+        stage('download')
+
+        # in-container modules are shipped with the data
+        sys.path.insert(0, str(data_dir))
+        if install_requirements(storage, data_dir, manifest.get('wheelhouse')):
+            stage('requirements')
+        if extract_bundle(storage, data_dir, manifest.get('blobs') or {}):
+            stage('files')
+        print(
+            '[infractl.bootstrap] '
+            + ', '.join(f'{name}: {seconds:.3f}s' for name, seconds in timings.items()),
+            file=sys.stderr,
+        )
+
+        engine_args = args.engine_args[1:] if args.engine_args[:1] == ['--'] else args.engine_args
+        env = os.environ.copy()
+        env['PYTHONPATH'] = os.pathsep.join(filter(None, [os.getcwd(), env.get('PYTHONPATH')]))
+        sys.stdout.flush()
+        process = subprocess.run(  # nosec B603
+            [sys.executable, str(data_dir / 'engine.py'), *engine_args], env=env, check=False
+        )
+
+        result_path = data_dir / RESULT_NAME
+        if manifest.get('result') and result_path.exists():
+            storage.put(manifest['result'], result_path)
+        return process.returncode
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def main(argv: Optional[List[str]] = None):
+    """Entry point."""
+    args = create_parser().parse_args(argv)
+    sys.exit(run(args, Storage(verify=not args.insecure)))
+
+
+if __name__ == '__main__':
+    main()
@@ -2,17 +2,75 @@
 
 Support calling a custom entrypoint (function) in the program. Also handles serialization and
 deserialization of program or function parameters and the result.
+
+This module is executed in the container before runtime dependencies are installed, so it must
+depend only on the standard library. Objects that are not supported by JSON are encoded with their
+class name and decoded with the class: pydantic models (with `model_dump` and `model_validate`),
+dataclasses, enums, dates and times, bytes, sets and types constructed from a string, such as
+`decimal.Decimal`, `uuid.UUID` and `pathlib.Path`.
+
+Results are written in a binary container: a version header followed by frames encoded with a
+codec and optionally compressed, see `write` and `read`. The default codec is pickle protocol 5
+with out-of-band buffers, so large buffers (such as NumPy arrays) are written as separate frames
+without copying and are read as views of the container, which can be memory-mapped with
+`read_file`. Arrow tables and pandas data frames are written in Arrow IPC format if `pyarrow` is
+installed. Codecs are registered with `register_codec`. Parameters are JSON, or a base64 container
+if JSON does not support them.
 """
 
 import argparse
+import base64
+import dataclasses
+import datetime
+import decimal
+import enum
 import importlib
+import importlib.util
+import io
 import json
+import mmap
+import os
 import pathlib
+import pickle  # nosec B403 - results of the user's own program
 import runpy
+import struct
 import sys
-from typing import Any
+import uuid
+import zlib
+from typing import Any, BinaryIO, Callable, Dict, List, Optional, Tuple
+
+# Types encoded as a string and decoded with the type constructor
+STRING_TYPES = (decimal.Decimal, uuid.UUID, pathlib.PurePath)
+
+# Types encoded in ISO 8601 format
+ISO_TYPES = (datetime.datetime, datetime.date, datetime.time)
+
+# Container prefix: magic, format version and header size, followed by the JSON header and frames
+MAGIC = b'ICLC'
+FORMAT_VERSION = 1
+PREFIX = struct.Struct('<4sBI')
 
-import pydantic.json
+# Frames are aligned to this number of bytes, so buffers of a memory-mapped container are aligned
+FRAME_ALIGNMENT = 64
+
+# Environment variables with the codec and compression of the result, see `CODECS` and
+# `COMPRESSIONS`
+RESULT_CODEC_ENV = 'ICL_RESULT_CODEC'
+RESULT_COMPRESSION_ENV = 'ICL_RESULT_COMPRESSION'
+
+# Name of the result file next to this module
+RESULT_NAME = 'result.bin'
+
+# Compression name -> compress and decompress functions, bz2 and lzma are optional modules
+COMPRESSIONS: Dict[str, Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]] = {
+    'zlib': (zlib.compress, zlib.decompress)
+}
+for _name in ('bz2', 'lzma'):
+    try:
+        _module = importlib.import_module(_name)
+    except ImportError:
+        continue
+    COMPRESSIONS[_name] = (_module.compress, _module.decompress)
 
 
 def get_full_name(obj: Any) -> str:
@@ -33,21 +91,52 @@ def from_full_name(name: str) -> Any:
     return getattr(module, member_name)
 
 
+def encode_data(obj: Any) -> Any:
+    """Returns JSON data for an object, which is not supported by JSON."""
+    if hasattr(obj, 'model_dump'):
+        # pydantic model
+        return obj.model_dump(mode='json')
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        # fields are encoded recursively
+        return {field.name: getattr(obj, field.name) for field in dataclasses.fields(obj)}
+    if isinstance(obj, enum.Enum):
+        return obj.value
+    if isinstance(obj, ISO_TYPES):
+        return obj.isoformat()
+    if isinstance(obj, (bytes, bytearray)):
+        return base64.b64encode(obj).decode('ascii')
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if isinstance(obj, STRING_TYPES):
+        return str(obj)
+    raise TypeError(f'Object of type {obj.__class__.__name__} is not JSON serializable')
+
+
+def decode_data(cls: type, data: Any) -> Any:
+    """Returns an object of the class for JSON data, see `encode_data`."""
+    if hasattr(cls, 'model_validate'):
+        return cls.model_validate(data)
+    if dataclasses.is_dataclass(cls):
+        return cls(**data)
+    if issubclass(cls, ISO_TYPES):
+        return cls.fromisoformat(data)
+    if issubclass(cls, (bytes, bytearray)):
+        return cls(base64.b64decode(data))
+    return cls(data)
+
+
 def object_encoder(obj: Any) -> Any:
     """Encodes object to JSON."""
     if isinstance(obj, BaseException):
         return {'__exc_type__': get_full_name(obj.__class__), 'message': str(obj)}
     else:
-        return {
-            '__class__': get_full_name(obj.__class__),
-            'data': pydantic.TypeAdapter(type(obj)).dump_python(obj, mode='json'),
-        }
+        return {'__class__': get_full_name(obj.__class__), 'data': encode_data(obj)}
 
 
 def object_decoder(obj: dict) -> Any:
     """Decodes object from JSON."""
     if '__class__' in obj:
-        return pydantic.TypeAdapter(from_full_name(obj['__class__'])).validate_python(obj['data'])
+        return decode_data(from_full_name(obj['__class__']), obj['data'])
     elif '__exc_type__' in obj:
         return from_full_name(obj['__exc_type__'])(obj['message'])
     else:
@@ -63,9 +152,212 @@ def dumps(obj: Any) -> bytes:
     return result
 
 
-def loads(blob: bytes) -> Any:
-    """Loads object from JSON."""
-    return json.loads(blob.decode(), object_hook=object_decoder)
+def loads(blob: Any) -> Any:
+    """Loads object from JSON or from a container, see `read`."""
+    if blob[: len(MAGIC)] == MAGIC:
+        return read(blob)
+    return json.loads(bytes(blob).decode(), object_hook=object_decoder)
+
+
+class Codec:
+    """Codec of the result container.
+
+    A codec encodes an object to a JSON-compatible dictionary of metadata and a list of frames
+    (objects supporting the buffer protocol), and decodes it from them.
+    """
+
+    name: str = ''
+
+    # True if the codec is selected automatically for objects it accepts
+    auto: bool = True
+
+    # full names of types the codec accepts, empty to accept objects of any type
+    types: Tuple[str, ...] = ()
+
+    def accepts(self, obj: Any) -> bool:
+        """Returns True if the codec is selected automatically for the object."""
+        return self.auto and (not self.types or get_full_name(obj.__class__) in self.types)
+
+    def encode(self, obj: Any) -> Tuple[Dict[str, Any], List[Any]]:
+        """Returns metadata and frames for the object."""
+        raise NotImplementedError
+
+    def decode(self, meta: Dict[str, Any], frames: List[memoryview]) -> Any:
+        """Returns the object for metadata and frames."""
+        raise NotImplementedError
+
+
+class JsonCodec(Codec):
+    """JSON codec, see `dumps` and `loads`."""
+
+    name = 'json'
+    auto = False
+
+    def encode(self, obj: Any) -> Tuple[Dict[str, Any], List[Any]]:
+        return {}, [dumps(obj)]
+
+    def decode(self, meta: Dict[str, Any], frames: List[memoryview]) -> Any:
+        return loads(bytes(frames[0]))
+
+
+class PickleCodec(Codec):
+    """Pickle protocol 5 codec, out-of-band buffers are frames after the pickle."""
+
+    name = 'pickle'
+
+    def encode(self, obj: Any) -> Tuple[Dict[str, Any], List[Any]]:
+        buffers: List[pickle.PickleBuffer] = []
+        data = pickle.dumps(obj, protocol=5, buffer_callback=buffers.append)
+        return {}, [data, *(buffer.raw() for buffer in buffers)]
+
+    def decode(self, meta: Dict[str, Any], frames: List[memoryview]) -> Any:
+        return pickle.loads(frames[0], buffers=frames[1:])  # nosec B301
+
+
+class ArrowCodec(Codec):
+    """Arrow IPC codec for Arrow tables and pandas data frames, requires `pyarrow`."""
+
+    name = 'arrow'
+
+    types = ('pyarrow.lib.Table', 'pandas.core.frame.DataFrame')
+
+    def accepts(self, obj: Any) -> bool:
+        return super().accepts(obj) and importlib.util.find_spec('pyarrow') is not None
+
+    def encode(self, obj: Any) -> Tuple[Dict[str, Any], List[Any]]:
+        # pylint: disable=import-outside-toplevel
+        import pyarrow
+        import pyarrow.ipc
+
+        is_pandas = not isinstance(obj, pyarrow.Table)
+        table = pyarrow.Table.from_pandas(obj) if is_pandas else obj
+        sink = pyarrow.BufferOutputStream()
+        with pyarrow.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return {'pandas': is_pandas}, [sink.getvalue()]
+
+    def decode(self, meta: Dict[str, Any], frames: List[memoryview]) -> Any:
+        # pylint: disable=import-outside-toplevel
+        import pyarrow
+        import pyarrow.ipc
+
+        table = pyarrow.ipc.open_stream(pyarrow.py_buffer(frames[0])).read_all()
+        return table.to_pandas() if meta.get('pandas') else table
+
+
+# Codec name -> codec, codecs registered later are tried first for automatic selection
+CODECS: Dict[str, Codec] = {}
+
+
+def register_codec(codec: Codec):
+    """Registers a codec of the result container."""
+    CODECS[codec.name] = codec
+
+
+register_codec(JsonCodec())
+register_codec(PickleCodec())
+register_codec(ArrowCodec())
+
+
+def select_codec(obj: Any) -> Codec:
+    """Returns the last registered codec that accepts the object."""
+    for codec in reversed(CODECS.values()):
+        if codec.accepts(obj):
+            return codec
+    raise ValueError(f'No codec for object of type {obj.__class__.__name__}')
+
+
+def write(
+    obj: Any, file: BinaryIO, codec: Optional[str] = None, compression: Optional[str] = None
+) -> int:
+    """Writes an object as a container to a binary file, returns the number of bytes written.
+
+    Args:
+        obj: object to write.
+        file: binary file.
+        codec: codec name, see `CODECS`, selected for the object by default.
+        compression: compression of frames, see `COMPRESSIONS`, none by default.
+    """
+    selected = CODECS[codec] if codec else select_codec(obj)
+    meta, frames = selected.encode(obj)
+    if compression:
+        compress = COMPRESSIONS[compression][0]
+        frames = [compress(frame) for frame in frames]
+    views = [memoryview(frame).cast('B') for frame in frames]
+    header = json.dumps(
+        {
+            'codec': selected.name,
+            'compression': compression,
+            'meta': meta,
+            'frames': [view.nbytes for view in views],
+        }
+    ).encode()
+    file.write(PREFIX.pack(MAGIC, FORMAT_VERSION, len(header)))
+    file.write(header)
+    offset = PREFIX.size + len(header)
+    for view in views:
+        padding = -offset % FRAME_ALIGNMENT
+        file.write(b'\0' * padding)
+        file.write(view)
+        offset += padding + view.nbytes
+    return offset
+
+
+def read(data: Any) -> Any:
+    """Reads an object from a container, frames are views of `data` unless compressed."""
+    view = memoryview(data)
+    magic, version, header_size = PREFIX.unpack_from(view)
+    if magic != MAGIC:
+        raise ValueError('Not a result container')
+    if version > FORMAT_VERSION:
+        raise ValueError(f'Unsupported result container version {version}')
+    offset = PREFIX.size + header_size
+    header = json.loads(bytes(view[PREFIX.size : offset]))
+    if header['codec'] not in CODECS:
+        raise ValueError(f'Unknown codec {header["codec"]}')
+    frames = []
+    for size in header['frames']:
+        offset += -offset % FRAME_ALIGNMENT
+        frames.append(view[offset : offset + size])
+        offset += size
+    if header['compression']:
+        decompress = COMPRESSIONS[header['compression']][1]
+        frames = [memoryview(decompress(frame)) for frame in frames]
+    return CODECS[header['codec']].decode(header['meta'], frames)
+
+
+def read_file(path: Any) -> Any:
+    """Reads an object from a file, which is memory-mapped, see `loads`.
+
+    Buffers of the object can be read-only views of the file, which is unmapped when they are
+    released.
+    """
+    with open(path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            raise ValueError(f'Empty result file {path}')
+        data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    return loads(data)
+
+
+# Prefix of base64 containers, which cannot start JSON text
+BASE64_PREFIX = base64.b64encode(MAGIC[:3]).decode('ascii')
+
+
+def encode_parameters(parameters: Any) -> str:
+    """Returns parameters as JSON, or as a base64 container if JSON does not support them."""
+    try:
+        return dumps(parameters).decode('utf-8')
+    except TypeError:
+        buffer = io.BytesIO()
+        write(parameters, buffer)
+        return base64.b64encode(buffer.getbuffer()).decode('ascii')
+
+
+def decode_parameters(text: str) -> Any:
+    """Returns parameters encoded with `encode_parameters`."""
+    if text.startswith(BASE64_PREFIX):
+        return read(base64.b64decode(text))
+    return loads(text.encode('utf-8'))
 
 
 def create_parser() -> argparse.ArgumentParser:
@@ -89,12 +381,17 @@ def create_parser() -> argparse.ArgumentParser:
 
 
 def save_result(result: Any):
-    """Saves result as JSON."""
+    """Saves result as a container, with the codec and compression from the environment."""
     if result is None:
         return
-    result_path = pathlib.Path(__file__).resolve().parent / 'result.json'
+    result_path = pathlib.Path(__file__).resolve().parent / RESULT_NAME
     with result_path.open(mode='wb') as result_file:
-        result_file.write(dumps(result))
+        write(
+            result,
+            result_file,
+            codec=os.environ.get(RESULT_CODEC_ENV) or None,
+            compression=os.environ.get(RESULT_COMPRESSION_ENV) or None,
+        )
 
 
 def main():
@@ -107,8 +404,7 @@ def main():
     parent = pathlib.Path(__file__).parent
     parameters_path = parent / 'parameters.json'
     if parameters_path.exists():
-        with parameters_path.open(mode='rb') as parameters_file:
-            parameters = loads(parameters_file.read())
+        parameters = decode_parameters(parameters_path.read_text(encoding='utf-8'))
     print('Parameters: ', parameters)
 
     if args.entrypoint:
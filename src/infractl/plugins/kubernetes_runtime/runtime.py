@@ -1,35 +1,51 @@
 """ICL Kubernetes runtime implementation.
 
-TODO:
-* deployment timeout
-* run timeout
-* cancel (required for integration test)
+A run timeout is enforced twice: the Job gets `activeDeadlineSeconds`, so Kubernetes stops it even
+if nobody waits for it, and `wait()` cancels the run when the timeout expires. A deployment timeout
+is enforced by `infractl.deploy`.
 """
 
 from __future__ import annotations
 
-import base64
+import asyncio
+import contextlib
+import copy
 import enum
 import functools
+import json
+import math
+import os
 import pathlib
 import random
+import shlex
 import string
 import sys
 import tempfile
-from typing import Any, Dict, List, Optional, Union
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple, Type, Union
 
 import fsspec
 import s3fs
-from kubernetes import client, watch
+from kubernetes import client
 
 import infractl.base
+import infractl.docker.bake
 import infractl.fs
-from infractl import defaults, identity, kubernetes
-from infractl.plugins.kubernetes_runtime import engine
+from infractl import bundle, defaults, identity, kubernetes, wheelhouse
+from infractl.plugins.kubernetes_runtime import bootstrap, engine
 from infractl.plugins.kubernetes_runtime.program import load
 
 KubernetesManifest = infractl.base.KubernetesManifest
 
+# Pod label with the deployed program name, to list pods for all runs of the program at once
+PROGRAM_LABEL = 'infractl.io/program'
+
+# Job and pod label with the unique id of a run
+RUN_ID_LABEL = 'infractl.io/run-id'
+
+# Pod annotation with the completion index of a pod in an Indexed Job
+COMPLETION_INDEX_ANNOTATION = 'batch.kubernetes.io/job-completion-index'
+
 
 class KubernetesRuntimeError(Exception):
     """Kubernetes runtime error."""
@@ -46,16 +62,40 @@ class KubernetesRuntimeSettings:
 
     working_dir = '/root'
 
-    dependencies = ['s3cmd', 'pydantic']
-    """Required dependencies to install before downloading program."""
+    dependencies: List[str] = []
+    """Additional dependencies to install before downloading program, the bootstrap does not
+    require any."""
 
     address = 'localtest.me'
 
+    max_concurrent_uploads = infractl.fs.MAX_CONCURRENT_UPLOADS
+    """Maximum number of concurrent uploads on deploy."""
+
+    s3_internal_url = 'https://minio.minio'
+    """S3 endpoint for containers, presigned URLs passed to a run are signed for it."""
+
+    s3_internal_verify = False
+    """False to skip verification of the S3 certificate in containers."""
+
+    presign_expiration = 24 * 3600
+    """Lifetime in seconds of presigned URLs to download a run's code and data, a run must start
+    before they expire."""
+
     @property
     def s3_url(self):
         """S3 endpoint."""
         return f'http://s3.{self.address}'
 
+    @property
+    def blobs_path(self):
+        """Location of blobs for runtime files, shared by all deployments."""
+        return f'{self.s3_base_path}/_blobs'
+
+    @property
+    def wheelhouse_path(self):
+        """Location of wheelhouses for pip dependencies, shared by all deployments."""
+        return f'{self.s3_base_path}/_wheelhouse'
+
     @property
     def prefect_api_url(self):
         """Prefect endpoint."""
@@ -73,16 +113,69 @@ class KubernetesRuntimeSettings:
             },
         }
 
+    @property
+    def signing_fs_spec(self):
+        """Remote fs spec to sign URLs for containers, signing does not access the endpoint."""
+        return {
+            **self.remote_fs_spec,
+            'use_ssl': self.s3_internal_url.startswith('https:'),
+            'client_kwargs': {
+                'endpoint_url': self.s3_internal_url,
+            },
+        }
+
 
 class RemoteStorage:
     """Remote storage."""
 
     fs: fsspec.AbstractFileSystem
     base_path: str
+    signing_fs: Optional[fsspec.AbstractFileSystem]
 
-    def __init__(self, fs: fsspec.AbstractFileSystem, base_path: str):
+    def __init__(
+        self,
+        fs: fsspec.AbstractFileSystem,
+        base_path: str,
+        signing_fs: Optional[fsspec.AbstractFileSystem] = None,
+    ):
         self.fs = fs
         self.base_path = base_path
+        self.signing_fs = signing_fs
+
+    def sign(self, path: str, expiration: int, put: bool = False) -> str:
+        """Returns a presigned URL to download a remote file or to upload it if `put` is True."""
+        fs = self.signing_fs or self.fs
+        if put:
+            return fs.sign(path, expiration=expiration, client_method='put_object')
+        return fs.sign(path, expiration=expiration)
+
+
+class DeployedFiles:
+    """Remote paths of deployed files, presigned for each run.
+
+    Files are mapped by their paths relative to the working directory (`code`), the data directory
+    (`data`) and the blob store (`blobs`).
+    """
+
+    code: Dict[str, str]
+    data: Dict[str, str]
+    blobs: Dict[str, str]
+    wheelhouse_key: Optional[str]
+    wheelhouse_path: Optional[str]
+
+    def __init__(
+        self,
+        code: Dict[str, str],
+        data: Dict[str, str],
+        blobs: Optional[Dict[str, str]] = None,
+        wheelhouse_key: Optional[str] = None,
+        wheelhouse_path: Optional[str] = None,
+    ):
+        self.code = code
+        self.data = data
+        self.blobs = blobs or {}
+        self.wheelhouse_key = wheelhouse_key
+        self.wheelhouse_path = wheelhouse_path
 
 
 class KubernetesRuntimeImplementation(
@@ -109,80 +202,127 @@ class KubernetesRuntimeImplementation(
         else:
             name = identity.generate(suffix=f'{program_path.stem}-{random_part}')
 
+        # dependencies and local files baked in the image are not installed in runtime
+        image = self.settings.image
+        if infractl.docker.bake.needs_image(self.runtime):
+            image = await asyncio.to_thread(
+                infractl.docker.bake.bake,
+                self.runtime,
+                image,
+                self.infrastructure_implementation.infrastructure,
+                working_dir=self.settings.working_dir,
+            )
+            self.runtime = infractl.docker.bake.remaining_runtime(self.runtime)
+
         base_path = f'{self.settings.s3_base_path}/{name}'
         remote_fs = s3fs.S3FileSystem(**self.settings.remote_fs_spec)
+        # containers have no storage credentials, they access files with presigned URLs
+        storage = RemoteStorage(
+            fs=remote_fs,
+            base_path=base_path,
+            signing_fs=s3fs.S3FileSystem(**self.settings.signing_fs_spec),
+        )
 
         code_path = f'{base_path}/code'
         data_path = f'{base_path}/data'
+        files = DeployedFiles(
+            code={program_path.name: f'{code_path}/{program_path.name}'},
+            data={'engine.py': f'{data_path}/engine.py'},
+        )
 
-        # upload the program
-        remote_fs.put(str(program_path), f'{code_path}/')
-
-        # upload runtime files
-        if self.runtime.files:
-            with tempfile.TemporaryDirectory() as dirname:
-                target_path = pathlib.Path(dirname)
-                infractl.fs.prepare_to_upload(self.runtime.files, target_path)
-                remote_fs.put(lpath=f'{dirname}/', rpath=f'{data_path}/', recursive=True)
-
-        # upload engine
-        remote_fs.put(lpath=engine.__file__, rpath=f'{data_path}/')
-
-        # upload dependencies
-        if self.runtime.dependencies.pip:
-            with tempfile.NamedTemporaryFile(delete=False) as requirements_file:
-                requirements_file.write('\n'.join(self.runtime.dependencies.pip).encode('utf-8'))
-                requirements_file.flush()
-                requirements_file.close()
-                remote_fs.put(lpath=requirements_file.name, rpath=f'{data_path}/requirements.txt')
-
-        secret = _get_secret(name, _get_s3cmd_config())
-        kubernetes.api().recreate_secret(namespace=self.settings.namespace, body=secret)
+        # upload everything concurrently, blobs for runtime files are shared by all deployments
+        async with self.async_remote_fs() as async_remote_fs:
+            uploads: Dict[str, infractl.fs.Upload] = {
+                f'{code_path}/{program_path.name}': program_path,
+                f'{data_path}/engine.py': pathlib.Path(engine.__file__),
+            }
+            if self.runtime.files:
+                index_path = f'{data_path}/{bundle.INDEX_NAME}'
+                uploads.update(
+                    await infractl.fs.bundle_uploads(
+                        self.runtime.files,
+                        async_remote_fs,
+                        index_path,
+                        self.settings.blobs_path,
+                        sign=functools.partial(
+                            storage.sign, expiration=infractl.fs.PRESIGN_EXPIRATION
+                        ),
+                        max_concurrency=self.settings.max_concurrent_uploads,
+                    )
+                )
+                uploads[f'{data_path}/bundle.py'] = pathlib.Path(bundle.__file__)
+                files.data[bundle.INDEX_NAME] = index_path
+                files.data['bundle.py'] = f'{data_path}/bundle.py'
+                files.blobs = {
+                    path: f'{self.settings.blobs_path}/{path}'
+                    for path in bundle.Bundle.loads(uploads[index_path]).blob_paths()
+                }
+            if self.runtime.dependencies.pip:
+                uploads[f'{data_path}/requirements.txt'] = '\n'.join(
+                    self.runtime.dependencies.pip
+                ).encode('utf-8')
+                uploads[f'{data_path}/wheelhouse.py'] = pathlib.Path(wheelhouse.__file__)
+                files.data['requirements.txt'] = f'{data_path}/requirements.txt'
+                files.data['wheelhouse.py'] = f'{data_path}/wheelhouse.py'
+                # the key is computed here, since containers cannot list the wheelhouse, a
+                # wheelhouse built for another interpreter is rebuilt if the image tag moves
+                files.wheelhouse_key = wheelhouse.key(
+                    self.runtime.dependencies.pip,
+                    platform_tags=[image],
+                    environment=self.runtime.environment,
+                )
+                files.wheelhouse_path = (
+                    f'{self.settings.wheelhouse_path}/{files.wheelhouse_key}.tar'
+                )
+            await infractl.fs.put_all(
+                async_remote_fs, uploads, max_concurrency=self.settings.max_concurrent_uploads
+            )
 
         job = _get_job(name, self.settings.namespace)
-        job.spec.template.spec.containers[0].image = self.settings.image
-        job.spec.template.spec.volumes = [
-            client.V1Volume(name='s3cfg', secret=client.V1SecretVolumeSource(secret_name=name))
-        ]
-        job.spec.template.spec.containers[0].volume_mounts = [
-            client.V1VolumeMount(name='s3cfg', read_only=True, mount_path='/secrets')
-        ]
+        job.spec.template.spec.containers[0].image = image
+        job.spec.template.spec.volumes = []
+        job.spec.template.spec.containers[0].volume_mounts = []
+        # persistent volume claims for pvc:// runtime files
+        for claim in infractl.fs.pvc_claims(self.runtime.files):
+            volume_name = infractl.fs.pvc_volume_name(claim)
+            job.spec.template.spec.volumes.append(
+                client.V1Volume(
+                    name=volume_name,
+                    persistent_volume_claim=client.V1PersistentVolumeClaimVolumeSource(
+                        claim_name=claim, read_only=True
+                    ),
+                )
+            )
+            job.spec.template.spec.containers[0].volume_mounts.append(
+                client.V1VolumeMount(
+                    name=volume_name,
+                    read_only=True,
+                    mount_path=f'{infractl.fs.PVC_MOUNT_PATH}/{claim}',
+                )
+            )
         job.spec.template.spec.containers[0].working_dir = self.settings.working_dir
 
-        s3cmd_get = 's3cmd --config=/secrets/.s3cfg get --recursive --force'
-        s3cmd_put = 's3cmd --config=/secrets/.s3cfg put --force'
-        engine_cmd = f'python $__ICL_DATA_DIR/engine.py {program_path.name}'
+        # the container runs the inline bootstrap, which needs only the standard library and
+        # reads the run manifest with presigned URLs from the environment
+        command = [
+            'python',
+            '-c',
+            pathlib.Path(bootstrap.__file__).read_text(encoding='utf-8'),
+            *([] if self.settings.s3_internal_verify else ['--insecure']),
+            '--',
+            program_path.name,
+        ]
         if program.name:
-            engine_cmd += f' --entrypoint {program.name}'
+            command += ['--entrypoint', program.name]
         elif program.flow:
-            engine_cmd += f' --flow {program.flow}'
-
-        command_lines = []
+            command += ['--flow', program.flow]
         if self.settings.dependencies:
-            command_lines = [f'pip install {" ".join(self.settings.dependencies)}']
-
-        command_lines += [
-            '__ICL_DATA_DIR=$(mktemp -d)',
-            'pip install s3cmd pydantic',
-            f'{s3cmd_get} s3://{code_path}/ .',
-            f'{s3cmd_get} s3://{data_path}/ $__ICL_DATA_DIR/',
-            'if [[ -f "$__ICL_DATA_DIR/requirements.txt" ]]; then',
-            '  pip install -r "$__ICL_DATA_DIR/requirements.txt"',
-            'fi',
-            'if [[ -f "$__ICL_DATA_DIR/cwd.tar" ]]; then tar xvf "$__ICL_DATA_DIR/cwd.tar"; fi',
-            'pwd',
-            'ls -l . $__ICL_DATA_DIR',
-            'export PYTHONPATH=$PWD',
-            engine_cmd,
-            'if [[ -f "$__ICL_DATA_DIR/result.json" ]]; then',
-            f'  {s3cmd_put} "$__ICL_DATA_DIR/result.json" s3://{data_path}/',
-            'fi',
-        ]
-        job.spec.template.spec.containers[0].command = [
-            '/bin/bash',
-            '-xec',
-            '\n'.join(command_lines),
-        ]
+            command = [
+                '/bin/bash',
+                '-xec',
+                f'pip install {shlex.join(self.settings.dependencies)}\nexec {shlex.join(command)}',
+            ]
+        job.spec.template.spec.containers[0].command = command
 
         env = self.runtime.environment.copy()
 
@@ -194,20 +334,35 @@ class KubernetesRuntimeImplementation(
                 client.V1EnvVar(name=key, value=value) for key, value in env.items()
             ]
 
-        # TODO: use activeDeadlineSeconds for the timeout
-
         return infractl.base.DeployedProgram(
             program=program,
-            runner=KubernetesRunner(job, RemoteStorage(fs=remote_fs, base_path=base_path)),
+            runner=KubernetesRunner(
+                job, storage, files=files, expiration=self.settings.presign_expiration
+            ),
+        )
+
+    @contextlib.asynccontextmanager
+    async def async_remote_fs(self) -> AsyncIterator[s3fs.S3FileSystem]:
+        """Returns asynchronous remote file system, bound to the current event loop."""
+        remote_fs = s3fs.S3FileSystem(
+            asynchronous=True, skip_instance_cache=True, **self.settings.remote_fs_spec
         )
+        session = await remote_fs.set_session()
+        try:
+            yield remote_fs
+        finally:
+            await session.close()
 
 
 class ProgramState(enum.Enum):
+    """State of a program run or its shard, derived from the state of pods."""
+
     UNKNOWN = enum.auto()
     SCHEDULED = enum.auto()
     RUNNING = enum.auto()
     COMPLETED = enum.auto()
     FAILED = enum.auto()
+    CANCELLED = enum.auto()
 
     def capitalize(self) -> str:
         """Returns a capitalized state, for example "Completed"."""
@@ -215,16 +370,31 @@ class ProgramState(enum.Enum):
 
 
 class KubernetesRunner(infractl.base.Runnable):
-    """Kubernetes runner."""
+    """Kubernetes runner.
+
+    Each run creates a separate Kubernetes Job from the deployed manifest, so a deployed program
+    can be run several times concurrently. A sharded run creates a single Indexed Job, its pods
+    select their parameters by the completion index.
+    """
+
+    parallel = True
 
     manifest: client.V1Job
     storage: RemoteStorage
-    state: ProgramState
+    files: Optional[DeployedFiles]
+    expiration: int
 
-    def __init__(self, manifest: client.V1Job, storage: RemoteStorage):
+    def __init__(
+        self,
+        manifest: client.V1Job,
+        storage: RemoteStorage,
+        files: Optional[DeployedFiles] = None,
+        expiration: int = KubernetesRuntimeSettings.presign_expiration,
+    ):
         self.manifest = manifest
         self.storage = storage
-        self.state = ProgramState.UNKNOWN
+        self.files = files
+        self.expiration = expiration
 
     @property
     def name(self):
@@ -241,67 +411,249 @@ class KubernetesRunner(infractl.base.Runnable):
         """Returns data path."""
         return f'{self.storage.base_path}/data'
 
+    @property
+    def runs_path(self):
+        """Returns path for per-run data, such as parameters and results."""
+        return f'{self.storage.base_path}/runs'
+
+    def result_path(self, job_name: str, index: Optional[int] = None) -> str:
+        """Returns the result path of a run or of a shard with the completion index."""
+        if index is None:
+            return f'{self.runs_path}/{job_name}/{engine.RESULT_NAME}'
+        return f'{self.runs_path}/{job_name}/results/{index}.bin'
+
+    def run_manifest(
+        self,
+        job_name: str,
+        manifest_url: str,
+        completions: Optional[int] = None,
+        parallelism: Optional[int] = None,
+        timeout: Optional[float] = None,
+        run_id: Optional[str] = None,
+    ) -> client.V1Job:
+        """Returns Job manifest for a single run.
+
+        Args:
+            job_name: Job name.
+            manifest_url: URL of the bootstrap manifest.
+            completions: number of shards for an Indexed Job, `None` for a single pod.
+            parallelism: maximum number of pods of an Indexed Job running at once.
+            timeout: timeout in seconds for the Job, `None` or 0 for no timeout.
+            run_id: unique id of the run for the `RUN_ID_LABEL` label of the Job and its pods.
+        """
+        manifest = copy.deepcopy(self.manifest)
+        manifest.metadata.name = job_name
+        if run_id is not None:
+            for metadata in (manifest.metadata, manifest.spec.template.metadata):
+                metadata.labels = {**(metadata.labels or {}), RUN_ID_LABEL: run_id}
+        container = manifest.spec.template.spec.containers[0]
+        env = container.env or []
+        env.append(client.V1EnvVar(name=bootstrap.MANIFEST_ENV, value=manifest_url))
+        container.env = env
+        if completions is not None:
+            manifest.spec.completion_mode = 'Indexed'
+            manifest.spec.completions = completions
+            manifest.spec.parallelism = min(parallelism or completions, completions)
+            # a failed shard does not stop the other ones
+            manifest.spec.backoff_limit = None
+            manifest.spec.backoff_limit_per_index = 0
+        if timeout:
+            manifest.spec.active_deadline_seconds = max(1, math.ceil(timeout))
+        return manifest
+
+    def bootstrap_manifest(
+        self,
+        job_name: str,
+        parameters: Union[Dict[str, Any], List[str], None] = None,
+        shards: Optional[List[Union[Dict[str, Any], List[str], None]]] = None,
+    ) -> Dict[str, Any]:
+        """Returns the bootstrap manifest for a single run, with presigned URLs for all files.
+
+        Args:
+            job_name: Job name.
+            parameters: parameters of a single run.
+            shards: parameters of each shard of a sharded run.
+        """
+        files = self.files or DeployedFiles(code={}, data={})
+
+        def encode(value: Union[Dict[str, Any], List[str], None]) -> Optional[str]:
+            return engine.encode_parameters(value) if value else None
+
+        # a run can take longer than it waits to start
+        def sign_result(index: Optional[int] = None) -> str:
+            return self.storage.sign(
+                self.result_path(job_name, index), infractl.fs.PRESIGN_EXPIRATION, put=True
+            )
+
+        def sign(paths: Dict[str, str]) -> Dict[str, str]:
+            return {name: self.storage.sign(path, self.expiration) for name, path in paths.items()}
+
+        # only one pod of a run builds and uploads a missing wheelhouse, the first shard of a
+        # sharded run, other shards install requirements from the index
+        wheelhouse_urls = None
+        writer_wheelhouse_urls = None
+        if files.wheelhouse_key:
+            wheelhouse_urls = {
+                'key': files.wheelhouse_key,
+                'get': self.storage.sign(files.wheelhouse_path, self.expiration),
+            }
+            writer_wheelhouse_urls = {
+                **wheelhouse_urls,
+                'put': self.storage.sign(
+                    files.wheelhouse_path, infractl.fs.PRESIGN_EXPIRATION, put=True
+                ),
+            }
+        if shards is None:
+            return {
+                'code': sign(files.code),
+                'data': sign(files.data),
+                'blobs': sign(files.blobs),
+                'parameters': encode(parameters),
+                'result': sign_result(),
+                'wheelhouse': writer_wheelhouse_urls,
+                'shards': None,
+            }
+        return {
+            'code': sign(files.code),
+            'data': sign(files.data),
+            'blobs': sign(files.blobs),
+            'parameters': None,
+            'result': None,
+            'wheelhouse': wheelhouse_urls,
+            'shards': [
+                {
+                    'parameters': encode(shard),
+                    'result': sign_result(index),
+                    'wheelhouse': writer_wheelhouse_urls if index == 0 else wheelhouse_urls,
+                }
+                for index, shard in enumerate(shards)
+            ],
+        }
+
+    def upload_bootstrap_manifest(
+        self,
+        job_name: str,
+        parameters: Union[Dict[str, Any], List[str], None] = None,
+        shards: Optional[List[Union[Dict[str, Any], List[str], None]]] = None,
+    ) -> str:
+        """Uploads the bootstrap manifest for a single run, returns its presigned URL."""
+        path = f'{self.runs_path}/{job_name}/manifest.json'
+        data = json.dumps(self.bootstrap_manifest(job_name, parameters, shards)).encode('utf-8')
+        self.storage.fs.pipe_file(path, data)
+        return self.storage.sign(path, self.expiration)
+
     async def run(
         self,
         parameters: Union[Dict[str, Any], List[str], None] = None,
         timeout: Optional[float] = None,
         detach: bool = False,
+        parallelism: Optional[int] = None,
     ) -> infractl.base.ProgramRun:
         """Runs this runnable.
 
         Args:
             parameters: a dictionary of named arguments if a program's entry point is a function,
-                a list of arguments otherwise.
-            timeout: timeout in seconds to wait for a program completion, `None` (default) to wait
-                forever.
+                a list of arguments otherwise. With `parallelism`, a list of such parameters, one
+                per shard.
+            timeout: timeout in seconds for a program completion, `None` (default) to wait
+                forever. The run is cancelled when the timeout expires, even if detached.
             detach: `False` (default) to wait for a program completion, `True` to start the program
                 and detach from it.
+            parallelism: maximum number of shards running at once, `None` (default) for a single
+                run.
         """
+        # each run is a new Job, so runs do not wait for Jobs of previous runs to be deleted,
+        # finished Jobs are deleted by Kubernetes after `ttlSecondsAfterFinished`
+        run_id = _get_run_id()
+        job_name = _get_run_name(self.name, run_id)
+
+        # parameters are passed in the bootstrap manifest
+        if parallelism is None:
+            manifest_url = await asyncio.to_thread(
+                self.upload_bootstrap_manifest, job_name, parameters
+            )
+            manifest = self.run_manifest(job_name, manifest_url, timeout=timeout, run_id=run_id)
+            completions = None
+        else:
+            if not isinstance(parameters, list) or not parameters:
+                raise ValueError('A sharded run requires a non-empty list of parameters')
+            if parallelism < 1:
+                raise ValueError(f'Invalid parallelism {parallelism}')
+            manifest_url = await asyncio.to_thread(
+                self.upload_bootstrap_manifest, job_name, shards=parameters
+            )
+            completions = len(parameters)
+            manifest = self.run_manifest(
+                job_name, manifest_url, completions, parallelism, timeout=timeout, run_id=run_id
+            )
+        await kubernetes.async_api().batch_v1.create_namespaced_job(self.namespace, body=manifest)
 
-        # upload parameters
-        if parameters:
-            with tempfile.NamedTemporaryFile(delete=False) as requirements_file:
-                requirements_file.write(engine.dumps(parameters))
-                requirements_file.flush()
-                requirements_file.close()
-                self.storage.fs.put(
-                    lpath=requirements_file.name,
-                    rpath=f'{self.data_path}/parameters.json',
-                )
-
-        kubernetes.api().recreate_job(namespace=self.namespace, body=self.manifest)
-        self.state = ProgramState.SCHEDULED
-
-        program_run = KubernetesProgramRun(self, timeout=timeout)
-        if not detach:
+        program_run = KubernetesProgramRun(
+            self, name=job_name, timeout=timeout, completions=completions
+        )
+        if not detach and timeout != 0:
             await program_run.wait()
         return program_run
 
 
 class KubernetesProgramRun(infractl.base.ProgramRun):
-    """Kubernetes program run."""
+    """Kubernetes program run.
+
+    A sharded run has a pod for each completion index, its state aggregates the states of all
+    shards: completed if all shards are completed, failed if all shards are final and any of them
+    failed.
+    """
 
     runner: KubernetesRunner
+    name: str
+    state: ProgramState
     timeout: Optional[float] = None
+    completions: Optional[int] = None
+    shard_states: Dict[int, ProgramState]
+    deadline: Optional[float] = None
+    """Time (`time.monotonic()`) when the run times out."""
+    _pod_name: Optional[str] = None
 
-    def __init__(self, runner: KubernetesRunner, timeout: Optional[float] = None):
+    def __init__(
+        self,
+        runner: KubernetesRunner,
+        name: str,
+        timeout: Optional[float] = None,
+        completions: Optional[int] = None,
+    ):
         self.runner = runner
+        self.name = name
+        self.state = ProgramState.SCHEDULED
         self.timeout = timeout
+        self.completions = completions
+        self.shard_states = {}
+        if timeout:
+            self.deadline = time.monotonic() + timeout
+
+    @property
+    def data_path(self):
+        """Returns data path for this run."""
+        return f'{self.runner.runs_path}/{self.name}'
+
+    @property
+    def indexed(self) -> bool:
+        """Returns True if this is a sharded run of an Indexed Job."""
+        return self.completions is not None
 
     def is_scheduled(self) -> bool:
-        return self.runner.state == ProgramState.SCHEDULED
+        return self.state == ProgramState.SCHEDULED
 
     def is_pending(self) -> bool:
         return False
 
     def is_running(self) -> bool:
-        return self.runner.state == ProgramState.RUNNING
+        return self.state == ProgramState.RUNNING
 
     def is_completed(self) -> bool:
-        return self.runner.state == ProgramState.COMPLETED
+        return self.state == ProgramState.COMPLETED
 
     def is_failed(self) -> bool:
-        return self.runner.state == ProgramState.FAILED
+        return self.state == ProgramState.FAILED
 
     def is_crashed(self) -> bool:
         return False
@@ -310,97 +662,235 @@ class KubernetesProgramRun(infractl.base.ProgramRun):
         return False
 
     def is_cancelled(self) -> bool:
-        return False
+        return self.state == ProgramState.CANCELLED
 
     def is_final(self) -> bool:
-        return self.runner.state in (ProgramState.COMPLETED, ProgramState.FAILED)
+        return self.state in (ProgramState.COMPLETED, ProgramState.FAILED, ProgramState.CANCELLED)
 
     def is_paused(self) -> bool:
         return False
 
-    @functools.cached_property
-    def pod_name(self) -> str:
-        """Returns program pod name"""
-        pod_list: client.V1PodList = (
-            kubernetes.api()
-            .core_v1()
-            .list_namespaced_pod(
-                namespace=self.runner.namespace,
-                label_selector=f'job-name={self.runner.name}',
-            )
+    def update_pods(self, pods: List[client.V1Pod], deleted: bool = False) -> None:
+        """Updates the state from pods of this run.
+
+        Args:
+            pods: pods of this run.
+            deleted: True if the pods were deleted, so their shards failed unless completed.
+        """
+        if self.is_cancelled():
+            return
+        for pod in pods:
+            index = _get_completion_index(pod)
+            state = _get_pod_state(pod, self.shard_states.get(index, ProgramState.SCHEDULED))
+            if deleted and state != ProgramState.COMPLETED:
+                state = ProgramState.FAILED
+            self.shard_states[index] = state
+        self.state = _get_run_state(
+            [
+                self.shard_states.get(index, ProgramState.SCHEDULED)
+                for index in range(self.completions or 1)
+            ]
         )
-        if len(pod_list.items) > 1:
-            raise KubernetesRuntimeError(f'Multiple pods for job {self.runner.name}')
-        if len(pod_list.items) < 1:
-            raise KubernetesRuntimeError(f'Pod not found for job {self.runner.name}')
-        return pod_list.items[0].metadata.name
 
-    async def wait(self, wait_for: Optional[ProgramState] = None) -> None:
-        for event in watch.Watch().stream(
-            func=kubernetes.api().core_v1().list_namespaced_pod,
+    async def update(self) -> None:
+        pod_list: client.V1PodList = await kubernetes.async_api().core_v1.list_namespaced_pod(
             namespace=self.runner.namespace,
-            timeout_seconds=3600,
-            label_selector=f'job-name={self.runner.name}',
-        ):
-            if event['object'].status.phase == 'Succeeded':
-                self.runner.state = ProgramState.COMPLETED
-                return
-            elif event['object'].status.phase == 'Failed':
-                self.runner.state = ProgramState.FAILED
-                return
-            elif event['object'].status.phase == 'Running':
-                self.runner.state = ProgramState.RUNNING
-                if self.runner.state == wait_for:
-                    return
-            # deleted while watching for it
-            if event['type'] == 'DELETED':
-                self.runner.state = ProgramState.FAILED
-                return
+            label_selector=f'job-name={self.name}',
+        )
+        self.update_pods(pod_list.items)
+
+    @classmethod
+    def group_class(cls) -> Type[infractl.base.ProgramRunGroup]:
+        return KubernetesProgramRunGroup
+
+    def _informer(self) -> kubernetes.Informer:
+        """Returns the shared informer of program pods in the namespace of this run."""
+        return kubernetes.async_api().informer(
+            'pod', self.runner.namespace, label_selector=PROGRAM_LABEL
+        )
+
+    def _cached_pod_names(self, informer: kubernetes.Informer) -> Dict[int, str]:
+        pods: Dict[int, str] = {}
+        for pod in informer.items({'job-name': self.name}):
+            index = _get_completion_index(pod)
+            if index in pods:
+                raise KubernetesRuntimeError(f'Multiple pods for job {self.name}')
+            pods[index] = pod.metadata.name
+        return dict(sorted(pods.items()))
+
+    async def pod_names(self) -> Dict[int, str]:
+        """Returns pod names by completion index, the index is 0 for a single run."""
+        informer = self._informer()
+        await informer.sync()
+        pods = self._cached_pod_names(informer)
+        if not pods:
+            raise KubernetesRuntimeError(f'Pod not found for job {self.name}')
+        return pods
+
+    async def pod_name(self) -> str:
+        """Returns program pod name"""
+        if self.indexed:
+            raise KubernetesRuntimeError(f'Multiple pods for sharded job {self.name}')
+        if self._pod_name is None:
+            self._pod_name = (await self.pod_names())[0]
+        return self._pod_name
+
+    def _is_done(self, wait_for: Optional[ProgramState]) -> bool:
+        return self.is_final() or self.state == wait_for
+
+    @contextlib.contextmanager
+    def _track_pods(self, informer: kubernetes.Informer) -> Iterator[None]:
+        """Keeps the state up to date with changes of pods of this run in the informer."""
+
+        def handle(event_type: str, pod: client.V1Pod):
+            if (pod.metadata.labels or {}).get('job-name') == self.name:
+                # deleted while waiting for it
+                self.update_pods([pod], deleted=event_type == 'DELETED')
+
+        informer.add_handler(handle)
+        try:
+            self.update_pods(informer.items({'job-name': self.name}))
+            yield
+        finally:
+            informer.remove_handler(handle)
+
+    async def wait(self, wait_for: Optional[ProgramState] = None) -> None:
+        """Waits for the final state or for the `wait_for` state.
 
-        # timed out
-        # TODO: timed out, stop job if it is still running
+        Pods are watched with the shared informer of the namespace, so waiting for many runs takes
+        a single watch request.
+
+        Raises:
+            asyncio.TimeoutError: if the run timeout expires, the run is cancelled.
+        """
+        if self._is_done(wait_for):
+            return
+
+        informer = self._informer()
+        with self._track_pods(informer):
+            timeout = None
+            if self.deadline is not None:
+                timeout = max(0.0, self.deadline - time.monotonic())
+            try:
+                await informer.wait_for(lambda: self._is_done(wait_for), timeout=timeout)
+            except asyncio.TimeoutError:
+                await self.cancel()
+                raise asyncio.TimeoutError(
+                    f'Run {self.name} timed out after {self.timeout}s'
+                ) from None
+
+    async def cancel(self) -> None:
+        """Cancels this run, the Job is deleted and its pods are deleted in the background."""
+        try:
+            await kubernetes.async_api().batch_v1.delete_namespaced_job(
+                self.name, self.runner.namespace, propagation_policy='Background'
+            )
+        except client.exceptions.ApiException as error:
+            if error.status != 404:
+                raise
+        if not self.is_final():
+            self.state = ProgramState.CANCELLED
 
     async def result(self) -> Any:
-        """Returns program result."""
-        result_remote_path = f'{self.runner.data_path}/result.json'
-        if not self.runner.storage.fs.exists(result_remote_path):
+        """Returns program result, a list of shard results (None if missing) for a sharded run."""
+        if not self.indexed:
+            return await self._read_result(self.runner.result_path(self.name))
+        return await asyncio.gather(
+            *(
+                self._read_result(self.runner.result_path(self.name, index))
+                for index in range(self.completions)
+            )
+        )
+
+    async def _read_result(self, result_remote_path: str) -> Any:
+        try:
+            return await asyncio.to_thread(self._download_result, result_remote_path)
+        except FileNotFoundError:
             return None
-        with tempfile.TemporaryDirectory() as dirname:
-            result_path = pathlib.Path(dirname) / 'results.json'
-            self.runner.storage.fs.get(rpath=result_remote_path, lpath=str(result_path))
-            with result_path.open('rb') as result_file:
-                return engine.loads(result_file.read())
 
-    async def logs(self) -> List[str]:
-        """Returns program logs."""
-        return (
-            kubernetes.api()
-            .core_v1()
-            .read_namespaced_pod_log(
-                name=self.pod_name,
-                namespace=self.runner.namespace,
-                container='program',
+    def _download_result(self, result_remote_path: str) -> Any:
+        """Streams a result to a temporary file and reads it memory-mapped.
+
+        Large buffers of the result are views of the file instead of copies in memory, the file is
+        deleted right away and its space is released when the buffers are released.
+        """
+        with tempfile.TemporaryDirectory(ignore_cleanup_errors=True) as dirname:
+            local_path = os.path.join(dirname, engine.RESULT_NAME)
+            self.runner.storage.fs.get_file(result_remote_path, local_path)
+            return engine.read_file(local_path)
+
+    async def _shard_log_lines(
+        self, index: int, follow: bool, tail_lines: Optional[int]
+    ) -> AsyncIterator[str]:
+        """Yields log lines of the pod with the completion index, waits for it if following."""
+        informer = self._informer()
+        if follow:
+            # shards of an Indexed Job start when others complete, unless the run is final
+            await informer.wait_for(
+                lambda: index in self._cached_pod_names(informer) or self.is_final()
             )
-            .splitlines()
+        else:
+            await informer.sync()
+        pod_name = self._cached_pod_names(informer).get(index)
+        if pod_name is None:
+            if follow:
+                return
+            raise KubernetesRuntimeError(f'Pod not found for job {self.name}')
+        lines = kubernetes.async_api().follow_log(
+            self.runner.namespace,
+            pod_name,
+            container='program',
+            tail_lines=tail_lines,
+            follow=follow,
         )
+        async with contextlib.aclosing(lines):
+            async for line in lines:
+                yield line
+
+    async def log_lines(
+        self, follow: bool = False, tail_lines: Optional[int] = None
+    ) -> AsyncIterator[str]:
+        """Yields program log lines, lines of a sharded run are prefixed with the shard index.
+
+        Args:
+            follow: True to follow logs until the program terminates, False (default) to return
+                the lines logged so far. A followed log is resumed if the connection is lost.
+            tail_lines: number of last lines of each pod to start with, all lines by default.
+        """
+        # keep the state up to date, so waiting for pods stops when the run is final; unlike
+        # `wait()`, following logs does not cancel the run on its timeout
+        tracking = self._track_pods(self._informer()) if follow else contextlib.nullcontext()
+        with tracking:
+            if self.indexed:
+                lines = kubernetes.merge_lines(
+                    {
+                        f'[{index}] ': self._shard_log_lines(index, follow, tail_lines)
+                        for index in range(self.completions)
+                    }
+                )
+            else:
+                lines = self._shard_log_lines(0, follow, tail_lines)
+            async with contextlib.aclosing(lines):
+                async for line in lines:
+                    yield line
+
+    async def logs(self) -> List[str]:
+        """Returns program logs, lines of a sharded run are prefixed with the shard index."""
+        return [line async for line in self.log_lines()]
 
     async def stream_logs(self, file=None) -> None:
         """Stream logs until the terminal state is reached.
 
+        Logs of a sharded run are printed as they come, prefixed with the shard index.
+
         Args:
             file:  a file-like object (stream); defaults to the current sys.stdout.
         """
-        await self.wait(wait_for=ProgramState.RUNNING)
-        if not self.is_running():
-            return
         file = file or sys.stdout
-        for line in watch.Watch().stream(
-            kubernetes.api().core_v1().read_namespaced_pod_log,
-            name=self.pod_name,
-            namespace=self.runner.namespace,
-            container='program',
-        ):
-            print(line, file=file)
+        lines = self.log_lines(follow=True)
+        async with contextlib.aclosing(lines):
+            async for line in lines:
+                print(line, file=file)
         await self.wait()
 
     def __repr__(self) -> str:
@@ -408,34 +898,108 @@ class KubernetesProgramRun(infractl.base.ProgramRun):
 
         Note that JupyterLab uses __repr__ instead of __str__.
         """
-        return f'{self.runner.name} ({self.runner.state.capitalize()})'
-
-
-def _get_secret(name: str, data: str) -> client.V1Secret:
-    """Returns Kubernetes Secret."""
-    return client.V1Secret(
-        api_version='v1',
-        kind='Secret',
-        metadata=client.V1ObjectMeta(name=name),
-        data={
-            '.s3cfg': base64.b64encode(data.encode('utf-8')).decode('utf-8'),
-        },
-    )
+        if self.indexed:
+            completed = sum(state == ProgramState.COMPLETED for state in self.shard_states.values())
+            return (
+                f'{self.name} ({self.state.capitalize()}, '
+                f'{completed} of {self.completions} shards completed)'
+            )
+        return f'{self.name} ({self.state.capitalize()})'
 
 
-def _get_s3cmd_config() -> str:
-    return '\n'.join(
-        [
-            '[default]',
-            'access_key = x1miniouser',
-            'secret_key = x1miniopass',
-            'signature_v2 = False',
-            'use_https = True',
-            'check_ssl_certificate = False',
-            'host_base = minio.minio',
-            'host_bucket = minio.minio',
-        ]
-    )
+class KubernetesProgramRunGroup(infractl.base.ProgramRunGroup):
+    """Group of Kubernetes program runs, updated with a single pod list per deployed program."""
+
+    async def refresh(self, runs: Optional[List[infractl.base.ProgramRun]] = None) -> None:
+        runs = self.pending() if runs is None else runs
+        program_runs: Dict[Tuple[str, str], List[KubernetesProgramRun]] = {}
+        for run in runs:
+            program_runs.setdefault((run.runner.namespace, run.runner.name), []).append(run)
+
+        for (namespace, name), runner_runs in program_runs.items():
+            pod_list: client.V1PodList = await kubernetes.async_api().core_v1.list_namespaced_pod(
+                namespace=namespace,
+                label_selector=f'{PROGRAM_LABEL}={_get_label_value(name)}',
+            )
+            pods: Dict[str, List[client.V1Pod]] = {}
+            for pod in pod_list.items:
+                pods.setdefault(pod.metadata.labels.get('job-name'), []).append(pod)
+            for run in runner_runs:
+                if run.name in pods:
+                    run.update_pods(pods[run.name])
+
+    async def log_lines(
+        self, follow: bool = False, tail_lines: Optional[int] = None
+    ) -> AsyncIterator[str]:
+        """Yields log lines of all runs as they come, prefixed with the run name.
+
+        See `KubernetesProgramRun.log_lines`.
+        """
+        lines = kubernetes.merge_lines(
+            {
+                f'[{run.name}] ': run.log_lines(follow=follow, tail_lines=tail_lines)
+                for run in self.runs
+            }
+        )
+        async with contextlib.aclosing(lines):
+            async for line in lines:
+                yield line
+
+    async def stream_logs(self, file=None) -> None:
+        """Streams logs of all runs until they reach the terminal state, see `log_lines`.
+
+        Args:
+            file: a file-like object (stream); defaults to the current sys.stdout.
+        """
+        file = file or sys.stdout
+        lines = self.log_lines(follow=True)
+        async with contextlib.aclosing(lines):
+            async for line in lines:
+                print(line, file=file)
+
+
+def _get_pod_state(pod: client.V1Pod, state: ProgramState) -> ProgramState:
+    """Returns program state for a pod phase, or `state` if the phase is not known."""
+    return {
+        'Succeeded': ProgramState.COMPLETED,
+        'Failed': ProgramState.FAILED,
+        'Running': ProgramState.RUNNING,
+        'Pending': ProgramState.SCHEDULED,
+    }.get(pod.status.phase if pod.status else None, state)
+
+
+def _get_completion_index(pod: client.V1Pod) -> int:
+    """Returns the completion index of a pod in an Indexed Job, 0 for other pods."""
+    annotations = pod.metadata.annotations or {}
+    return int(annotations.get(COMPLETION_INDEX_ANNOTATION, 0))
+
+
+def _get_run_state(states: List[ProgramState]) -> ProgramState:
+    """Returns program state for the states of all shards of a run."""
+    final = (ProgramState.COMPLETED, ProgramState.FAILED, ProgramState.CANCELLED)
+    if all(state == ProgramState.COMPLETED for state in states):
+        return ProgramState.COMPLETED
+    if all(state in final for state in states):
+        return ProgramState.FAILED
+    if any(state == ProgramState.RUNNING or state in final for state in states):
+        return ProgramState.RUNNING
+    return ProgramState.SCHEDULED
+
+
+def _get_label_value(name: str) -> str:
+    """Returns a label value for a name, which is limited to 63 characters."""
+    return name[:63].rstrip('-')
+
+
+def _get_run_id() -> str:
+    """Returns a unique run id."""
+    return ''.join(random.choices(string.ascii_lowercase + string.digits, k=10))
+
+
+def _get_run_name(name: str, run_id: str) -> str:
+    """Returns a unique Job name for a single run of the deployed program."""
+    # Job name is also used as a label value, which is limited to 63 characters
+    return f'{name[:62 - len(run_id)].rstrip("-")}-{run_id}'
 
 
 def _get_job(name: str, namespace: str) -> client.V1Job:
@@ -445,7 +1009,8 @@ def _get_job(name: str, namespace: str) -> client.V1Job:
         kind='Job',
         metadata=client.V1ObjectMeta(name=name, namespace=namespace),
         spec=client.V1JobSpec(
-            template=client.V1JobTemplateSpec(
+            template=client.V1PodTemplateSpec(
+                metadata=client.V1ObjectMeta(labels={PROGRAM_LABEL: _get_label_value(name)}),
                 spec=client.V1PodSpec(
                     containers=[
                         client.V1Container(
@@ -454,7 +1019,7 @@ def _get_job(name: str, namespace: str) -> client.V1Job:
                         ),
                     ],
                     restart_policy='Never',
-                )
+                ),
             ),
             backoff_limit=0,
             completion_mode='NonIndexed',
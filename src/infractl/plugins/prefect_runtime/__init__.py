@@ -1,12 +1,30 @@
 """Prefect specific module."""
 
+from typing import TYPE_CHECKING, Any
+
 from infractl.plugins.prefect_runtime.program import (
     PrefectProgram,
     PrefectProgramRun,
     PythonProgram,
     load_program,
 )
-from infractl.plugins.prefect_runtime.runtime import PrefectRuntimeImplementation
+
+if TYPE_CHECKING:
+    from infractl.plugins.prefect_runtime.runtime import PrefectRuntimeImplementation
+
+
+# pylint: disable=invalid-name
+def __getattr__(name) -> Any:
+    # The runtime is imported on first use, so program runs can be used without the deployment
+    # APIs of Prefect.
+    if name == 'PrefectRuntimeImplementation':
+        # pylint: disable=import-outside-toplevel
+        from infractl.plugins.prefect_runtime import runtime
+
+        return runtime.PrefectRuntimeImplementation
+    # Implicit else
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
 
 __all__ = [
     'PrefectRuntimeImplementation',
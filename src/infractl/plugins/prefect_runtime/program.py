@@ -2,23 +2,25 @@
 
 from __future__ import annotations
 
+import asyncio
 import importlib
 import logging
 import pathlib
 import sys
 import warnings
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Dict, List, Optional, Type, Union
 
 import anyio
 import prefect
 from prefect import settings
 from prefect.client import orchestration
-from prefect.client.schemas.filters import LogFilter
+from prefect.client.schemas.filters import FlowRunFilter, FlowRunFilterId, LogFilter
 from prefect.utilities import importtools
 
 import infractl.base
 import infractl.identity
 import infractl.plugins.prefect_runtime.utils as prefect_utils
+from infractl.base.program import poll_intervals
 from infractl.logging import get_logger
 
 logger = get_logger()
@@ -62,14 +64,72 @@ class PrefectProgramRun(infractl.base.ProgramRun):
     async def update(self) -> None:
         self._flow_run = await self._prefect_client.read_flow_run(self._flow_run.id)
 
-    async def wait(self, poll_interval=5) -> None:
-        """Wait until the terminal (COMPLETED, CANCELLED, FAILED, CRASHED) state is reached."""
-        while True:
+    @classmethod
+    def group_class(cls) -> Type[infractl.base.ProgramRunGroup]:
+        return PrefectProgramRunGroup
+
+    async def wait(self, poll_interval=5, events=True) -> None:
+        """Wait until the terminal (COMPLETED, CANCELLED, FAILED, CRASHED) state is reached.
+
+        Args:
+            poll_interval: maximum time in seconds between flow run state requests.
+            events: `True` (default) to wait for flow run state change events from Prefect, with
+                polling as a fallback if events are not available, `False` to poll only.
+        """
+        await self.update()
+        if self.is_final():
+            return
+        if events and await self._wait_events(poll_interval):
+            return
+        await self._wait_polling(poll_interval)
+
+    async def _wait_polling(self, poll_interval: float) -> None:
+        """Polls the flow run state with adaptive backoff until the terminal state is reached."""
+        for interval in poll_intervals(poll_interval):
+            await anyio.sleep(interval)
             await self.update()
-            flow_run = self.get_flow_run()
-            if flow_run.state.is_final():
+            if self.is_final():
                 return
-            await anyio.sleep(poll_interval)
+
+    async def _wait_events(self, poll_interval: float) -> bool:
+        """Waits for flow run state change events until the terminal state is reached.
+
+        The flow run state is also read every `poll_interval` seconds without events, in case an
+        event is lost.
+
+        Returns:
+            True if the terminal state is reached, False if events are not available.
+        """
+        try:
+            # pylint: disable=import-outside-toplevel
+            from prefect.events.clients import get_events_subscriber
+            from prefect.events.filters import EventFilter, EventNameFilter, EventResourceFilter
+        except ImportError:
+            return False
+
+        event_filter = EventFilter(
+            event=EventNameFilter(prefix=['prefect.flow-run.']),
+            resource=EventResourceFilter(id=[f'prefect.flow-run.{self._flow_run.id}']),
+        )
+        try:
+            with settings.temporary_settings(
+                updates={settings.PREFECT_API_URL: str(self._prefect_client.api_url)},
+            ):
+                async with get_events_subscriber(filter=event_filter) as subscriber:
+                    # the state could change before the subscription
+                    await self.update()
+                    while not self.is_final():
+                        try:
+                            event = await asyncio.wait_for(anext(subscriber), poll_interval)
+                            logger.debug('Flow run %s event: %s', self._flow_run.name, event.event)
+                        except asyncio.TimeoutError:
+                            pass
+                        await self.update()
+            return True
+        except Exception as error:  # pylint: disable=broad-exception-caught
+            # for example, the Prefect server does not support websockets
+            logger.info('Flow run events are not available, polling instead: %r', error)
+            return False
 
     def is_scheduled(self) -> bool:
         return self.get_flow_run().state.is_scheduled()
@@ -136,10 +196,15 @@ class PrefectProgramRun(infractl.base.ProgramRun):
         return logs
 
     async def stream_logs(self, file=None, poll_interval=5) -> None:
-        """Stream logs until the terminal state is reached."""
+        """Stream logs until the terminal state is reached.
+
+        Logs are requested more often while the program is logging, and at most every
+        `poll_interval` seconds when it is not.
+        """
         timestamp = None
         flow_run = self.get_flow_run()
         flow_run_id = flow_run.id
+        intervals = poll_intervals(poll_interval)
 
         while True:
             await self.update()
@@ -177,14 +242,44 @@ class PrefectProgramRun(infractl.base.ProgramRun):
             # update timestamp to not receive logs already shown
             if len(page_logs):
                 timestamp = page_logs[-1].timestamp
+                intervals = poll_intervals(poll_interval)
 
-            await anyio.sleep(poll_interval)
+            await anyio.sleep(next(intervals))
 
     async def cancel(self):
         """Cancel a flow run by ID."""
         await prefect_utils.cancel(self._prefect_client, self.get_flow_run().id)
 
 
+class PrefectProgramRunGroup(infractl.base.ProgramRunGroup):
+    """Group of Prefect program runs, updated with a single `read_flow_runs` request."""
+
+    # maximum number of flow runs returned by Prefect API in a single response
+    page_size: int = 200
+
+    async def refresh(self, runs: Optional[List[infractl.base.ProgramRun]] = None) -> None:
+        # pylint: disable=protected-access
+        runs = self.pending() if runs is None else runs
+        # runs could be created with different Prefect clients (servers)
+        client_runs: Dict[int, List[PrefectProgramRun]] = {}
+        for run in runs:
+            client_runs.setdefault(id(run._prefect_client), []).append(run)
+
+        for prefect_client_runs in client_runs.values():
+            prefect_client = prefect_client_runs[0]._prefect_client
+            runs_by_id = {run.get_flow_run().id: run for run in prefect_client_runs}
+            flow_run_ids = list(runs_by_id)
+            for start in range(0, len(flow_run_ids), self.page_size):
+                flow_runs = await prefect_client.read_flow_runs(
+                    flow_run_filter=FlowRunFilter(
+                        id=FlowRunFilterId(any_=flow_run_ids[start : start + self.page_size])
+                    ),
+                    limit=self.page_size,
+                )
+                for flow_run in flow_runs:
+                    runs_by_id[flow_run.id]._flow_run = flow_run
+
+
 class PrefectProgram(infractl.base.Program):
     """Prefect program."""
 
@@ -6,67 +6,37 @@ cluster.
 """
 
 import asyncio
-import contextlib
 import copy
 import functools
-import os
 import pathlib
-import tempfile
+import warnings
 from typing import Any, Dict, List, Optional, Union
 
 import dynaconf
+import fsspec
 import prefect.blocks.core as blocks
 import pydantic
 from prefect import deployments, filesystems, infrastructure, settings
 from prefect.client import orchestration
-from prefect.server.api import server
 
 import infractl
 import infractl.base
+import infractl.bundle
+import infractl.defaults
+import infractl.docker.bake
 import infractl.fs
 import infractl.identity
 import infractl.plugins.prefect_runtime.utils as prefect_utils
-from infractl import defaults
+import infractl.wheelhouse
 from infractl.logging import get_logger
 from infractl.plugins import icl_infrastructure, prefect_runtime
+from infractl.plugins.prefect_runtime.stages import DeploymentStages
 
 logger = get_logger()
 
 
-DEFAULT_ITEMS_TO_IGNORE = [
-    # Prefect artifacts
-    '.prefectignore',
-    # Python artifacts
-    '__pycache__/',
-    '*.py[cod]',
-    '*$py.class',
-    '*.egg-info/',
-    '*.egg',
-    # Type checking artifacts
-    '.mypy_cache/',
-    '.dmypy.json',
-    'dmypy.json',
-    '.pyre/',
-    # IPython
-    'profile_default/',
-    'ipython_config.py',
-    '*.ipynb_checkpoints/*',
-    # Environments
-    '.python-version',
-    '.env',
-    '.venv',
-    'env/',
-    'venv/',
-    '.conda/',
-    # MacOS
-    '.DS_Store',
-    # Dask
-    'dask-worker-space/',
-    # Editors
-    '.idea/',
-    '.vscode/',
-    '.vscode-server/',
-]
+# Deprecated, use infractl.fs.DEFAULT_IGNORE_PATTERNS
+DEFAULT_ITEMS_TO_IGNORE = infractl.fs.DEFAULT_IGNORE_PATTERNS
 
 
 class PrefectRuntimeError(Exception):
@@ -121,24 +91,28 @@ class PrefectProgramRunner(infractl.base.Runnable):
         Note that currently Prefect does not support returning the result.
         """
 
-        # setting detach to True is the same as setting timeout to 0
-        if detach:
-            timeout = 0
-
         deployment_name = f'{self.prefect_deployment.flow_name}/{self.prefect_deployment.name}'
         logger.info('Running deployment "%s" with timeout="%s" seconds', deployment_name, timeout)
+        # Create a flow run without waiting, since `run_deployment` polls the flow run state
+        # every 5 seconds, PrefectProgramRun.wait() is notified by Prefect events instead.
         flow_run = await deployments.run_deployment(
             name=deployment_name,
             parameters=parameters,
             client=self.prefect_client,
-            timeout=timeout,
+            timeout=0,
         )
-        if not flow_run.state.is_final() and timeout not in (None, 0):
+        program_run = prefect_runtime.PrefectProgramRun(flow_run, self.prefect_client)
+        if detach or timeout == 0:
+            return program_run
+
+        try:
+            await asyncio.wait_for(program_run.wait(), timeout=timeout)
+        except asyncio.exceptions.TimeoutError:
             logger.info('Cancel flow run "%s" by timeout="%s" seconds', flow_run.name, timeout)
             await self.cancel(flow_run.id)
-            raise asyncio.exceptions.TimeoutError
-        logger.info('FlowRun %s %s', flow_run.name, flow_run.state)
-        return prefect_runtime.PrefectProgramRun(flow_run, self.prefect_client)
+            raise
+        logger.info('FlowRun %s %s', flow_run.name, program_run.get_flow_run().state)
+        return program_run
 
 
 class PythonProgramRunner(PrefectProgramRunner):
@@ -197,6 +171,8 @@ class PrefectRuntimeImplementation(
     _settings: Optional[dynaconf.Dynaconf] = None
     _files_block: str = ''
     _script: str = ''
+    # Baked image with runtime dependencies, see `infractl.docker.bake`
+    _image: Optional[str] = None
 
     def __init__(
         self,
@@ -212,12 +188,23 @@ class PrefectRuntimeImplementation(
         super().__init__(
             runtime=runtime, infrastructure_implementation=infrastructure_implementation
         )
+        # deployment stages of the last deployment
+        self.stages = DeploymentStages()
+
+    @property
+    def timings(self) -> Dict[str, float]:
+        """Returns deployment stage name -> time in seconds, for the last deployment."""
+        return self.stages.timings
 
     @functools.cached_property
     def prefect_client(self):
         """Returns Prefect client."""
         if self.prefect_api_url:
             return orchestration.PrefectClient(self.prefect_api_url)
+        # Prefect server is heavy to import, so it is imported only for the ephemeral mode
+        # pylint: disable=import-outside-toplevel
+        from prefect.server.api import server
+
         return orchestration.PrefectClient(server.create_app(ephemeral=True))
 
     @functools.cached_property
@@ -235,6 +222,13 @@ class PrefectRuntimeImplementation(
             return f'http://prefect.{self.infrastructure_implementation.address}/api'
         return None
 
+    def program_paths(self, path: str) -> List[str]:
+        """Returns local paths deployed with a program.
+
+        Prefect runtime uploads the whole directory with the program.
+        """
+        return [str(pathlib.Path(path).absolute().parent)]
+
     async def deploy(
         self,
         program: infractl.base.Program,
@@ -247,6 +241,16 @@ class PrefectRuntimeImplementation(
 
         program = prefect_runtime.load_program(path=program.path, name=program.name)
 
+        # dependencies and local files baked in the image are not installed in runtime
+        if infractl.docker.bake.needs_image(self.runtime):
+            self._image = await asyncio.to_thread(
+                infractl.docker.bake.bake,
+                self.runtime,
+                self.address_settings.prefect_image or infractl.defaults.PREFECT_IMAGE,
+                self.infrastructure_implementation.infrastructure,
+            )
+            self.runtime = infractl.docker.bake.remaining_runtime(self.runtime)
+
         with settings.temporary_settings(updates={settings.PREFECT_API_URL: self.prefect_api_url}):
             if isinstance(program, prefect_runtime.PythonProgram):
                 return await self.deploy_python_program(
@@ -316,41 +320,52 @@ class PrefectRuntimeImplementation(
             # object intact for the case it was imported as Python object.
             prefect_flow = prefect_flow.with_options(name=name)
 
-        prefect_storage_block = await self.create_code_block(prefect_flow.name)
-        if self.runtime.files:
-            await self.create_files_block(prefect_flow.name)
-        prefect_infrastructure_block = await self.create_infrastructure_block(
-            prefect_flow.name,
-            customizations=customizations,
-            manifest_filter=manifest_filter,
-        )
-
-        prefect_default_storage_block = await self.create_result_block('prefect-persistent-results')
+        # Blocks are independent, so they are saved (and files are uploaded) concurrently.
+        # The files block name is known before it is saved, the infrastructure block uses it.
+        self.stages = DeploymentStages()
+        files_block = None
+        if self.runtime.files or self.runtime.dependencies.pip:
+            files_block = self.define_files_block(prefect_flow.name)
+        stages = [
+            self.create_code_block(prefect_flow.name, upload_path=program.path),
+            self.create_infrastructure_block(
+                prefect_flow.name,
+                customizations=customizations,
+                manifest_filter=manifest_filter,
+            ),
+            self.create_result_block('prefect-persistent-results'),
+        ]
+        if files_block:
+            stages.append(self.save_files_block(files_block))
+        (
+            prefect_storage_block,
+            prefect_infrastructure_block,
+            prefect_default_storage_block,
+            *_,
+        ) = await self.stages.gather('blocks', *stages)
         logger.info('Default result storage block: "%s"', prefect_default_storage_block)
 
         prefect_flow_entrypoint = f'{flow_file_name}:{prefect_flow.fn.__name__}'
-        prefect_deployment = await deployments.Deployment.build_from_flow(
-            flow=prefect_flow,
-            # Note that Prefect shows deployments as "{flow_name}/{deployment_name}".
-            name=program.deployment_name,
-            storage=await blocks.Block.load(
-                prefect_storage_block.full_name,
-                client=self.prefect_client,
-            ),
-            infrastructure=await blocks.Block.load(
-                prefect_infrastructure_block.full_name,
-                client=self.prefect_client,
-            ),
-            work_queue_name=self.settings('prefect_queue', 'prod'),
-            apply=False,
-            skip_upload=True,
-            entrypoint=prefect_flow_entrypoint,
-            infra_overrides={
-                'env': {
-                    'PREFECT_DEFAULT_RESULT_STORAGE_BLOCK': prefect_default_storage_block.full_name
-                }
-            },
-        )
+        with self.stages.stage('build'):
+            prefect_deployment = await deployments.Deployment.build_from_flow(
+                flow=prefect_flow,
+                # Note that Prefect shows deployments as "{flow_name}/{deployment_name}".
+                name=program.deployment_name,
+                # saved blocks are used as is, without loading them back
+                storage=prefect_storage_block.block,
+                infrastructure=prefect_infrastructure_block.block,
+                work_queue_name=self.address_settings.prefect_queue,
+                apply=False,
+                skip_upload=True,
+                entrypoint=prefect_flow_entrypoint,
+                infra_overrides={
+                    'env': {
+                        'PREFECT_DEFAULT_RESULT_STORAGE_BLOCK': (
+                            prefect_default_storage_block.full_name
+                        )
+                    }
+                },
+            )
 
         deployment_keys = prefect_deployment.dict().keys()
         deployment_dict = {}
@@ -360,26 +375,13 @@ class PrefectRuntimeImplementation(
         if deployment_dict:
             await prefect_deployment.update(**deployment_dict)
 
-        cwd = os.getcwd()
-        os.chdir(pathlib.Path(program.path).absolute().parent)
-        ignore_file_name: Optional[str] = None
-        try:
-            with tempfile.NamedTemporaryFile(delete=False) as ignore_file:
-                ignore_file_name = ignore_file.name
-                ignore_file.write('\n'.join(DEFAULT_ITEMS_TO_IGNORE).encode('utf-8'))
-                ignore_file.flush()
-                ignore_file.close()
-                await prefect_deployment.upload_to_storage(
-                    prefect_storage_block.full_name,
-                    ignore_file=ignore_file_name,
-                )
-        finally:
-            os.chdir(cwd)
-            if ignore_file_name:
-                with contextlib.suppress(FileNotFoundError):
-                    os.remove(ignore_file_name)
-
-        await prefect_deployment.apply(upload=False)
+        with self.stages.stage('apply'):
+            await prefect_deployment.apply(upload=False)
+        logger.info(
+            'Deployed "%s", stage times in seconds: %s',
+            prefect_flow.name,
+            self.stages,
+        )
 
         return infractl.base.DeployedProgram(
             program=program,
@@ -389,7 +391,7 @@ class PrefectRuntimeImplementation(
     @functools.cached_property
     def remote_storage_settings(self):
         """Gets storage settings for Prefect RemoteFileSystem."""
-        storage_settings = self.settings('prefect_storage_fsspec', {})
+        storage_settings = copy.deepcopy(self.address_settings.prefect_storage_fsspec)
         storage_settings.setdefault('key', 'x1miniouser')
         storage_settings.setdefault('secret', 'x1miniopass')
         storage_settings.setdefault('use_ssl', False)
@@ -427,52 +429,144 @@ class PrefectRuntimeImplementation(
             )
             return PrefectBlock(kind='remote-file-system', name=block_name, block=block)
 
-    async def create_code_block(self, block_name: str) -> PrefectBlock:
-        """Creates and saves Prefect storage block."""
-        base_path = self.settings('prefect_storage_basepath', 's3://prefect')
+    async def create_code_block(
+        self, block_name: str, upload_path: Optional[str] = None
+    ) -> PrefectBlock:
+        """Creates and saves Prefect storage block.
+
+        Args:
+            block_name: block name.
+            upload_path: optional program path, the directory with the program is uploaded to the
+                block.
+        """
+        base_path = self.address_settings.prefect_storage_basepath
         block = self.define_storage_block(base_path, block_name)
-        await block.save(overwrite=True, client=self.prefect_client)
+        with self.stages.stage('code_block'):
+            await block.save(overwrite=True, client=self.prefect_client)
+        if upload_path:
+            with self.stages.stage('code_upload'):
+                await self.upload_code(block, pathlib.Path(upload_path).absolute().parent)
         return block
 
+    async def upload_code(self, block: PrefectBlock, path: pathlib.Path):
+        """Uploads a directory with the program to a code block.
+
+        Only files changed since the previous deployment are uploaded, see `infractl.fs.sync_files`.
+        """
+        files = infractl.fs.walk_files(path)
+        filesystem = self.block_filesystem(block)
+        # Use an absolute local path instead of changing the current directory, since other blocks
+        # are uploaded concurrently.
+        stats = await asyncio.to_thread(
+            infractl.fs.sync_files, path, files, filesystem, block.block.basepath
+        )
+        logger.debug(
+            'Uploaded %s files (%s bytes), deleted %s files, %s files unchanged',
+            stats.uploaded,
+            stats.uploaded_bytes,
+            stats.deleted,
+            stats.unchanged,
+        )
+
+    def block_filesystem(self, block: PrefectBlock) -> fsspec.AbstractFileSystem:
+        """Returns fsspec file system for a storage block."""
+        if isinstance(block.block, filesystems.RemoteFileSystem):
+            return block.block.filesystem
+        return fsspec.filesystem('file')
+
+    @property
+    def files_blobs_path(self) -> str:
+        """Returns location of blobs for runtime files, shared by all deployments."""
+        base_path = f'{self.address_settings.prefect_storage_basepath}/_files/_blobs'
+        if base_path.startswith('file:'):
+            return infractl.fs.strip_file_scheme(base_path)
+        return base_path
+
+    @property
+    def files_wheelhouse_path(self) -> str:
+        """Returns location of wheelhouses for pip dependencies, shared by all deployments."""
+        base_path = f'{self.address_settings.prefect_storage_basepath}/_files/_wheelhouse'
+        if base_path.startswith('file:'):
+            return infractl.fs.strip_file_scheme(base_path)
+        return base_path
+
     async def create_result_block(self, block_name: str) -> PrefectBlock:
         """Creates and saves Prefect result storage block."""
-        storage_path = self.settings('prefect_storage_basepath', 's3://prefect')
+        storage_path = self.address_settings.prefect_storage_basepath
         block = self.define_storage_block(f'{storage_path}/_persistent_results', block_name)
-        await block.save(overwrite=True, client=self.prefect_client)
+        with self.stages.stage('result_block'):
+            await block.save(overwrite=True, client=self.prefect_client)
         return block
 
-    async def create_files_block(self, block_name: str):
-        """Creates a Prefect storage block, upload files and script for infractl.prefect.engine."""
+    def define_files_block(self, block_name: str) -> PrefectBlock:
+        """Defines a Prefect storage block for files and script for infractl.prefect.engine."""
         identity = infractl.identity.generate()
-        storage_path = self.settings('prefect_storage_basepath', 's3://prefect')
+        storage_path = self.address_settings.prefect_storage_basepath
         base_path = f'{storage_path}/_files/{identity}'
         block = self.define_storage_block(base_path, f'{identity}-{block_name}-files')
-        await block.save(overwrite=True, client=self.prefect_client)
-        await self.upload_files(block)
+        # Use a unique file name to make sure it does not overlap with user's files.
+        self._script = '81503f92-f80a-4a8f-855c-b399f2ec41df.sh'
+        self._files_block = block.full_name
+        return block
+
+    async def save_files_block(self, block: PrefectBlock):
+        """Saves a files block and uploads files to it."""
+        with self.stages.stage('files_block'):
+            await block.save(overwrite=True, client=self.prefect_client)
+        with self.stages.stage('files_upload'):
+            await self.upload_files(block)
 
     async def upload_files(self, block: PrefectBlock):
-        """Uploads files to a files block."""
-        # Use a unique file name to make sure it does not overlap with user's files.
+        """Uploads files to a files block.
+
+        The block contains a bundle index and a script for infractl.prefect.engine, the file
+        content is uploaded to a blob store shared by all deployments, see `infractl.bundle`.
+        Pip dependencies are installed by infractl.prefect.engine from a shared wheelhouse, see
+        `infractl.wheelhouse`.
+        """
         # This script is located in the temporary directory in runtime, but executed from the
         # current directory in runtime. So "$PWD" (or ".") points to the current directory,
         # "$SCRIPT_PATH" points to the temporary directory with this script and all required files.
-        self._script = '81503f92-f80a-4a8f-855c-b399f2ec41df.sh'
+        # Runtime files are extracted by infractl.prefect.engine before running the script.
         script_lines = [
             '#!/bin/bash',
             'set -e',
             'SCRIPT_PATH=$( cd -- "$( dirname -- "${BASH_SOURCE[0]}" )" &> /dev/null && pwd )',
-            'if [[ -f "$SCRIPT_PATH/cwd.tar" ]]; then tar xvf "$SCRIPT_PATH/cwd.tar"; fi',
         ]
-        # Create a temporary directory with the required files, generate bash script to extract the
-        # files to the corresponding locations in runtime, upload the whole directory content to the
-        # file storage.
-        with tempfile.TemporaryDirectory() as dirname:
-            target_path = pathlib.Path(dirname)
-            script_path = target_path / self._script
-            infractl.fs.prepare_to_upload(self.runtime.files, target_path)
-            script_path.write_text('\n'.join(script_lines))
-            await block.block.put_directory(local_path=dirname)
-        self._files_block = block.full_name
+        filesystem = self.block_filesystem(block)
+        base_path = block.block.basepath.rstrip('/')
+        filesystem.makedirs(base_path, exist_ok=True)
+        await asyncio.to_thread(
+            filesystem.pipe_file,
+            f'{base_path}/{self._script}',
+            '\n'.join(script_lines).encode('utf-8'),
+        )
+        if self.runtime.dependencies.pip:
+            await asyncio.to_thread(
+                filesystem.pipe_file,
+                f'{base_path}/{infractl.wheelhouse.REQUIREMENTS_NAME}',
+                '\n'.join(self.runtime.dependencies.pip).encode('utf-8'),
+            )
+        if not self.runtime.files:
+            return
+        sign = None
+        if isinstance(block.block, filesystems.RemoteFileSystem):
+            sign = functools.partial(filesystem.sign, expiration=infractl.fs.PRESIGN_EXPIRATION)
+        stats = await asyncio.to_thread(
+            infractl.fs.upload_bundle,
+            self.runtime.files,
+            filesystem,
+            f'{base_path}/{infractl.bundle.INDEX_NAME}',
+            self.files_blobs_path,
+            sign=sign,
+        )
+        logger.debug(
+            'Uploaded %s of %s blobs (%s bytes) for %s files',
+            stats.uploaded,
+            stats.blobs,
+            stats.uploaded_bytes,
+            stats.files,
+        )
 
     async def create_infrastructure_block(
         self,
@@ -483,8 +577,9 @@ class PrefectRuntimeImplementation(
         """Creates Prefect infrastructure block."""
         block_name = self.sanitize_block_name(block_name)
         block = self.kubernetes_job(customizations=customizations, manifest_filter=manifest_filter)
-        await block.save(block_name, overwrite=True, client=self.prefect_client)
-        return PrefectBlock(kind='kubernetes-job', name=block_name)
+        with self.stages.stage('infrastructure_block'):
+            await block.save(block_name, overwrite=True, client=self.prefect_client)
+        return PrefectBlock(kind='kubernetes-job', name=block_name, block=block)
 
     def kubernetes_job(
         self,
@@ -498,17 +593,13 @@ class PrefectRuntimeImplementation(
         }
 
         # TODO: move the default image to discover
-        image = self.settings('prefect_image', defaults.PREFECT_IMAGE)
+        image = self._image or self.address_settings.prefect_image
         if image:
             job_args['image'] = image
 
-        # TODO: support different targets runtime dependencies, such as using a custom docker image
-        if self.runtime.dependencies.pip:
-            # TODO: check if environment variable EXTRA_PIP_PACKAGES is set and merge if necessary
-            job_args['env']['EXTRA_PIP_PACKAGES'] = ' '.join(self.runtime.dependencies.pip)
-
         # TODO: support different file injection methods, such as using a custom docker image
-        if self.runtime.files:
+        # Runtime files and pip dependencies are installed by infractl.prefect.engine
+        if self.runtime.files or self.runtime.dependencies.pip:
             job_args['command'] = [
                 'python',
                 '-m',
@@ -517,7 +608,11 @@ class PrefectRuntimeImplementation(
                 self._files_block,
                 '--script',
                 self._script,
+                '--blobs',
+                self.files_blobs_path,
             ]
+            if self.runtime.dependencies.pip:
+                job_args['command'] += ['--wheelhouse', self.files_wheelhouse_path]
 
         # name is required for `build_job`
         job = infrastructure.KubernetesJob(name='foo', **job_args)
@@ -543,6 +638,7 @@ class PrefectRuntimeImplementation(
         """Filters Kubernetes Job manifest.
 
         Adds shared volume, if enabled.
+        Adds persistent volume claims for runtime files, if any.
         Adds GPU resource, if enabled
         """
         manifest = copy.deepcopy(manifest)
@@ -550,7 +646,7 @@ class PrefectRuntimeImplementation(
         prefect_container = prefect_pod['containers'][0]
 
         # TODO: make it customizable, also use discover
-        shared_volume_mount = self.settings('prefect_shared_volume_mount')
+        shared_volume_mount = self.address_settings.prefect_shared_volume_mount
         if shared_volume_mount:
             volumes = prefect_pod.setdefault('volumes', [])
             volumes.append(
@@ -569,6 +665,20 @@ class PrefectRuntimeImplementation(
                 },
             )
 
+        # persistent volume claims for pvc:// runtime files
+        for claim in infractl.fs.pvc_claims(self.runtime.files):
+            name = infractl.fs.pvc_volume_name(claim)
+            prefect_pod.setdefault('volumes', []).append(
+                {'name': name, 'persistentVolumeClaim': {'claimName': claim, 'readOnly': True}},
+            )
+            prefect_container.setdefault('volumeMounts', []).append(
+                {
+                    'name': name,
+                    'mountPath': f'{infractl.fs.PVC_MOUNT_PATH}/{claim}',
+                    'readOnly': True,
+                },
+            )
+
         gpus = self.infrastructure_implementation.gpus
         if gpus:
             resources = prefect_container.setdefault('resources', {})
@@ -578,8 +688,25 @@ class PrefectRuntimeImplementation(
         return manifest
 
     def settings(self, name: str, default_value: Any = None) -> Any:
-        """Return a setting value for this infrastructure address."""
-        current_settings = self._settings or infractl.base.SETTINGS
-        return current_settings.get(
-            f'{self.infrastructure_implementation.address}.{name}', default_value
+        """Return a setting value for this infrastructure address.
+
+        Deprecated, use `address_settings` instead.
+        """
+        warnings.warn(
+            'PrefectRuntimeImplementation.settings() is deprecated, use address_settings instead',
+            DeprecationWarning,
+            stacklevel=2,
         )
+        address_settings = self.address_settings
+        if name in address_settings.model_fields_set:
+            return getattr(address_settings, name)
+        return default_value
+
+    @property
+    def address_settings(self) -> infractl.base.AddressSettings:
+        """Returns settings for this infrastructure address."""
+        if self._settings is not None:
+            return infractl.base.get_address_settings(
+                self.infrastructure_implementation.address, self._settings
+            )
+        return self.infrastructure_implementation.address_settings
@@ -0,0 +1,50 @@
+"""Deployment stages of the Prefect runtime.
+
+Stages do not depend on the deployment APIs of Prefect, so they are tested apart from the runtime.
+"""
+
+import asyncio
+import contextlib
+import time
+from typing import Any, Awaitable, Dict, Iterator, List
+
+from infractl.logging import get_logger
+
+logger = get_logger()
+
+
+class DeploymentStages:
+    """Measures deployment stages and runs independent stages concurrently."""
+
+    timings: Dict[str, float]
+    """Stage name -> time in seconds."""
+
+    def __init__(self):
+        self.timings = {}
+
+    def __str__(self) -> str:
+        return ', '.join(f'{name}={seconds:.3f}' for name, seconds in self.timings.items())
+
+    @contextlib.contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Measures a stage, the time is stored in `timings`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = time.perf_counter() - start
+            logger.debug('Deployment stage "%s" took %.3f seconds', name, self.timings[name])
+
+    async def gather(self, name: str, *stages: Awaitable[Any]) -> List[Any]:
+        """Runs independent stages concurrently, measured together as the stage `name`.
+
+        Returns results in the order of stages. If a stage fails, the other stages are cancelled
+        and the error is raised.
+        """
+        with self.stage(name):
+            tasks = [asyncio.ensure_future(stage) for stage in stages]
+            try:
+                return list(await asyncio.gather(*tasks))
+            finally:
+                for task in tasks:
+                    task.cancel()
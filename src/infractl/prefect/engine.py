@@ -2,14 +2,20 @@
 
 import argparse
 import asyncio
+import os
 import pathlib
 import runpy
 import subprocess
 import sys
 import tempfile
+from typing import Optional
 
+from infractl import bundle, wheelhouse
 
-async def run_script(block: str, script: str):
+
+async def run_script(
+    block: str, script: str, blobs: Optional[str] = None, wheelhouse_path: Optional[str] = None
+):
     """Downloads a directory from Prefect storage block and executes a shell script.
 
     Downloads a directory from the specified Prefect storage block and executes a shell script with
@@ -20,6 +26,11 @@ async def run_script(block: str, script: str):
     # https://stackoverflow.com/questions/59895/getting-the-source-directory-of-a-bash-script-from-within
     SCRIPT_DIR=$( cd -- "$( dirname -- "${BASH_SOURCE[0]}" )" &> /dev/null && pwd )
     ```
+
+    If the directory contains a bundle index, the bundle is extracted to the current directory
+    before executing the script, blobs are fetched from `blobs` with the storage block settings.
+    If the directory contains requirements, they are installed from the wheelhouse at
+    `wheelhouse_path`, see `infractl.wheelhouse`.
     """
     # pylint: disable=import-outside-toplevel
     import prefect.blocks.core as blocks
@@ -28,6 +39,17 @@ async def run_script(block: str, script: str):
     storage = await blocks.Block.load(block)
     with tempfile.TemporaryDirectory() as dirname:
         await storage.get_directory(local_path=dirname)
+        requirements_path = pathlib.Path(dirname) / wheelhouse.REQUIREMENTS_NAME
+        if wheelhouse_path and requirements_path.exists():
+            print(f'[infractl.prefect.engine] Installing requirements from {wheelhouse_path}')
+            await asyncio.to_thread(
+                install_requirements, storage, requirements_path, wheelhouse_path
+            )
+        index_path = pathlib.Path(dirname) / bundle.INDEX_NAME
+        if blobs and index_path.exists():
+            print(f'[infractl.prefect.engine] Extracting bundle from {blobs}')
+            stats = await asyncio.to_thread(extract_bundle, storage, index_path, blobs)
+            print(f'[infractl.prefect.engine] {stats}')
         script_path = pathlib.Path(dirname) / script
         if script_path.exists():
             print(f'[infractl.prefect.engine] Running script {script}')
@@ -41,6 +63,33 @@ async def run_script(block: str, script: str):
             print(f'[infractl.prefect.engine] Script {block} not found')
 
 
+def extract_bundle(storage, index_path: pathlib.Path, blobs: str) -> bundle.ExtractStats:
+    """Extracts a bundle to the current directory."""
+    # pylint: disable=import-outside-toplevel
+    import fsspec
+
+    # RemoteFileSystem blocks have fsspec settings, such as credentials
+    settings = getattr(storage, 'settings', None) or {}
+    fs, blobs_path = fsspec.core.url_to_fs(blobs, **settings)
+    return bundle.extract(
+        bundle.Bundle.loads(index_path.read_bytes()),
+        '.',
+        fetch=lambda path: fs.cat_file(f'{blobs_path}/{path}'),
+        cache_dir=os.environ.get(bundle.BLOB_CACHE_ENV),
+    )
+
+
+def install_requirements(storage, requirements_path: pathlib.Path, wheelhouse_path: str) -> bool:
+    """Installs requirements from a wheelhouse, returns True if the wheelhouse existed."""
+    # pylint: disable=import-outside-toplevel
+    import fsspec
+
+    settings = getattr(storage, 'settings', None) or {}
+    fs, path = fsspec.core.url_to_fs(wheelhouse_path, **settings)
+    get, put = wheelhouse.filesystem_store(fs, path)
+    return wheelhouse.install(requirements_path, get, put)
+
+
 def create_parser() -> argparse.ArgumentParser:
     """Creates argument parser."""
     parser = argparse.ArgumentParser()
@@ -52,6 +101,10 @@ def create_parser() -> argparse.ArgumentParser:
         default='entrypoint.sh',
         help='Script name to execute (default is "entrypoint.sh")',
     )
+    parser.add_argument('--blobs', help='Location of blobs for a bundle in the storage block')
+    parser.add_argument(
+        '--wheelhouse', help='Location of wheelhouses for requirements in the storage block'
+    )
     return parser
 
 
@@ -59,7 +112,7 @@ def main():
     """Entry point."""
     args = create_parser().parse_args()
     if args.block:
-        asyncio.run(run_script(args.block, args.script))
+        asyncio.run(run_script(args.block, args.script, args.blobs, args.wheelhouse))
     # Delete all command line arguments, prefect.engine does not need them
     sys.argv = sys.argv[0:1]
     runpy.run_module('prefect.engine', run_name='__main__')
@@ -0,0 +1,76 @@
+import asyncio
+import contextlib
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+import infractl
+import infractl.api.map
+import infractl.base
+
+
+class FakeRunner(infractl.base.Runnable):
+    def __init__(self, delays=None):
+        self.delays = delays or {}
+        self.running = 0
+        self.max_running = 0
+
+    async def run(self, parameters=None, timeout=None, detach=False):
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            await asyncio.sleep(self.delays.get(parameters['x'], 0.01))
+        finally:
+            self.running -= 1
+        return parameters['x']
+
+
+@pytest.mark.asyncio
+async def test_map_ordered():
+    runner = FakeRunner(delays={0: 0.05})
+    program = infractl.base.DeployedProgram(program=infractl.program('flow.py'), runner=runner)
+    runs = await infractl.map(program, [{'x': x} for x in range(20)], max_concurrency=4)
+    assert runs == list(range(20))
+    assert runner.max_running == 4
+
+
+@pytest.mark.asyncio
+async def test_map_as_completed():
+    runner = FakeRunner(delays={0: 0.5})
+    program = infractl.base.DeployedProgram(program=infractl.program('flow.py'), runner=runner)
+    runs = []
+    async for run in infractl.map_as_completed(program, [{'x': x} for x in range(5)]):
+        if not runs:
+            # the first run is yielded while the slow run is still running
+            assert runner.running == 1
+        runs.append(run)
+    assert runs[-1] == 0
+    assert sorted(runs) == list(range(5))
+
+
+@pytest.mark.asyncio
+async def test_map_as_completed_cancels_on_close():
+    runner = FakeRunner(delays={0: 10})
+    program = infractl.base.DeployedProgram(program=infractl.program('flow.py'), runner=runner)
+    runs = infractl.map_as_completed(program, [{'x': x} for x in range(3)])
+    async with contextlib.aclosing(runs):
+        assert await anext(runs) in (1, 2)
+    await asyncio.sleep(0)
+    assert runner.running == 0
+
+
+@pytest.mark.asyncio
+async def test_map_deploys_once():
+    runner = FakeRunner()
+    program = infractl.base.DeployedProgram(program=infractl.program('flow.py'), runner=runner)
+    deploy_mock = AsyncMock(return_value=program)
+    with patch.object(infractl.api.map, 'deploy', new=deploy_mock):
+        runs = await infractl.map(infractl.program('flow.py'), [{'x': 1}, {'x': 2}])
+    deploy_mock.assert_awaited_once()
+    assert runs == [1, 2]
+
+
+@pytest.mark.asyncio
+async def test_map_invalid_concurrency():
+    with pytest.raises(ValueError):
+        await infractl.map(infractl.program('flow.py'), [], max_concurrency=0)
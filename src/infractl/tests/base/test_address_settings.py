@@ -0,0 +1,61 @@
+import dynaconf
+import pydantic
+import pytest
+
+import infractl.base
+from infractl import defaults
+
+
+@pytest.fixture
+def settings(monkeypatch):
+    settings = dynaconf.Dynaconf()
+    settings.update({'localtest.me': {'prefect_queue': 'dev', 'PREFECT_IMAGE': 'image'}})
+    monkeypatch.setattr(infractl.base, 'SETTINGS', settings)
+    return settings
+
+
+def test_address_settings(settings):
+    address_settings = infractl.base.get_address_settings('localtest.me')
+    assert address_settings.prefect_queue == 'dev'
+    assert address_settings.prefect_image == 'image', 'keys are case insensitive'
+    assert address_settings.prefect_storage_basepath == 's3://prefect', 'default value'
+
+    other_settings = infractl.base.get_address_settings('example.com')
+    assert other_settings.address == 'example.com'
+    assert other_settings.prefect_image == defaults.PREFECT_IMAGE
+
+    with pytest.raises(pydantic.ValidationError):
+        address_settings.prefect_queue = 'prod'
+
+
+def test_address_settings_snapshot(settings):
+    address_settings = infractl.base.get_address_settings('localtest.me')
+    settings['localtest.me.prefect_queue'] = 'prod'
+    assert infractl.base.get_address_settings('localtest.me') is address_settings
+
+    infractl.base.invalidate_address_settings('localtest.me')
+    assert infractl.base.get_address_settings('localtest.me').prefect_queue == 'prod'
+
+
+def test_address_settings_unknown(settings, caplog):
+    settings['localtest.me.prefect_qeueu'] = 'dev'
+    settings['localtest.me.prefect_storage_fsspec'] = {'client_kwargs': {'region_name': 'x'}}
+    infractl.base.invalidate_address_settings()
+    address_settings = infractl.base.get_address_settings('localtest.me')
+    assert address_settings.prefect_queue == 'dev'
+    assert type(address_settings.prefect_storage_fsspec['client_kwargs']) is dict
+    assert 'prefect_qeueu' in caplog.text
+
+
+def test_address_settings_invalid(settings):
+    settings['localtest.me.prefect_queue'] = ['dev']
+    infractl.base.invalidate_address_settings()
+    with pytest.raises(infractl.base.AddressSettingsError, match='prefect_queue'):
+        infractl.base.get_address_settings('localtest.me')
+
+
+def test_address_settings_shared(settings):
+    infrastructure = infractl.base.get_infrastructure_implementation(
+        infractl.infrastructure(address='localtest.me')
+    )
+    assert infrastructure.address_settings is infractl.base.get_address_settings('localtest.me')
@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+
+from infractl.base import program
+
+
+class FakeProgramRun(program.ProgramRun):
+    """Program run which completes after a number of updates."""
+
+    def __init__(self, updates: int):
+        self.updates = updates
+
+    async def update(self) -> None:
+        self.updates -= 1
+
+    def is_final(self) -> bool:
+        return self.updates <= 0
+
+
+class FakeProgramRunGroup(program.ProgramRunGroup):
+    refreshes = 0
+
+    async def refresh(self, runs=None):
+        FakeProgramRunGroup.refreshes += 1
+        await super().refresh(runs)
+
+
+class GroupedProgramRun(FakeProgramRun):
+    @classmethod
+    def group_class(cls):
+        return FakeProgramRunGroup
+
+
+def test_poll_intervals():
+    intervals = program.poll_intervals(1)
+    values = [next(intervals) for _ in range(10)]
+    assert values[0] == program.MIN_POLL_INTERVAL
+    assert values == sorted(values), 'intervals grow'
+    assert values[-1] == 1, 'intervals are limited by poll_interval'
+
+
+def test_group_class():
+    assert type(program.group([FakeProgramRun(1)])) is program.ProgramRunGroup
+    assert type(program.group([GroupedProgramRun(1)])) is FakeProgramRunGroup
+    assert (
+        type(program.group([GroupedProgramRun(1), FakeProgramRun(1)])) is program.ProgramRunGroup
+    ), 'runs of different runtimes use the generic group'
+
+
+@pytest.mark.asyncio
+async def test_group_as_completed():
+    runs = [GroupedProgramRun(3), GroupedProgramRun(0), GroupedProgramRun(1)]
+    group = program.group(runs, poll_interval=0.01)
+    assert len(group.pending()) == 2
+
+    FakeProgramRunGroup.refreshes = 0
+    completed = [run async for run in group.as_completed()]
+    assert completed == [runs[1], runs[2], runs[0]]
+    assert FakeProgramRunGroup.refreshes == 3, 'all pending runs are refreshed at once'
+
+
+@pytest.mark.asyncio
+async def test_group_wait():
+    runs = [FakeProgramRun(3), FakeProgramRun(2)]
+    group = program.group(runs, poll_interval=0.01)
+    assert await group.wait_any() is runs[1]
+    assert await group.wait_all() == runs
+    assert not group.pending()
+
+    with pytest.raises(asyncio.TimeoutError):
+        await program.group([FakeProgramRun(1000)], poll_interval=1).wait_all(timeout=0.1)
+
+
+@pytest.mark.asyncio
+async def test_run_parallelism():
+    class Runner(program.Runnable):
+        async def run(self, parameters=None, timeout=None, detach=False, **kwargs):
+            return kwargs
+
+    deployed_program = program.DeployedProgram(program=program.Program('flow.py'), runner=Runner())
+    assert await deployed_program.run() == {}
+    with pytest.raises(NotImplementedError):
+        await deployed_program.run(parameters=[{}, {}], parallelism=2)
+
+    Runner.parallel = True
+    assert await deployed_program.run(parameters=[{}, {}], parallelism=2) == {'parallelism': 2}
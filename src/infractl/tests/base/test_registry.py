@@ -1,3 +1,8 @@
+import importlib.metadata
+import subprocess
+import sys
+from unittest.mock import Mock, patch
+
 import pytest
 
 import infractl.base
@@ -17,3 +22,62 @@ def test_registered_class():
     assert isinstance(instance, SubClass)
     with pytest.raises(KeyError):
         _ = infractl.base.RegisteredClass.get(TheClass, 'NoSuchClass')
+
+
+class LazyClass(metaclass=infractl.base.RegisteredClass, plugins={'lazy': f'{__name__}:Plugin'}):
+    pass
+
+
+class Plugin(LazyClass, register=False):
+    pass
+
+
+class EntryPointClass(LazyClass, register=False):
+    pass
+
+
+def test_registered_class_plugin():
+    assert infractl.base.RegisteredClass.is_available(LazyClass, 'lazy')
+    assert 'lazy' not in LazyClass.subclasses(), 'plugin is not loaded before lookup'
+    assert infractl.base.RegisteredClass.get(LazyClass, 'lazy') is Plugin
+    assert not infractl.base.RegisteredClass.is_available(LazyClass, 'NoSuchClass')
+
+
+def test_registered_class_entry_point():
+    class EntryPointLazyClass(
+        metaclass=infractl.base.RegisteredClass, entry_point_group='infractl.tests'
+    ):
+        pass
+
+    entry_point = importlib.metadata.EntryPoint(
+        name='external', value=f'{__name__}:EntryPointClass', group='infractl.tests'
+    )
+    with patch.object(
+        importlib.metadata, 'entry_points', new=Mock(return_value=[entry_point])
+    ) as entry_points:
+        assert infractl.base.RegisteredClass.is_available(EntryPointLazyClass, 'external')
+        entry_points.assert_called_with(group='infractl.tests', name='external')
+        # EntryPointClass is not a subclass of EntryPointLazyClass
+        with pytest.raises(KeyError):
+            infractl.base.RegisteredClass.get(EntryPointLazyClass, 'external')
+
+
+def test_kubernetes_runtime_does_not_import_prefect():
+    code = '\n'.join(
+        [
+            'import sys',
+            'import infractl',
+            'import infractl.base',
+            'import infractl.docker',
+            'infrastructure = infractl.base.get_infrastructure_implementation(',
+            '    infractl.infrastructure()',
+            ')',
+            'runtime = infractl.runtime(kind="kubernetes")',
+            'infractl.base.get_runtime_implementation(runtime, infrastructure)',
+            'print(",".join(name for name in sys.modules if name.startswith("prefect")))',
+        ]
+    )
+    result = subprocess.run(
+        [sys.executable, '-c', code], capture_output=True, check=True, text=True
+    )
+    assert result.stdout.strip() == ''
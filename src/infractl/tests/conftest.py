@@ -6,6 +6,9 @@ from typing import Union
 
 import pytest
 
+import infractl.base
+import infractl.cache
+
 
 class SetCwd:
     """Context manager to temporary change current working directory."""
@@ -29,10 +32,27 @@ def set_cwd():
     return SetCwd
 
 
+@pytest.fixture(autouse=True)
+def deployment_cache(monkeypatch):
+    """Uses an empty in-memory deployment cache in each test."""
+    cache = infractl.cache.DeploymentCache(path=None)
+    monkeypatch.setattr(infractl.cache, "DEFAULT_CACHE", cache)
+    return cache
+
+
 # Skip test modules that depend on Prefect 2.x APIs (deployments.Deployment, etc.)
 # removed in Prefect 3.x. These tests need a full migration to the Prefect 3.x SDK.
+# Until then, Prefect deployment is tested only for concurrent deployment stages in
+# prefect/test_prefect_stages.py, program runs are tested in prefect/test_prefect_program_run.py.
 collect_ignore_glob = [
     "prefect/test_prefect_program.py",
     "prefect/test_prefect_runtime.py",
     "kubernetes/test_kubernetes_program.py",
 ]
+
+
+@pytest.fixture(autouse=True)
+def address_settings():
+    """Drops settings snapshots after each test, since tests change settings."""
+    yield
+    infractl.base.invalidate_address_settings()
@@ -0,0 +1,92 @@
+import pathlib
+
+import pytest
+
+import infractl
+import infractl.docker
+import infractl.docker.bake as bake
+
+
+class RecordingBuilder(infractl.docker.Builder):
+    """Builder that records builds and keeps built images in memory."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.images = set()
+        self.contexts = []
+
+    def build(self, stream_callback=None, **kwargs) -> infractl.docker.Image:
+        context = pathlib.Path(kwargs['path'])
+        self.contexts.append(
+            {
+                str(path.relative_to(context)): path.read_text()
+                for path in context.rglob('*')
+                if path.is_file()
+            }
+        )
+        self.images.add(kwargs['tag'])
+        return infractl.docker.Image.from_full_name(kwargs['tag'])
+
+    def image_exists(self, tag: str) -> bool:
+        return tag in self.images
+
+
+@pytest.fixture
+def builder():
+    return RecordingBuilder(infrastructure=infractl.infrastructure(address='nosuchhost.no'))
+
+
+def test_image_strategy():
+    assert infractl.runtime().image_strategy == infractl.base.ImageStrategy.INSTALL
+    assert infractl.runtime(image_strategy='bake').image_strategy == 'bake'
+    with pytest.raises(ValueError):
+        infractl.runtime(image_strategy='no_such_strategy')
+
+
+def test_bake(builder: RecordingBuilder):
+    runtime = infractl.runtime(
+        dependencies={'pip': ['boto', 'botocore']},
+        files=['s3://bucket/data.csv'],
+        image_strategy='bake',
+    )
+    image = bake.bake(
+        runtime, 'python:3.11', builder.infrastructure.infrastructure, builder=builder
+    )
+    assert image.startswith(f'localhost:5000/{bake.IMAGE_NAME}:')
+    assert len(builder.contexts) == 1
+    assert builder.contexts[0]['requirements.txt'] == 'boto\nbotocore\n'
+    assert builder.contexts[0]['Dockerfile'].startswith('FROM python:3.11\n')
+
+    # the same content reuses the image
+    runtime = infractl.runtime(dependencies={'pip': ['botocore', 'boto']}, image_strategy='bake')
+    assert bake.bake(runtime, 'python:3.11', None, builder=builder) == image
+    assert len(builder.contexts) == 1
+
+    remaining = bake.remaining_runtime(runtime)
+    assert remaining.dependencies.pip == []
+    assert runtime.dependencies.pip == ['botocore', 'boto']
+
+    # a different base image requires a new image
+    assert bake.bake(runtime, 'python:3.12', None, builder=builder) != image
+    assert len(builder.contexts) == 2
+
+
+def test_bake_files(tmp_path: pathlib.Path, builder: RecordingBuilder):
+    (tmp_path / 'data').mkdir()
+    (tmp_path / 'data' / 'file1').write_text('1')
+    runtime = infractl.runtime(
+        files=[f'{tmp_path}/data/', 's3://bucket/data.csv'], image_strategy='bake-files'
+    )
+    image = bake.bake(runtime, 'python:3.11', None, working_dir='/root', builder=builder)
+    assert builder.contexts[0]['files/file1'] == '1'
+    assert 'WORKDIR /root\nCOPY files/ ./\n' in builder.contexts[0]['Dockerfile']
+    assert [file.src for file in bake.remaining_runtime(runtime).files] == ['s3://bucket/data.csv']
+
+    # changed content requires a new image
+    (tmp_path / 'data' / 'file1').write_text('2')
+    assert bake.bake(runtime, 'python:3.11', None, working_dir='/root', builder=builder) != image
+
+    # only dependencies are baked with 'bake'
+    runtime = infractl.runtime(files=[f'{tmp_path}/data/'], image_strategy='bake')
+    assert not bake.needs_image(runtime)
+    assert bake.bake(runtime, 'python:3.11', None, builder=builder) == 'python:3.11'
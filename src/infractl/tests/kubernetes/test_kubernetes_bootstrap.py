@@ -0,0 +1,165 @@
+import http.server
+import json
+import os
+import pathlib
+import subprocess
+import sys
+import threading
+import urllib.parse
+
+import fsspec
+import pytest
+
+import infractl.base
+import infractl.fs
+from infractl import bundle
+from infractl.plugins.kubernetes_runtime import bootstrap, engine
+
+PROGRAM = """
+import pathlib
+
+
+def main(name):
+    return {'name': name, 'file': pathlib.Path('data/file1').read_text()}
+"""
+
+
+def test_run(tmp_path: pathlib.Path):
+    storage = tmp_path / 'storage'
+    code = storage / 'program' / 'code'
+    data = storage / 'program' / 'data'
+    run_path = storage / 'program' / 'runs' / 'run1'
+    code.mkdir(parents=True)
+    data.mkdir(parents=True)
+    run_path.mkdir(parents=True)
+    (code / 'program.py').write_text(PROGRAM)
+
+    (tmp_path / 'local').mkdir()
+    (tmp_path / 'local' / 'file1').write_text('content')
+    infractl.fs.upload_bundle(
+        [infractl.base.RuntimeFile(src=f'{tmp_path}/local/', dst='data/')],
+        fsspec.filesystem('file'),
+        str(data / bundle.INDEX_NAME),
+        str(storage / 'blobs'),
+    )
+    index = bundle.Bundle.loads((data / bundle.INDEX_NAME).read_bytes())
+    manifest = {
+        'code': {'program.py': f'file://{code}/program.py'},
+        'data': {
+            'engine.py': f'file://{engine.__file__}',
+            'bundle.py': f'file://{bundle.__file__}',
+            bundle.INDEX_NAME: f'file://{data}/{bundle.INDEX_NAME}',
+        },
+        'blobs': {path: f'file://{storage}/blobs/{path}' for path in index.blob_paths()},
+        'parameters': engine.dumps({'name': 'foo'}).decode(),
+        'result': f'file://{run_path}/result.bin',
+        'wheelhouse': None,
+    }
+    (run_path / 'manifest.json').write_text(json.dumps(manifest))
+
+    working_dir = tmp_path / 'working'
+    working_dir.mkdir()
+    env = os.environ.copy()
+    env[bootstrap.MANIFEST_ENV] = f'file://{run_path}/manifest.json'
+    env.pop('PYTHONPATH', None)
+    # the runtime passes the bootstrap source inline
+    process = subprocess.run(
+        [
+            sys.executable,
+            '-c',
+            pathlib.Path(bootstrap.__file__).read_text(),
+            '--',
+            'program.py',
+            '--entrypoint',
+            'main',
+        ],
+        cwd=working_dir,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    assert process.returncode == 0, process.stderr
+    assert (working_dir / 'data' / 'file1').read_text() == 'content'
+    result = engine.loads((run_path / 'result.bin').read_bytes())
+    assert result == {'name': 'foo', 'file': 'content'}
+
+
+class StorageHandler(http.server.BaseHTTPRequestHandler):
+    """Serves objects from memory, like presigned URLs, fails the first request with HTTP 503."""
+
+    objects: dict
+    requests: list
+
+    def _send(self, status: int, data: bytes = b''):
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        self.requests.append(('GET', self.path))
+        if len(self.requests) == 1:
+            self._send(503)
+            return
+        key = urllib.parse.urlparse(self.path).path
+        if key not in self.objects:
+            self._send(404)
+            return
+        self._send(200, self.objects[key])
+
+    def do_PUT(self):
+        self.requests.append(('PUT', self.path))
+        data = self.rfile.read(int(self.headers['Content-Length']))
+        self.objects[urllib.parse.urlparse(self.path).path] = data
+        self._send(200)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def storage_server():
+    handler = type('Handler', (StorageHandler,), {'objects': {}, 'requests': []})
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}', handler
+    server.shutdown()
+
+
+def test_storage(tmp_path: pathlib.Path, storage_server, monkeypatch):
+    url, handler = storage_server
+    monkeypatch.setattr(bootstrap.time, 'sleep', lambda seconds: None)
+    storage = bootstrap.Storage()
+    handler.objects['/bucket/file1'] = b'1'
+
+    # the first request is retried
+    assert storage.get(f'{url}/bucket/file1?Signature=secret') == b'1'
+    assert storage.find(f'{url}/bucket/no_such_file') is None
+    with pytest.raises(bootstrap.BootstrapError, match='not found') as error:
+        storage.get(f'{url}/bucket/no_such_file?Signature=secret')
+    assert 'secret' not in str(error.value)
+
+    storage.put(f'{url}/bucket/dir/file2?Signature=secret', b'2')
+    storage.download({'sub/file2': f'{url}/bucket/dir/file2'}, tmp_path / 'target')
+    assert (tmp_path / 'target' / 'sub' / 'file2').read_bytes() == b'2'
+
+    # files are streamed
+    (tmp_path / 'file3').write_bytes(b'3' * 1000)
+    storage.put(f'{url}/bucket/file3', tmp_path / 'file3')
+    assert handler.objects['/bucket/file3'] == b'3' * 1000
+
+
+def test_select_shard(monkeypatch):
+    manifest = {
+        'parameters': None,
+        'result': None,
+        'shards': [{'parameters': '{}', 'result': 'url0'}, {'parameters': None, 'result': 'url1'}],
+    }
+    assert bootstrap.select_shard({'parameters': '{}', 'shards': None})['parameters'] == '{}'
+    monkeypatch.delenv(bootstrap.COMPLETION_INDEX_ENV, raising=False)
+    with pytest.raises(bootstrap.BootstrapError):
+        bootstrap.select_shard(manifest)
+    monkeypatch.setenv(bootstrap.COMPLETION_INDEX_ENV, '1')
+    assert bootstrap.select_shard(manifest)['result'] == 'url1'
@@ -1,4 +1,14 @@
+import dataclasses
+import datetime
+import decimal
+import enum
+import io
+import pathlib
+import pickle
+import uuid
+
 import pydantic
+import pytest
 
 from infractl.base.runtime import RuntimeFile
 from infractl.plugins.kubernetes_runtime import engine
@@ -8,6 +18,16 @@ class Foo(pydantic.BaseModel):
     foo: str
 
 
+class Color(enum.Enum):
+    RED = 'red'
+
+
+@dataclasses.dataclass
+class Bar:
+    foo: Foo
+    when: datetime.datetime
+
+
 def test_get_full_name():
     assert engine.get_full_name(RuntimeFile) == 'infractl.base.runtime.RuntimeFile'
 
@@ -29,3 +49,87 @@ def test_dumps_loads():
 
     data = engine.loads(engine.dumps(42))
     assert data == 42
+
+
+def test_dumps_loads_types():
+    values = [
+        Bar(foo=Foo(foo='bar'), when=datetime.datetime(2024, 1, 2, 3, 4, 5)),
+        datetime.date(2024, 1, 2),
+        Color.RED,
+        b'\x00\x01',
+        {1, 2},
+        decimal.Decimal('1.5'),
+        uuid.UUID('12345678-1234-5678-1234-567812345678'),
+        pathlib.Path('/tmp/file'),
+    ]
+    for value in values:
+        assert engine.loads(engine.dumps(value)) == value
+
+    data = engine.loads(engine.dumps(ValueError('message')))
+    assert isinstance(data, ValueError) and str(data) == 'message'
+
+
+class Blob:
+    """Object with a buffer, which is pickled out-of-band like a NumPy array."""
+
+    def __init__(self, data):
+        self.data = data
+
+    def __reduce_ex__(self, protocol):
+        return Blob, (pickle.PickleBuffer(self.data),)
+
+
+def test_container(tmp_path: pathlib.Path):
+    blob = Blob(bytearray(b'x' * 1000))
+    value = {'blob': blob, 'when': datetime.date(2024, 1, 2), 'items': [1, 2]}
+
+    buffer = io.BytesIO()
+    engine.write(value, buffer)
+    data = buffer.getvalue()
+    assert data.startswith(engine.MAGIC)
+    # the buffer is a frame of its own, aligned in the container
+    assert data.index(b'x' * 1000) % engine.FRAME_ALIGNMENT == 0
+
+    path = tmp_path / engine.RESULT_NAME
+    path.write_bytes(data)
+    result = engine.read_file(path)
+    assert result['when'] == value['when'] and result['items'] == [1, 2]
+    # the buffer is a view of the memory-mapped file
+    assert isinstance(result['blob'].data, memoryview) and result['blob'].data.readonly
+    assert bytes(result['blob'].data) == b'x' * 1000
+
+
+@pytest.mark.parametrize('codec', ['json', 'pickle'])
+@pytest.mark.parametrize('compression', [None, *engine.COMPRESSIONS])
+def test_container_codecs(codec, compression):
+    value = {'name': 'foo', 'values': [1.5] * 100}
+    buffer = io.BytesIO()
+    engine.write(value, buffer, codec=codec, compression=compression)
+    assert engine.loads(buffer.getvalue()) == value
+
+
+def test_container_version():
+    buffer = io.BytesIO()
+    engine.write(42, buffer)
+    data = bytearray(buffer.getvalue())
+    data[len(engine.MAGIC)] = engine.FORMAT_VERSION + 1
+    with pytest.raises(ValueError, match='version'):
+        engine.read(data)
+
+
+def test_container_arrow():
+    pyarrow = pytest.importorskip('pyarrow')
+    table = pyarrow.table({'x': [1, 2, 3]})
+    assert engine.select_codec(table).name == 'arrow'
+    buffer = io.BytesIO()
+    engine.write(table, buffer)
+    assert engine.loads(buffer.getvalue()).equals(table)
+
+
+def test_parameters():
+    assert engine.encode_parameters({'name': 'foo'}) == '{"name": "foo"}'
+    # objects that JSON does not support are encoded with pickle
+    text = engine.encode_parameters({'blob': Blob(bytearray(b'abc'))})
+    assert text.startswith(engine.BASE64_PREFIX)
+    assert bytes(engine.decode_parameters(text)['blob'].data) == b'abc'
+    assert engine.decode_parameters('{"name": "foo"}') == {'name': 'foo'}
@@ -0,0 +1,381 @@
+import asyncio
+import json
+import threading
+from unittest.mock import Mock, patch
+
+import fsspec
+import pytest
+from kubernetes import client
+
+import infractl.base
+from infractl import kubernetes
+from infractl.plugins.kubernetes_runtime import runtime
+
+
+def test_run_manifest():
+    job = runtime._get_job('program', 'default')
+    runner = runtime.KubernetesRunner(
+        job, runtime.RemoteStorage(fs=None, base_path='bucket/program')
+    )
+
+    name1 = runtime._get_run_name(runner.name, runtime._get_run_id())
+    name2 = runtime._get_run_name(runner.name, runtime._get_run_id())
+    assert name1 != name2, 'each run gets a unique job name'
+    assert name1.startswith('program-')
+
+    manifest = runner.run_manifest(name1, 'https://s3/manifest.json', run_id='abc')
+    assert manifest.metadata.name == name1
+    assert manifest.metadata.labels == {runtime.RUN_ID_LABEL: 'abc'}
+    assert manifest.spec.template.metadata.labels == {
+        runtime.PROGRAM_LABEL: 'program',
+        runtime.RUN_ID_LABEL: 'abc',
+    }
+    assert runner.manifest.metadata.name == 'program', 'deployed manifest is not modified'
+    env = {item.name: item.value for item in manifest.spec.template.spec.containers[0].env}
+    assert env == {'ICL_MANIFEST_URL': 'https://s3/manifest.json'}
+
+
+def test_bootstrap_manifest():
+    def sign(path, expiration, client_method='get_object'):
+        return f'https://s3/{path}?method={client_method}&expires={expiration}'
+
+    fs = fsspec.filesystem('memory')
+    storage = runtime.RemoteStorage(
+        fs=fs, base_path='/bucket/program', signing_fs=Mock(sign=Mock(side_effect=sign))
+    )
+    files = runtime.DeployedFiles(
+        code={'program.py': 'bucket/program/code/program.py'},
+        data={'engine.py': 'bucket/program/data/engine.py'},
+        blobs={'ab/abc.gz': 'bucket/_blobs/ab/abc.gz'},
+        wheelhouse_key='key',
+        wheelhouse_path='bucket/_wheelhouse/key.tar',
+    )
+    runner = runtime.KubernetesRunner(
+        runtime._get_job('program', 'default'), storage, files=files, expiration=60
+    )
+
+    url = runner.upload_bootstrap_manifest('run1', {'name': 'foo'})
+    assert url == 'https://s3//bucket/program/runs/run1/manifest.json?method=get_object&expires=60'
+    manifest = json.loads(fs.cat_file('/bucket/program/runs/run1/manifest.json'))
+    assert manifest['code'] == {
+        'program.py': 'https://s3/bucket/program/code/program.py?method=get_object&expires=60'
+    }
+    assert manifest['blobs'] == {
+        'ab/abc.gz': 'https://s3/bucket/_blobs/ab/abc.gz?method=get_object&expires=60'
+    }
+    assert runtime.engine.loads(manifest['parameters'].encode()) == {'name': 'foo'}
+    assert manifest['result'].startswith(
+        'https://s3//bucket/program/runs/run1/result.bin?method=put_object'
+    )
+    assert manifest['wheelhouse']['key'] == 'key'
+    assert 'method=put_object' in manifest['wheelhouse']['put']
+
+    manifest = runner.bootstrap_manifest('run2')
+    assert manifest['parameters'] is None
+    assert manifest['shards'] is None
+
+    manifest = runner.bootstrap_manifest('run3', shards=[{'name': 'foo'}, None])
+    assert manifest['parameters'] is None
+    assert [shard['result'].split('?')[0] for shard in manifest['shards']] == [
+        'https://s3//bucket/program/runs/run3/results/0.bin',
+        'https://s3//bucket/program/runs/run3/results/1.bin',
+    ]
+    assert runtime.engine.loads(manifest['shards'][0]['parameters'].encode()) == {'name': 'foo'}
+    assert manifest['shards'][1]['parameters'] is None
+    # only the first shard uploads a missing wheelhouse
+    assert 'put' not in manifest['wheelhouse']
+    assert 'put' in manifest['shards'][0]['wheelhouse']
+    assert manifest['shards'][1]['wheelhouse'] == manifest['wheelhouse']
+
+
+def test_run_manifest_indexed():
+    runner = runtime.KubernetesRunner(
+        runtime._get_job('program', 'default'),
+        runtime.RemoteStorage(fs=None, base_path='bucket/program'),
+    )
+    manifest = runner.run_manifest('program-1', 'https://s3/manifest.json', 10, parallelism=4)
+    assert manifest.spec.completion_mode == 'Indexed'
+    assert (manifest.spec.completions, manifest.spec.parallelism) == (10, 4)
+    assert manifest.spec.backoff_limit is None
+    assert manifest.spec.backoff_limit_per_index == 0
+    assert runner.manifest.spec.completion_mode == 'NonIndexed'
+
+    manifest = runner.run_manifest('program-2', 'https://s3/manifest.json', 2, parallelism=4)
+    assert manifest.spec.parallelism == 2
+
+
+def test_run_name_length():
+    name = runtime._get_run_name('x' * 63, runtime._get_run_id())
+    assert len(name) <= 63
+
+
+@pytest.mark.asyncio
+async def test_group_refresh():
+    job = runtime._get_job('program', 'default')
+    assert job.spec.template.metadata.labels == {runtime.PROGRAM_LABEL: 'program'}
+    runner = runtime.KubernetesRunner(job, runtime.RemoteStorage(fs=None, base_path='bucket'))
+    runs = [runtime.KubernetesProgramRun(runner, name=f'program-{index}') for index in range(3)]
+
+    def pod(name, phase):
+        return client.V1Pod(
+            metadata=client.V1ObjectMeta(labels={'job-name': name}),
+            status=client.V1PodStatus(phase=phase),
+        )
+
+    kube_api = Mock()
+    list_pods = kube_api.core_v1.return_value.list_namespaced_pod
+    list_pods.return_value = client.V1PodList(
+        items=[pod('program-0', 'Succeeded'), pod('program-1', 'Running')]
+    )
+    group = infractl.base.group(runs)
+    assert isinstance(group, runtime.KubernetesProgramRunGroup)
+    async_api = kubernetes.AsyncKubeApi(kube_api=kube_api)
+    with patch.object(runtime.kubernetes, 'async_api', new=Mock(return_value=async_api)):
+        await group.refresh()
+    list_pods.assert_called_once_with(
+        namespace='default',
+        label_selector=f'{runtime.PROGRAM_LABEL}=program',
+        _request_timeout=kubernetes.REQUEST_TIMEOUT,
+    )
+    assert [run.state for run in runs] == [
+        runtime.ProgramState.COMPLETED,
+        runtime.ProgramState.RUNNING,
+        runtime.ProgramState.SCHEDULED,
+    ]
+
+
+def test_indexed_run_state():
+    runner = runtime.KubernetesRunner(
+        runtime._get_job('program', 'default'), runtime.RemoteStorage(fs=None, base_path='bucket')
+    )
+    run = runtime.KubernetesProgramRun(runner, name='program-1', completions=3)
+
+    def pod(index, phase):
+        return client.V1Pod(
+            metadata=client.V1ObjectMeta(
+                labels={'job-name': 'program-1'},
+                annotations={runtime.COMPLETION_INDEX_ANNOTATION: str(index)},
+            ),
+            status=client.V1PodStatus(phase=phase),
+        )
+
+    run.update_pods([pod(0, 'Pending')])
+    assert run.is_scheduled()
+    run.update_pods([pod(0, 'Succeeded'), pod(1, 'Running')])
+    assert run.is_running()
+    run.update_pods([pod(1, 'Succeeded'), pod(2, 'Succeeded')])
+    assert run.is_completed()
+    assert repr(run) == 'program-1 (Completed, 3 of 3 shards completed)'
+
+    # a deleted shard fails, but the run is final only when all shards are final
+    run = runtime.KubernetesProgramRun(runner, name='program-1', completions=2)
+    run.update_pods([pod(0, 'Running')], deleted=True)
+    assert run.is_running()
+    run.update_pods([pod(1, 'Succeeded')])
+    assert run.is_failed()
+
+
+def test_run_manifest_timeout():
+    runner = runtime.KubernetesRunner(
+        runtime._get_job('program', 'default'), runtime.RemoteStorage(fs=None, base_path='bucket')
+    )
+    manifest = runner.run_manifest('program-1', 'https://s3/manifest.json', timeout=10.5)
+    assert manifest.spec.active_deadline_seconds == 11
+    manifest = runner.run_manifest('program-2', 'https://s3/manifest.json')
+    assert manifest.spec.active_deadline_seconds is None
+
+
+class FakeWatch:
+    """Watch that yields prepared events for each stream, one list of events per stream.
+
+    When there are no more prepared streams, a stream waits until the watch is stopped.
+    """
+
+    streams: list = []
+    calls: list = []
+
+    def __init__(self):
+        self.stopped = threading.Event()
+
+    def stream(self, func, **kwargs):
+        FakeWatch.calls.append(kwargs)
+        if FakeWatch.streams:
+            yield from FakeWatch.streams.pop(0)
+        else:
+            self.stopped.wait(timeout=5)
+
+    def stop(self):
+        self.stopped.set()
+
+
+def _pod(phase, resource_version, name='program-1'):
+    return client.V1Pod(
+        metadata=client.V1ObjectMeta(
+            name=f'{name}-pod', labels={'job-name': name}, resource_version=resource_version
+        ),
+        status=client.V1PodStatus(phase=phase),
+    )
+
+
+@pytest.fixture
+def kube_api():
+    kube_api = Mock()
+    kube_api.core_v1.return_value.list_namespaced_pod.return_value = client.V1PodList(
+        items=[_pod('Pending', '1')], metadata=client.V1ListMeta(resource_version='1')
+    )
+    FakeWatch.streams = []
+    FakeWatch.calls = []
+    async_api = kubernetes.AsyncKubeApi(kube_api=kube_api)
+    with (
+        patch.object(runtime.kubernetes, 'async_api', new=Mock(return_value=async_api)),
+        patch.object(kubernetes.watch, 'Watch', new=FakeWatch),
+    ):
+        yield kube_api
+
+
+@pytest.mark.asyncio
+async def test_wait_shares_watch(kube_api):
+    runner = runtime.KubernetesRunner(
+        runtime._get_job('program', 'default'), runtime.RemoteStorage(fs=None, base_path='bucket')
+    )
+    runs = [runtime.KubernetesProgramRun(runner, name=f'program-{index}') for index in (1, 2)]
+    FakeWatch.streams = [
+        [
+            {'type': 'ADDED', 'object': _pod('Running', '2', name='program-2')},
+            {'type': 'MODIFIED', 'object': _pod('Succeeded', '3')},
+            {'type': 'DELETED', 'object': _pod('Running', '4', name='program-2')},
+        ],
+    ]
+    await asyncio.gather(*(run.wait() for run in runs))
+    assert runs[0].is_completed()
+    # deleted while waiting for it
+    assert runs[1].is_failed()
+    # pods of all runs are listed and watched once
+    kube_api.core_v1.return_value.list_namespaced_pod.assert_called_once_with(
+        namespace='default',
+        label_selector=runtime.PROGRAM_LABEL,
+        _request_timeout=kubernetes.REQUEST_TIMEOUT,
+    )
+    assert FakeWatch.calls[0]['resource_version'] == '1'
+    assert await runs[0].pod_name() == 'program-1-pod'
+
+
+@pytest.mark.asyncio
+async def test_wait_timeout(kube_api):
+    runner = runtime.KubernetesRunner(
+        runtime._get_job('program', 'default'), runtime.RemoteStorage(fs=None, base_path='bucket')
+    )
+    run = runtime.KubernetesProgramRun(runner, name='program-1', timeout=0.01)
+    with pytest.raises(asyncio.TimeoutError):
+        await run.wait()
+    kube_api.batch_v1.return_value.delete_namespaced_job.assert_called_once_with(
+        'program-1',
+        'default',
+        propagation_policy='Background',
+        _request_timeout=kubernetes.REQUEST_TIMEOUT,
+    )
+    assert run.is_cancelled() and run.is_final()
+
+    # a cancelled run is not updated from pods
+    run.update_pods([_pod('Succeeded', '2')])
+    assert run.is_cancelled()
+
+
+@pytest.mark.asyncio
+async def test_follow_logs_does_not_cancel(kube_api):
+    runner = runtime.KubernetesRunner(
+        runtime._get_job('program', 'default'), runtime.RemoteStorage(fs=None, base_path='bucket')
+    )
+    kube_api.core_v1.return_value.list_namespaced_pod.return_value = client.V1PodList(
+        items=[_pod('Running', '1')], metadata=client.V1ListMeta(resource_version='1')
+    )
+
+    async def follow_log(namespace, name, **kwargs):
+        # the log outlives the run timeout
+        await asyncio.sleep(0.05)
+        yield name
+
+    runtime.kubernetes.async_api().follow_log = follow_log
+    run = runtime.KubernetesProgramRun(runner, name='program-1', timeout=0.01)
+    assert [line async for line in run.log_lines(follow=True)] == ['program-1-pod']
+    assert run.is_running()
+    kube_api.batch_v1.return_value.delete_namespaced_job.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_run_creates_job(kube_api):
+    storage = runtime.RemoteStorage(
+        fs=fsspec.filesystem('memory'),
+        base_path='/bucket/program',
+        signing_fs=Mock(sign=Mock(return_value='https://s3/signed')),
+    )
+    runner = runtime.KubernetesRunner(runtime._get_job('program', 'default'), storage)
+    create_job = kube_api.batch_v1.return_value.create_namespaced_job
+
+    # runs are not serialized on the deletion of previous Jobs
+    runs = await asyncio.gather(*(runner.run(detach=True) for _ in range(2)))
+    assert runs[0].name != runs[1].name
+    assert create_job.call_count == 2
+    kube_api.batch_v1.return_value.delete_namespaced_job.assert_not_called()
+    job = create_job.call_args.kwargs['body']
+    assert job.metadata.name == runs[1].name
+    assert runs[1].name.endswith('-' + job.metadata.labels[runtime.RUN_ID_LABEL])
+
+
+@pytest.mark.asyncio
+async def test_result():
+    fs = fsspec.filesystem('memory')
+    runner = runtime.KubernetesRunner(
+        runtime._get_job('program', 'default'),
+        runtime.RemoteStorage(fs=fs, base_path='/bucket/program'),
+    )
+    run = runtime.KubernetesProgramRun(runner, name='program-1', completions=2)
+    with fs.open(runner.result_path('program-1', 0), 'wb') as file:
+        runtime.engine.write({'value': b'x' * 1000}, file, compression='zlib')
+    # no result for a failed shard
+    assert await run.result() == [{'value': b'x' * 1000}, None]
+
+
+class FakeResponse:
+    def __init__(self, data: bytes):
+        self.data = data
+
+    def stream(self, amt=None, decode_content=False):
+        yield self.data
+
+    def release_conn(self):
+        pass
+
+    def close(self):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_logs(kube_api):
+    runner = runtime.KubernetesRunner(
+        runtime._get_job('program', 'default'), runtime.RemoteStorage(fs=None, base_path='bucket')
+    )
+
+    def pod(index):
+        return client.V1Pod(
+            metadata=client.V1ObjectMeta(
+                name=f'program-1-{index}',
+                labels={'job-name': 'program-1'},
+                annotations={runtime.COMPLETION_INDEX_ANNOTATION: str(index)},
+                resource_version='1',
+            ),
+            status=client.V1PodStatus(phase='Succeeded'),
+        )
+
+    core_v1 = kube_api.core_v1.return_value
+    core_v1.list_namespaced_pod.return_value = client.V1PodList(
+        items=[pod(0), pod(1)], metadata=client.V1ListMeta(resource_version='1')
+    )
+    core_v1.read_namespaced_pod_log.side_effect = lambda **kwargs: FakeResponse(
+        f'2024-01-02T03:04:05Z {kwargs["name"]}\n2024-01-02T03:04:06Z done\n'.encode()
+    )
+    run = runtime.KubernetesProgramRun(runner, name='program-1', completions=2)
+    logs = await run.logs()
+    # shards are read concurrently
+    assert sorted(logs) == ['[0] done', '[0] program-1-0', '[1] done', '[1] program-1-1']
+    assert logs.index('[0] program-1-0') < logs.index('[0] done')
@@ -0,0 +1,110 @@
+import asyncio
+import uuid
+from unittest.mock import AsyncMock, Mock, patch
+
+import pytest
+from prefect import states
+
+import infractl.base
+from infractl.plugins.prefect_runtime.program import PrefectProgramRun
+
+
+@pytest.mark.parametrize(
+    'state, predicate',
+    [
+        (states.Scheduled(), 'is_scheduled'),
+        (states.Pending(), 'is_pending'),
+        (states.Running(), 'is_running'),
+        (states.Completed(), 'is_completed'),
+        (states.Failed(), 'is_failed'),
+        (states.Crashed(), 'is_crashed'),
+        (states.Cancelled(), 'is_cancelled'),
+        (states.Paused(), 'is_paused'),
+    ],
+)
+def test_program_run_state(state, predicate):
+    program_run = PrefectProgramRun(Mock(state=state), Mock())
+    assert getattr(program_run, predicate)()
+    assert program_run.is_final() == state.is_final()
+    assert repr(program_run).endswith(f'({state.name})')
+
+
+@pytest.mark.asyncio
+async def test_program_run_wait_events():
+    flow_run = Mock()
+    flow_run.state.is_final = Mock(return_value=False)
+    final_flow_run = Mock()
+    final_flow_run.state.is_final = Mock(return_value=True)
+
+    prefect_client = Mock()
+    prefect_client.api_url = 'http://prefect.localtest.me/api'
+    prefect_client.read_flow_run = AsyncMock(side_effect=[flow_run, flow_run, final_flow_run])
+
+    class Subscriber:
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *args):
+            pass
+
+        def __aiter__(self):
+            return self
+
+        async def __anext__(self):
+            await asyncio.sleep(0.01)
+            return Mock(event='prefect.flow-run.Completed')
+
+    program_run = PrefectProgramRun(flow_run, prefect_client)
+    with patch('prefect.events.clients.get_events_subscriber', new=Mock(return_value=Subscriber())):
+        await asyncio.wait_for(program_run.wait(poll_interval=60), timeout=1)
+    assert program_run.is_final()
+
+
+@pytest.mark.asyncio
+async def test_program_run_wait_polling():
+    flow_run = Mock()
+    flow_run.state.is_final = Mock(return_value=False)
+    final_flow_run = Mock()
+    final_flow_run.state.is_final = Mock(return_value=True)
+
+    prefect_client = Mock()
+    prefect_client.read_flow_run = AsyncMock(side_effect=[flow_run, flow_run, final_flow_run])
+
+    program_run = PrefectProgramRun(flow_run, prefect_client)
+    await asyncio.wait_for(program_run.wait(poll_interval=60, events=False), timeout=1)
+    assert program_run.is_final()
+
+
+@pytest.mark.asyncio
+async def test_program_run_group_refresh():
+    flow_runs = [Mock(id=uuid.uuid4()) for _ in range(3)]
+    for flow_run in flow_runs:
+        flow_run.state.is_final = Mock(return_value=False)
+    final_flow_run = Mock(id=flow_runs[1].id)
+    final_flow_run.state.is_final = Mock(return_value=True)
+
+    prefect_client = Mock()
+    prefect_client.read_flow_runs = AsyncMock(return_value=[final_flow_run])
+    group = infractl.base.group([PrefectProgramRun(run, prefect_client) for run in flow_runs])
+
+    await group.refresh()
+    prefect_client.read_flow_runs.assert_awaited_once()
+    flow_run_filter = prefect_client.read_flow_runs.await_args.kwargs['flow_run_filter']
+    assert flow_run_filter.id.any_ == [flow_run.id for flow_run in flow_runs]
+    assert [run.is_final() for run in group] == [False, True, False]
+
+
+@pytest.mark.asyncio
+async def test_program_run_group_refresh_pages():
+    flow_runs = [Mock(id=uuid.uuid4(), state=states.Running()) for _ in range(5)]
+    prefect_client = Mock()
+    prefect_client.read_flow_runs = AsyncMock(return_value=[])
+    group = infractl.base.group([PrefectProgramRun(run, prefect_client) for run in flow_runs])
+    group.page_size = 2
+
+    await group.refresh()
+    pages = [
+        call.kwargs['flow_run_filter'].id.any_
+        for call in prefect_client.read_flow_runs.await_args_list
+    ]
+    assert pages == [[run.id for run in flow_runs[start : start + 2]] for start in (0, 2, 4)]
@@ -1,7 +1,6 @@
 import asyncio
 import pathlib
-import tarfile
-from unittest.mock import AsyncMock, Mock, patch
+from unittest.mock import AsyncMock, Mock, PropertyMock, patch
 
 import dynaconf
 import prefect
@@ -10,7 +9,9 @@ from prefect import filesystems
 
 import infractl
 import infractl.base
+import infractl.bundle
 from infractl.plugins.prefect_runtime import runtime
+from infractl.plugins.prefect_runtime.program import PrefectProgramRun
 
 RuntimeFile = infractl.base.RuntimeFile
 
@@ -41,6 +42,7 @@ async def test_deploy(tmp_path: pathlib.Path):
     storage_path.mkdir(parents=True, exist_ok=True)
     # set basepath using "file" schema to use LocalFileSystem
     infractl.base.SETTINGS['local.prefect_storage_basepath'] = storage_path.as_uri()
+    infractl.base.invalidate_address_settings('local')
 
     infrastructure = infractl.infrastructure(address='local')
     prefect_runtime = infractl.runtime()
@@ -66,6 +68,7 @@ async def test_flow_name_from_decorator(tmp_path: pathlib.Path):
     storage_path.mkdir(parents=True, exist_ok=True)
     # set basepath using "file" schema to use LocalFileSystem
     infractl.base.SETTINGS['local.prefect_storage_basepath'] = storage_path.as_uri()
+    infractl.base.invalidate_address_settings('local')
 
     infrastructure = infractl.infrastructure(address='local')
     prefect_runtime = infractl.runtime()
@@ -90,6 +93,7 @@ async def test_flow_name_from_argument(tmp_path: pathlib.Path):
     storage_path.mkdir(parents=True, exist_ok=True)
     # set basepath using "file" schema to use LocalFileSystem
     infractl.base.SETTINGS['local.prefect_storage_basepath'] = storage_path.as_uri()
+    infractl.base.invalidate_address_settings('local')
 
     infrastructure = infractl.infrastructure(address='local')
     prefect_runtime = infractl.runtime()
@@ -216,15 +220,14 @@ def test_prefect_runtime_implementation_dependencies():
         infractl.runtime(dependencies={'pip': ['boto', 'botocore']}), infrastructure_implementation
     )
 
+    runtime_implementation.define_files_block('foo')
     kubernetes_job_block = runtime_implementation.kubernetes_job()
     kubernetes_job_block.name = 'foo'
     kubernetes_job = kubernetes_job_block.build_job()
-    kubernetes_job_env = kubernetes_job['spec']['template']['spec']['containers'][0]['env']
+    command = kubernetes_job['spec']['template']['spec']['containers'][0]['command']
 
-    assert {
-        'name': 'EXTRA_PIP_PACKAGES',
-        'value': 'boto botocore',
-    } in kubernetes_job_env, 'Kubernetes Job contains environment variable EXTRA_PIP_PACKAGES'
+    assert command[:3] == ['python', '-m', 'infractl.prefect.engine']
+    assert command[-2:] == ['--wheelhouse', runtime_implementation.files_wheelhouse_path]
 
 
 @pytest.mark.asyncio
@@ -252,10 +255,21 @@ async def test_prefect_runtime_upload_files(tmp_path: pathlib.Path, set_cwd):
         infrastructure_implementation,
     )
 
-    with set_cwd(working_path):
+    blobs_path = tmp_path / 'blobs'
+    with (
+        set_cwd(working_path),
+        patch.object(
+            runtime.PrefectRuntimeImplementation,
+            'files_blobs_path',
+            new_callable=PropertyMock,
+            return_value=str(blobs_path),
+        ),
+    ):
         await runtime_implementation.upload_files(block)
 
-    assert tarfile.is_tarfile(storage_path / 'cwd.tar')
+    index = infractl.bundle.Bundle.loads((storage_path / 'bundle.json').read_bytes())
+    assert [file.path for file in index.files] == ['file1']
+    assert (blobs_path / infractl.bundle.blob_path(index.files[0].chunks[0])).exists()
 
     script_path = storage_path / runtime_implementation._script
     script = script_path.read_text().splitlines()
@@ -296,23 +310,71 @@ async def test_infractl_program_run_timeout(tmp_path: pathlib.Path, set_cwd):
             runner=PrefectProgramRunner(Mock(), Mock()),
         )
 
-    timeout = 2.5
+    timeout = 0.5
 
-    # test `prefect.deployments.run_deployment` called with timeout
+    # test `prefect.deployments.run_deployment` creates a flow run without waiting, and the flow
+    # run is awaited with `PrefectProgramRun.wait()`
     run_deployment_mock = AsyncMock(return_value=Mock())
+    wait_mock = AsyncMock()
     with patch.object(prefect.deployments, 'run_deployment', new=run_deployment_mock):
-        await program.run(timeout=timeout)
+        with patch.object(PrefectProgramRun, 'wait', new=wait_mock):
+            await program.run(timeout=timeout)
     run_deployment_mock.assert_awaited_once()
-    run_deployment_mock.await_args.kwargs["timeout"] == timeout
+    assert run_deployment_mock.await_args.kwargs['timeout'] == 0
+    wait_mock.assert_awaited_once()
 
     # test throwing an exception if a flow run does not have time to
     # complete for the specified timeout
-    flow_run = Mock()
-    flow_run.state.is_final = Mock(return_value=False)
+    async def wait_forever(*args, **kwargs):
+        await asyncio.sleep(60)
 
-    run_deployment_mock = AsyncMock(return_value=flow_run)
+    run_deployment_mock = AsyncMock(return_value=Mock())
     cancel_mock = AsyncMock()
     with patch.object(prefect.deployments, 'run_deployment', new=run_deployment_mock):
-        with patch.object(PrefectProgramRunner, 'cancel', new=cancel_mock):
-            with pytest.raises(asyncio.exceptions.TimeoutError):
-                await program.run(timeout=timeout)
+        with patch.object(PrefectProgramRun, 'wait', new=wait_forever):
+            with patch.object(PrefectProgramRunner, 'cancel', new=cancel_mock):
+                with pytest.raises(asyncio.exceptions.TimeoutError):
+                    await program.run(timeout=timeout)
+    cancel_mock.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_deploy_blocks_concurrently(tmp_path: pathlib.Path, set_cwd):
+    flow_path = tmp_path / 'flow.py'
+    flow_path.write_text(FLOW3)
+    (tmp_path / 'data.txt').write_text('data')
+
+    infrastructure_implementation = infractl.base.get_infrastructure_implementation(
+        infractl.infrastructure(address='local')
+    )
+    runtime_implementation = runtime.PrefectRuntimeImplementation(
+        infractl.runtime(files=['data.txt']), infrastructure_implementation
+    )
+
+    async def save(*args, **kwargs):
+        await asyncio.sleep(0.5)
+
+    prefect_deployment = Mock()
+    prefect_deployment.dict = Mock(return_value={})
+    prefect_deployment.apply = AsyncMock()
+    build_from_flow = AsyncMock(return_value=prefect_deployment)
+    block_load = AsyncMock()
+
+    with set_cwd(tmp_path):
+        program = runtime.prefect_runtime.load_program('flow.py')
+        with (
+            patch.object(runtime.PrefectBlock, 'save', new=save),
+            patch.object(runtime.PrefectRuntimeImplementation, 'upload_code', new=AsyncMock()),
+            patch.object(runtime.PrefectRuntimeImplementation, 'upload_files', new=AsyncMock()),
+            patch.object(prefect.infrastructure.KubernetesJob, 'save', new=save),
+            patch.object(runtime.deployments.Deployment, 'build_from_flow', new=build_from_flow),
+            patch.object(runtime.blocks.Block, 'load', new=block_load),
+        ):
+            await runtime_implementation.deploy_prefect_program(program)
+
+    timings = runtime_implementation.timings
+    assert timings['blocks'] < 1, 'blocks are saved concurrently'
+    assert {'code_block', 'files_block', 'infrastructure_block', 'result_block'} <= set(timings)
+    block_load.assert_not_awaited()
+    build_kwargs = build_from_flow.await_args.kwargs
+    assert build_kwargs['infrastructure'].command[-3] == runtime_implementation._files_block
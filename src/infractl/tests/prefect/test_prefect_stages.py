@@ -0,0 +1,56 @@
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+
+from infractl.plugins.prefect_runtime.stages import DeploymentStages
+
+
+def _save(delay=0.0, error=None):
+    """Mock of Block.save, which takes `delay` seconds and raises `error` if set."""
+
+    async def save(*args, **kwargs):
+        await asyncio.sleep(delay)
+        if error:
+            raise error
+
+    return AsyncMock(side_effect=save)
+
+
+async def _save_block(stages: DeploymentStages, name: str, save: AsyncMock) -> str:
+    with stages.stage(f'{name}_block'):
+        await save(overwrite=True)
+    return name
+
+
+@pytest.mark.asyncio
+async def test_gather_concurrently():
+    stages = DeploymentStages()
+    saves = {name: _save(delay=0.2) for name in ('code', 'infrastructure', 'result')}
+    results = await stages.gather(
+        'blocks', *(_save_block(stages, name, save) for name, save in saves.items())
+    )
+    assert results == ['code', 'infrastructure', 'result']
+    for save in saves.values():
+        save.assert_awaited_once_with(overwrite=True)
+    assert stages.timings['blocks'] < 0.4, 'blocks are saved concurrently'
+    for name in saves:
+        assert 0.2 <= stages.timings[f'{name}_block'] <= stages.timings['blocks']
+    assert str(stages).startswith('code_block=')
+
+
+@pytest.mark.asyncio
+async def test_gather_error():
+    stages = DeploymentStages()
+    slow_save = _save(delay=10)
+    with pytest.raises(ValueError, match='invalid block'):
+        await stages.gather(
+            'blocks',
+            _save_block(stages, 'code', slow_save),
+            _save_block(stages, 'result', _save(error=ValueError('invalid block'))),
+        )
+    # the slow save is cancelled, not awaited to the end
+    await asyncio.sleep(0)
+    assert stages.timings['blocks'] < 1
+    assert stages.timings['code_block'] < 1
+    slow_save.assert_awaited_once()
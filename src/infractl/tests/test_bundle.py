@@ -0,0 +1,198 @@
+import hashlib
+import http.server
+import io
+import pathlib
+import sys
+import threading
+
+import pytest
+
+from infractl import bundle
+
+
+def create_bundle(tmp_path: pathlib.Path, files, chunk_size=4):
+    """Creates a bundle with blobs in tmp_path / 'blobs'."""
+    blobs_path = tmp_path / 'blobs'
+    index = bundle.Bundle(chunk_size=chunk_size)
+    for path, content in files.items():
+        chunks = [content[i : i + chunk_size] for i in range(0, len(content), chunk_size)]
+        digests = []
+        for chunk in chunks:
+            digest = hashlib.sha256(chunk).hexdigest()
+            blob = blobs_path / bundle.blob_path(digest)
+            blob.parent.mkdir(parents=True, exist_ok=True)
+            with blob.open('wb') as blob_file:
+                bundle.write_blob(io.BytesIO(chunk), blob_file, len(chunk))
+            digests.append(digest)
+        index.files.append(
+            bundle.BundleFile(path=path, size=len(content), mode=0o644, chunks=digests)
+        )
+    return bundle.Bundle.loads(index.dumps()), blobs_path
+
+
+def test_extract(tmp_path: pathlib.Path):
+    index, blobs_path = create_bundle(
+        tmp_path, {'file1': b'0123456789', 'dir/file2': b'01234567', 'empty': b''}
+    )
+    fetched = []
+
+    def fetch(path):
+        fetched.append(path)
+        return (blobs_path / path).read_bytes()
+
+    target = tmp_path / 'target'
+    stats = bundle.extract(index, target, fetch=fetch)
+    assert (target / 'file1').read_bytes() == b'0123456789'
+    assert (target / 'dir' / 'file2').read_bytes() == b'01234567'
+    assert (target / 'empty').read_bytes() == b''
+    # "0123" and "4567" are shared by both files
+    assert (stats.extracted, stats.fetched) == (3, 3)
+    assert len(fetched) == 3
+
+    # files that are already present are not fetched
+    (target / 'file1').write_bytes(b'changed')
+    fetched.clear()
+    stats = bundle.extract(index, target, fetch=fetch)
+    assert (stats.extracted, stats.unchanged) == (1, 2)
+    assert (target / 'file1').read_bytes() == b'0123456789'
+    assert len(fetched) == 3
+
+
+@pytest.mark.parametrize('compression', ['gzip', ''])
+def test_write_blob(compression):
+    source = io.BytesIO(b'0123456789')
+    source.seek(2)
+    blob = io.BytesIO()
+    bundle.write_blob(source, blob, 4, compression)
+    assert bundle.read_blob(blob.getvalue(), compression) == b'2345'
+    assert bundle.blob_path('abcd', compression) == f'ab/abcd{".gz" if compression else ""}'
+
+
+def test_extract_cache(tmp_path: pathlib.Path):
+    index, blobs_path = create_bundle(tmp_path, {'file1': b'0123456789'})
+    cache_path = tmp_path / 'cache'
+    fetch = lambda path: (blobs_path / path).read_bytes()
+
+    bundle.extract(index, tmp_path / 'target1', fetch=fetch, cache_dir=cache_path)
+    stats = bundle.extract(index, tmp_path / 'target2', fetch=fetch, cache_dir=cache_path)
+    assert (stats.fetched, stats.cached) == (0, 3)
+    assert (tmp_path / 'target2' / 'file1').read_bytes() == b'0123456789'
+
+
+def test_extract_corrupted_blob(tmp_path: pathlib.Path):
+    index, _ = create_bundle(tmp_path, {'file1': b'0123'})
+    with pytest.raises(bundle.BundleError):
+        bundle.extract(index, tmp_path / 'target', fetch=lambda path: b'3210')
+
+
+def test_extract_outside_target(tmp_path: pathlib.Path):
+    index, blobs_path = create_bundle(tmp_path, {'../file1': b'0123'})
+    with pytest.raises(bundle.BundleError):
+        bundle.extract(
+            index, tmp_path / 'target', fetch=lambda path: (blobs_path / path).read_bytes()
+        )
+
+
+def test_main(tmp_path: pathlib.Path):
+    index, blobs_path = create_bundle(tmp_path, {'file1': b'0123456789'})
+    index_path = tmp_path / bundle.INDEX_NAME
+    index_path.write_bytes(index.dumps())
+    target = tmp_path / 'target'
+    bundle.main(
+        [
+            str(index_path),
+            '--blobs',
+            str(blobs_path),
+            '--fetch-command',
+            f'{sys.executable} -c "import shutil, sys; shutil.copy(sys.argv[1], sys.argv[2])"',
+            '--target',
+            str(target),
+        ]
+    )
+    assert (target / 'file1').read_bytes() == b'0123456789'
+
+
+class RangeHandler(http.server.BaseHTTPRequestHandler):
+    """Serves files from `directory` with ranges and ETag, counts requests."""
+
+    directory: pathlib.Path
+    requests: list
+
+    def do_GET(self):
+        data = (self.directory / self.path.lstrip('/')).read_bytes()
+        self.requests.append(self.headers.get('Range'))
+        status = 200
+        headers = {'ETag': f'"{hashlib.md5(data).hexdigest()}"'}
+        if self.headers.get('Range'):
+            start, end = (int(value) for value in self.headers['Range'][6:].split('-'))
+            if start >= len(data):
+                self.send_response(416)
+                self.end_headers()
+                return
+            headers['Content-Range'] = f'bytes {start}-{end}/{len(data)}'
+            data = data[start : end + 1]
+            status = 206
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def http_server(tmp_path: pathlib.Path):
+    directory = tmp_path / 'www'
+    directory.mkdir()
+    handler = type('Handler', (RangeHandler,), {'directory': directory, 'requests': []})
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}', directory, handler.requests
+    server.shutdown()
+
+
+def test_download(tmp_path: pathlib.Path, http_server):
+    url, directory, requests = http_server
+    (directory / 'data').write_bytes(b'0123456789')
+
+    size = bundle.download(f'{url}/data', tmp_path / 'data', part_size=4)
+    assert size == 10
+    assert (tmp_path / 'data').read_bytes() == b'0123456789'
+    # probe and 3 parts
+    assert sorted(requests) == ['bytes=0-0', 'bytes=0-3', 'bytes=4-7', 'bytes=8-9']
+
+    # cached by ETag
+    cache_dir = tmp_path / 'cache'
+    bundle.download(f'{url}/data', tmp_path / 'data1', cache_dir=cache_dir)
+    requests.clear()
+    assert bundle.download(f'{url}/data', tmp_path / 'data2', cache_dir=cache_dir) == 0
+    assert (tmp_path / 'data2').read_bytes() == b'0123456789'
+    assert requests == ['bytes=0-0']
+
+    # empty file
+    (directory / 'empty').write_bytes(b'')
+    assert bundle.download(f'{url}/empty', tmp_path / 'empty') == 0
+    assert (tmp_path / 'empty').read_bytes() == b''
+
+
+def test_extract_remote(tmp_path: pathlib.Path, http_server):
+    url, directory, _ = http_server
+    (directory / 'data').write_bytes(b'0123456789')
+    (tmp_path / 'volume').mkdir()
+    index = bundle.Bundle(
+        remote=[
+            bundle.RemoteFile(path='dir/data', url=f'{url}/data', key='s3://bucket/data'),
+            bundle.RemoteFile(
+                path='volume', url=f'file://{tmp_path / "volume"}', key='pvc://claim/'
+            ),
+        ]
+    )
+    target = tmp_path / 'target'
+    stats = bundle.extract(bundle.Bundle.loads(index.dumps()), target, fetch=lambda path: b'')
+    assert (stats.downloaded, stats.linked) == (1, 1)
+    assert (target / 'dir' / 'data').read_bytes() == b'0123456789'
+    assert (target / 'volume').resolve() == (tmp_path / 'volume').resolve()
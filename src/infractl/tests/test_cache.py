@@ -0,0 +1,127 @@
+import pathlib
+import time
+
+import pytest
+
+import infractl
+import infractl.base
+import infractl.cache
+
+
+class CountingRuntimeImplementation(
+    infractl.base.RuntimeImplementation, registration_name='test-cache'
+):
+    deployments = 0
+
+    async def deploy(self, program, **kwargs):
+        CountingRuntimeImplementation.deployments += 1
+        return infractl.base.DeployedProgram(program=program, runner=Runner())
+
+
+class Runner(infractl.base.Runnable):
+    pass
+
+
+def runtime_implementation(**kwargs):
+    infrastructure = infractl.base.get_infrastructure_implementation(
+        infractl.infrastructure(address='local')
+    )
+    runtime = infractl.base.Runtime(kind='test-cache', **kwargs)
+    return infractl.base.get_runtime_implementation(runtime, infrastructure)
+
+
+def test_fingerprint(tmp_path: pathlib.Path, set_cwd):
+    program_path = tmp_path / 'program.py'
+    program_path.write_text('print(1)')
+    data_path = tmp_path / 'data.txt'
+    data_path.write_text('data')
+    program = infractl.program(program_path)
+
+    with set_cwd(tmp_path):
+        key, slot = infractl.cache.fingerprint(program, runtime_implementation(files=['data.txt']))
+        assert infractl.cache.fingerprint(program, runtime_implementation(files=['data.txt'])) == (
+            key,
+            slot,
+        ), 'fingerprint is stable'
+
+        other_key, other_slot = infractl.cache.fingerprint(
+            program, runtime_implementation(files=['data.txt'], environment={'foo': 'bar'})
+        )
+        assert other_key != key, 'runtime environment changes fingerprint'
+        assert other_slot == slot, 'runtime environment does not change deployment target'
+
+        program_path.write_text('print(2)')
+        assert infractl.cache.fingerprint(program, runtime_implementation(files=['data.txt']))[
+            0
+        ] not in (key, other_key), 'program source changes fingerprint'
+
+        assert (
+            infractl.cache.fingerprint(program, runtime_implementation(), manifest_filter=print)
+            is None
+        ), 'deployment with a callable argument is not cached'
+
+
+def test_cache_disk(tmp_path: pathlib.Path):
+    program = infractl.base.DeployedProgram(program=infractl.program('program.py'), runner=Runner())
+
+    cache = infractl.cache.DeploymentCache(path=tmp_path)
+    assert cache.get('key1') is None
+    cache.put('key1', 'slot1', program)
+    assert cache.get('key1') is program
+    assert cache.stats == infractl.cache.CacheStats(hits=1, misses=1)
+
+    cache = infractl.cache.DeploymentCache(path=tmp_path)
+    assert cache.get('key1').program.path == 'program.py', 'cache is loaded from disk'
+    assert cache.stats.hits == 1
+
+    cache.put('key2', 'slot1', program)
+    assert cache.get('key1') is None, 'deployment to the same slot evicts the previous one'
+    assert list(tmp_path.glob('*.pickle')) == [tmp_path / 'slot1-key2.pickle']
+
+
+def test_default_cache_in_memory(monkeypatch):
+    monkeypatch.setattr(infractl.cache, 'DEFAULT_CACHE', None)
+    assert infractl.cache.default_cache().path is None, 'on-disk cache is off by default'
+
+
+def test_cache_eviction(tmp_path: pathlib.Path):
+    program = infractl.base.DeployedProgram(program=infractl.program('program.py'), runner=Runner())
+
+    cache = infractl.cache.DeploymentCache(path=tmp_path, max_entries=2)
+    for index in range(3):
+        cache.put(f'key{index}', f'slot{index}', program)
+        time.sleep(0.01)
+    assert cache.get('key0') is None, 'the least recently used entry is evicted'
+    assert cache.get('key2') is program
+    assert len(list(tmp_path.glob('*.pickle'))) == 2
+
+    cache = infractl.cache.DeploymentCache(path=tmp_path, ttl=0)
+    assert cache.get('key2') is None, 'expired entry is evicted'
+
+
+@pytest.mark.asyncio
+async def test_deploy_cache(tmp_path: pathlib.Path, deployment_cache):
+    program_path = tmp_path / 'program.py'
+    program_path.write_text('print(1)')
+    program = infractl.program(program_path)
+    runtime = infractl.base.Runtime(kind='test-cache')
+    infrastructure = infractl.infrastructure(address='local')
+
+    CountingRuntimeImplementation.deployments = 0
+    deployed1 = await infractl.deploy(
+        program, runtime=runtime, infrastructure=infrastructure, cache=True
+    )
+    deployed2 = await infractl.deploy(
+        program, runtime=runtime, infrastructure=infrastructure, cache=True
+    )
+    assert deployed1 is deployed2
+    assert CountingRuntimeImplementation.deployments == 1
+    assert deployment_cache.stats.hits == 1
+
+    # the cache is opt-in
+    await infractl.deploy(program, runtime=runtime, infrastructure=infrastructure)
+    assert CountingRuntimeImplementation.deployments == 2
+    assert deployment_cache.stats.hits == 1
+
+    await infractl.deploy(program, runtime=runtime, infrastructure=infrastructure, cache=False)
+    assert CountingRuntimeImplementation.deployments == 3
@@ -1,9 +1,28 @@
+import os
 import pathlib
 import sys
-import tarfile
+from unittest.mock import patch
 
+import fsspec
+import pytest
+from fsspec.implementations.asyn_wrapper import AsyncFileSystemWrapper
+
+from infractl import bundle
 from infractl.base import RuntimeFile
-from infractl.fs import prepare_to_upload, strip_file_scheme
+from infractl.fs import (
+    IgnoreRules,
+    Manifest,
+    bundle_uploads,
+    create_bundle,
+    put_all,
+    pvc_claims,
+    remote_file,
+    runtime_file_paths,
+    strip_file_scheme,
+    sync_files,
+    upload_bundle,
+    walk_files,
+)
 
 
 def test_strip_file_scheme():
@@ -15,10 +34,11 @@ def test_strip_file_scheme():
     assert strip_file_scheme('file:.local') == '.local'
 
 
-def test_prepare_to_upload(tmp_path: pathlib.Path, set_cwd):
+def test_upload_bundle(tmp_path: pathlib.Path, set_cwd):
     current_path = tmp_path / 'current'
     working_path = tmp_path / 'working'
     runtime_path = tmp_path / 'runtime'
+    blobs_path = tmp_path / 'blobs'
 
     current_path.mkdir()
     working_path.mkdir()
@@ -47,14 +67,14 @@ def test_prepare_to_upload(tmp_path: pathlib.Path, set_cwd):
         RuntimeFile(src='dir2/', dst='dir2.renamed'),  # note the missing / in dst
     ]
 
+    fs = fsspec.filesystem('file')
     with set_cwd(current_path):
-        prepare_to_upload(files, working_path)
-
-    cwd_path = working_path / 'cwd.tar'
-    assert tarfile.is_tarfile(cwd_path)
+        stats = upload_bundle(files, fs, str(working_path / 'bundle.json'), str(blobs_path))
+    # duplicate content is uploaded once
+    assert stats.uploaded == stats.blobs == 6
 
-    with tarfile.open(cwd_path) as cwd:
-        cwd.extractall(path=runtime_path, filter='data')
+    index = bundle.Bundle.loads((working_path / 'bundle.json').read_bytes())
+    bundle.extract(index, runtime_path, fetch=lambda path: (blobs_path / path).read_bytes())
 
     # RuntimeFile(src='file1')
     assert (runtime_path / 'file1').read_text() == 'file1'
@@ -72,19 +92,243 @@ def test_prepare_to_upload(tmp_path: pathlib.Path, set_cwd):
     assert (runtime_path / '.hidden').read_text() == 'hidden'
     assert (runtime_path / 'dir2_file1').read_text() == 'dir2_file1'
     assert (runtime_path / 'subdir1').is_dir()
-    assert (runtime_path / 'subdir2').is_dir()
     assert (runtime_path / 'subdir1' / 'subdir1_file1').read_text() == 'subdir1_file1'
     # RuntimeFile(src='dir2/', dst='dir2/')
     assert (runtime_path / 'dir2' / '.hidden').read_text() == 'hidden'
     assert (runtime_path / 'dir2' / 'dir2_file1').read_text() == 'dir2_file1'
     assert (runtime_path / 'dir2' / 'subdir1').is_dir()
-    assert (runtime_path / 'dir2' / 'subdir2').is_dir()
     assert (runtime_path / 'dir2' / 'subdir1' / 'subdir1_file1').read_text() == 'subdir1_file1'
     # RuntimeFile(src='dir2/', dst='dir2.renamed')
     assert (runtime_path / 'dir2.renamed' / '.hidden').read_text() == 'hidden'
     assert (runtime_path / 'dir2.renamed' / 'dir2_file1').read_text() == 'dir2_file1'
     assert (runtime_path / 'dir2.renamed' / 'subdir1').is_dir()
-    assert (runtime_path / 'dir2.renamed' / 'subdir2').is_dir()
     assert (
         runtime_path / 'dir2.renamed' / 'subdir1' / 'subdir1_file1'
     ).read_text() == 'subdir1_file1'
+
+    # blobs that already exist are not uploaded again, without listing all blobs
+    with set_cwd(current_path), patch.object(fs, 'find', side_effect=AssertionError):
+        stats = upload_bundle(files, fs, str(working_path / 'bundle.json'), str(blobs_path))
+    assert stats.uploaded == 0
+
+
+def test_sync_files(tmp_path: pathlib.Path):
+    local_path = tmp_path / 'local'
+    remote_path = tmp_path / 'remote'
+    (local_path / 'dir').mkdir(parents=True)
+    (local_path / 'file1').write_text('file1')
+    (local_path / 'dir' / 'file2').write_text('file2')
+    fs = fsspec.filesystem('file')
+
+    stats = sync_files(local_path, ['file1', 'dir/file2'], fs, str(remote_path))
+    assert (stats.uploaded, stats.deleted, stats.unchanged) == (2, 0, 0)
+    assert (remote_path / 'dir' / 'file2').read_text() == 'file2'
+    manifest = Manifest.model_validate_json((tmp_path / 'remote.manifest.json').read_text())
+    assert sorted(manifest.files) == ['dir/file2', 'file1']
+
+    # unchanged tree does not upload or hash anything
+    with patch('infractl.fs.hash_file') as hash_file, patch.object(fs, 'put_file') as put_file:
+        stats = sync_files(local_path, ['file1', 'dir/file2'], fs, str(remote_path))
+    hash_file.assert_not_called()
+    put_file.assert_not_called()
+    assert (stats.uploaded, stats.deleted, stats.unchanged) == (0, 0, 2)
+
+    # changed and deleted files
+    (local_path / 'file1').write_text('changed')
+    stats = sync_files(local_path, ['file1'], fs, str(remote_path))
+    assert (stats.uploaded, stats.deleted, stats.unchanged) == (1, 1, 0)
+    assert (remote_path / 'file1').read_text() == 'changed'
+    assert not (remote_path / 'dir' / 'file2').exists()
+
+
+def test_sync_files_without_manifest(tmp_path: pathlib.Path):
+    local_path = tmp_path / 'local'
+    remote_path = tmp_path / 'remote'
+    local_path.mkdir()
+    remote_path.mkdir()
+    (local_path / 'file1').write_text('file1')
+    (remote_path / 'stale').write_text('stale')
+
+    stats = sync_files(local_path, ['file1'], fsspec.filesystem('file'), str(remote_path))
+    assert (stats.uploaded, stats.deleted) == (1, 1)
+    assert not (remote_path / 'stale').exists()
+
+
+def test_sync_files_with_protocol(tmp_path: pathlib.Path):
+    local_path = tmp_path / 'local'
+    (local_path / 'dir').mkdir(parents=True)
+    (local_path / 'file1').write_text('file1')
+    (local_path / 'dir' / 'file2').write_text('file2')
+    fs = fsspec.filesystem('memory')
+    remote_path = f'memory://{tmp_path.name}'
+    fs.pipe_file(f'{remote_path}/dir/stale', b'stale')
+
+    stats = sync_files(local_path, ['file1', 'dir/file2'], fs, remote_path)
+    assert (stats.uploaded, stats.deleted) == (2, 1)
+    assert sorted(fs.find(remote_path)) == [
+        f'/{tmp_path.name}/dir/file2',
+        f'/{tmp_path.name}/file1',
+    ]
+
+
+@pytest.mark.asyncio
+async def test_put_all(tmp_path: pathlib.Path, set_cwd):
+    fs = AsyncFileSystemWrapper(fsspec.filesystem('file', auto_mkdir=True))
+    remote_path = tmp_path / 'remote'
+    (tmp_path / 'file1').write_text('file1')
+
+    with set_cwd(tmp_path):
+        uploads = await bundle_uploads(
+            [RuntimeFile(src='file1')],
+            fs,
+            str(remote_path / 'bundle.json'),
+            str(remote_path / 'blobs'),
+        )
+    uploads[str(remote_path / 'file1')] = tmp_path / 'file1'
+    uploads[str(remote_path / 'file2')] = b'file2'
+    assert await put_all(fs, uploads, max_concurrency=2) > 0
+
+    assert (remote_path / 'file1').read_text() == 'file1'
+    assert (remote_path / 'file2').read_text() == 'file2'
+    index = bundle.Bundle.loads((remote_path / 'bundle.json').read_bytes())
+    target_path = tmp_path / 'target'
+    bundle.extract(
+        index, target_path, fetch=lambda path: (remote_path / 'blobs' / path).read_bytes()
+    )
+    assert (target_path / 'file1').read_text() == 'file1'
+
+    # existing blobs are not uploaded again, without listing all blobs
+    with set_cwd(tmp_path), patch.object(fs, '_find', side_effect=AssertionError):
+        uploads = await bundle_uploads(
+            [RuntimeFile(src='file1')],
+            fs,
+            str(remote_path / 'bundle.json'),
+            str(remote_path / 'blobs'),
+        )
+    assert list(uploads) == [str(remote_path / 'bundle.json')]
+
+
+@pytest.mark.parametrize(
+    'pattern, path, is_dir, expected',
+    [
+        ('*.pyc', 'a.pyc', False, True),
+        ('*.pyc', 'dir/a.pyc', False, True),
+        ('*.pyc', 'a.py', False, None),
+        ('/build', 'build', True, True),
+        ('/build', 'dir/build', True, None),
+        ('docs/*.md', 'docs/index.md', False, True),
+        ('docs/*.md', 'docs/api/index.md', False, None),
+        ('docs/**/*.md', 'docs/api/index.md', False, True),
+        ('**/cache', 'a/b/cache', True, True),
+        ('logs/**', 'logs/a/b.log', False, True),
+        ('venv/', 'venv', True, True),
+        ('venv/', 'venv', False, None),
+        ('file[0-9]', 'file1', False, True),
+        ('file[!0-9]', 'file1', False, None),
+        ('\\#file', '#file', False, True),
+        ('# comment', '# comment', False, None),
+    ],
+)
+def test_ignore_rules(pattern, path, is_dir, expected):
+    assert IgnoreRules([pattern]).match(path, is_dir) is expected
+
+
+def test_ignore_rules_negation():
+    rules = IgnoreRules(['*.log', '!keep.log', 'data/'])
+    assert rules.match('a.log', False) is True
+    assert rules.match('keep.log', False) is False
+    assert rules.match('data', True) is True
+    assert IgnoreRules(['data/*'], anchored=True).match('data/a', False) is True
+    assert IgnoreRules(['a'], anchored=True).match('dir/a', False) is None
+    assert IgnoreRules(['a'], base='dir/').match('dir/a', False) is True
+    assert IgnoreRules(['a'], base='dir/').match('a', False) is None
+
+
+def test_walk_files(tmp_path: pathlib.Path):
+    for path in [
+        'file1',
+        'file1.pyc',
+        'data/file2',
+        'data/skip.tmp',
+        'data/keep.tmp',
+        'data/.gitignore',
+        'venv/lib/module.py',
+        'sub/venv/file3',
+        '.git/HEAD',
+        'build/file4',
+        'sub/build/file5',
+    ]:
+        (tmp_path / path).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / path).write_text(path)
+    (tmp_path / 'data' / '.gitignore').write_text('*.tmp\n!keep.tmp\n')
+    (tmp_path / '.dockerignore').write_text('build\n')
+
+    with patch('os.scandir', wraps=os.scandir) as scandir:
+        files = walk_files(tmp_path)
+    assert files == [
+        'data/file2',
+        'data/keep.tmp',
+        'file1',
+        'sub/build/file5',
+    ]
+    # ignored directories are not listed
+    scanned = {
+        pathlib.Path(call.args[0]).relative_to(tmp_path).as_posix()
+        for call in scandir.mock_calls
+        if call.args
+    }
+    assert scanned == {'.', 'data', 'sub', 'sub/build'}
+
+    assert walk_files(tmp_path / 'data', patterns=[], ignore_files=[]) == [
+        '.gitignore',
+        'file2',
+        'keep.tmp',
+        'skip.tmp',
+    ]
+
+
+def test_runtime_file_paths(tmp_path: pathlib.Path):
+    for path in ['.env', 'env/file1', 'model.egg', '.gitignore', '.git/HEAD', '.venv/file2']:
+        (tmp_path / 'data' / path).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / 'data' / path).write_text('data')
+
+    paths = runtime_file_paths([RuntimeFile(src=f'{tmp_path / "data"}/', dst='data/')])
+    # data files are not skipped with the patterns for program code
+    assert sorted(paths) == ['data/.env', 'data/.gitignore', 'data/env/file1', 'data/model.egg']
+
+    # ignore files are not read by default
+    (tmp_path / 'data' / '.gitignore').write_text('*')
+    paths = runtime_file_paths([RuntimeFile(src=f'{tmp_path / "data"}/', dst='data/')])
+    assert len(paths) == 4
+    paths = runtime_file_paths(
+        [RuntimeFile(src=f'{tmp_path / "data"}/', dst='data/', ignore_files=['.gitignore'])]
+    )
+    assert not paths
+
+
+def test_remote_file():
+    sign = lambda url: f'https://signed/{url[5:]}?signature'
+    assert remote_file(RuntimeFile(src='s3://bucket/data.csv'), sign) == bundle.RemoteFile(
+        path='data.csv', url='https://signed/bucket/data.csv?signature', key='s3://bucket/data.csv'
+    )
+    assert remote_file(RuntimeFile(src='https://host/a/data.csv', dst='data/'), sign).path == (
+        'data/data.csv'
+    )
+    assert remote_file(RuntimeFile(src='pvc://claim/dataset/', dst='data')) == bundle.RemoteFile(
+        path='data', url='file:///mnt/infractl/pvc/claim/dataset/', key='pvc://claim/dataset/'
+    )
+    with pytest.raises(ValueError):
+        remote_file(RuntimeFile(src='s3://bucket/data.csv'))
+    with pytest.raises(ValueError):
+        remote_file(RuntimeFile(src='s3://bucket/data/'), sign)
+
+    files = [
+        RuntimeFile(src='pvc://claim2/a'),
+        RuntimeFile(src='pvc://claim1/b'),
+        RuntimeFile(src='pvc://claim1/c'),
+        RuntimeFile(src='file1'),
+    ]
+    assert pvc_claims(files) == ['claim1', 'claim2']
+    index, sources = create_bundle([RuntimeFile(src='http://host/file')])
+    assert [file.path for file in index.remote] == ['file']
+    assert not index.files and not sources
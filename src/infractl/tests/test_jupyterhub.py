@@ -0,0 +1,114 @@
+import asyncio
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+from kubernetes import client
+
+from infractl import kubernetes
+from infractl.hub import jupyterhub
+from infractl.tests.test_kubernetes import FakeKubeApi
+
+
+class IdleWatch:
+    """Watch without events."""
+
+    def stream(self, func, **kwargs):
+        time.sleep(0.01)
+        yield from []
+
+    def stop(self):
+        pass
+
+
+def _pod(name, component):
+    return client.V1Pod(
+        metadata=client.V1ObjectMeta(
+            name=name,
+            resource_version='1',
+            labels={'component': component},
+            annotations={'hub.jupyter.org/username': name},
+        )
+    )
+
+
+async def _stop_informers(async_api):
+    for informer in async_api._informers.values():
+        informer.stop()
+    tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def test_pods_from_informers(monkeypatch):
+    pods = {
+        'component=singleuser-server': [_pod('user-1', 'singleuser-server')],
+        'component=hub': [_pod('hub', 'hub')],
+    }
+    kube_api = FakeKubeApi()
+    list_pods = kube_api.core.list_namespaced_pod
+    list_pods.side_effect = lambda namespace, label_selector, **kwargs: client.V1PodList(
+        items=pods[label_selector], metadata=client.V1ListMeta(resource_version='1')
+    )
+    async_api = kubernetes.AsyncKubeApi(kube_api=kube_api)
+    monkeypatch.setattr(kubernetes, 'async_api', lambda: async_api)
+    monkeypatch.setattr(jupyterhub, '_informer_loop', None)
+
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    with patch.object(kubernetes.watch, 'Watch', new=IdleWatch):
+        thread.start()
+        try:
+            asyncio.run_coroutine_threadsafe(jupyterhub.start_informers(), loop).result(timeout=5)
+            list_pods.reset_mock()
+
+            for _ in range(3):
+                assert jupyterhub.get_user_pod('user-1').metadata.name == 'user-1'
+                assert jupyterhub.get_user_pod('user-2') is None
+                assert (
+                    jupyterhub.get_hub_pod(jupyterhub.JUPYTERHUB_NAMESPACE).metadata.name == 'hub'
+                )
+
+            async def in_loop():
+                # calls in the informer loop do not wait for the loop itself
+                pods = await jupyterhub.async_list_pods('jupyterhub', 'component=hub')
+                return pods + jupyterhub.list_pods('jupyterhub', 'component=hub')
+
+            pods_in_loop = asyncio.run_coroutine_threadsafe(in_loop(), loop).result(timeout=5)
+            assert [pod.metadata.name for pod in pods_in_loop] == ['hub', 'hub']
+            # pods are served from the informer caches
+            list_pods.assert_not_called()
+        finally:
+            asyncio.run_coroutine_threadsafe(_stop_informers(async_api), loop).result(timeout=5)
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join(timeout=5)
+
+
+def test_pods_listed_without_informers(monkeypatch):
+    kube_api = FakeKubeApi()
+    kube_api.core.list_namespaced_pod.return_value = client.V1PodList(items=[_pod('hub', 'hub')])
+    monkeypatch.setattr(kubernetes, 'api', lambda: kube_api)
+    monkeypatch.setattr(jupyterhub, '_informer_loop', None)
+
+    assert jupyterhub.get_hub_pod('jupyterhub').metadata.name == 'hub'
+    kube_api.core.list_namespaced_pod.assert_called_once_with(
+        namespace='jupyterhub', label_selector='component=hub'
+    )
+
+
+@pytest.mark.asyncio
+async def test_informers_start_error(monkeypatch):
+    kube_api = FakeKubeApi()
+    kube_api.core.list_namespaced_pod.side_effect = [
+        client.exceptions.ApiException(status=503),
+        client.V1PodList(items=[_pod('hub', 'hub')]),
+    ]
+    async_api = kubernetes.AsyncKubeApi(kube_api=kube_api)
+    monkeypatch.setattr(kubernetes, 'async_api', lambda: async_api)
+    monkeypatch.setattr(kubernetes, 'api', lambda: kube_api)
+    monkeypatch.setattr(jupyterhub, '_informer_loop', None)
+
+    assert not await jupyterhub.start_informers()
+    # pods are listed
+    pods = await jupyterhub.async_list_pods('jupyterhub', 'component=hub')
+    assert [pod.metadata.name for pod in pods] == ['hub']
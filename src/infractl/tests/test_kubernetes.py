@@ -0,0 +1,306 @@
+import asyncio
+from unittest.mock import Mock, patch
+
+import pytest
+import urllib3
+from kubernetes import client
+
+from infractl import kubernetes
+
+
+class FakeKubeApi:
+    """KubeApi with a mock CoreV1Api, which is replaced on reload."""
+
+    def __init__(self):
+        self.api_client = object()
+        self.core = Mock()
+        self.reloads = 0
+
+    def reload(self):
+        self.reloads += 1
+        self.api_client = object()
+
+    def core_v1(self):
+        return self.core
+
+
+@pytest.mark.asyncio
+async def test_call_reloads_credentials():
+    kube_api = FakeKubeApi()
+    list_pods = kube_api.core.list_namespaced_pod
+    list_pods.side_effect = [client.exceptions.ApiException(status=401), 'pods']
+    async_api = kubernetes.AsyncKubeApi(kube_api=kube_api)
+
+    assert await async_api.core_v1.list_namespaced_pod(namespace='default', timeout=5) == 'pods'
+    assert kube_api.reloads == 1
+    list_pods.assert_called_with(namespace='default', _request_timeout=5)
+
+    # other errors are not retried
+    list_pods.side_effect = client.exceptions.ApiException(status=403)
+    with pytest.raises(client.exceptions.ApiException):
+        await async_api.core_v1.list_namespaced_pod(namespace='default')
+    assert kube_api.reloads == 1
+
+
+@pytest.mark.asyncio
+async def test_iterate_buffer(monkeypatch):
+    monkeypatch.setattr(kubernetes, 'STREAM_BUFFER_SIZE', 3)
+    produced = []
+    stop = Mock()
+
+    def iterate():
+        for item in range(100):
+            produced.append(item)
+            yield item
+
+    async_api = kubernetes.AsyncKubeApi(kube_api=FakeKubeApi())
+    items = async_api._iterate(iterate, stop)
+    assert await anext(items) == 0
+    await asyncio.sleep(0.1)
+    # the thread waits until buffered items are consumed
+    assert len(produced) <= 5
+    assert [await anext(items) for _ in range(10)] == list(range(1, 11))
+    await items.aclose()
+    stop.assert_called_once()
+
+
+class FakeWatch:
+    """Watch that yields events and then fails with `error`, if set."""
+
+    error = None
+
+    def stream(self, func, **kwargs):
+        yield from func(**kwargs)
+        if self.error:
+            raise self.error
+
+    def stop(self):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_watch():
+    kube_api = FakeKubeApi()
+    kube_api.core.list_namespaced_pod.return_value = [{'type': 'ADDED'}, {'type': 'DELETED'}]
+    async_api = kubernetes.AsyncKubeApi(kube_api=kube_api)
+
+    with patch.object(kubernetes.watch, 'Watch', new=FakeWatch):
+        events = [
+            event
+            async for event in async_api.watch(
+                'core_v1', 'list_namespaced_pod', namespace='default', timeout_seconds=10
+            )
+        ]
+        assert events == [{'type': 'ADDED'}, {'type': 'DELETED'}]
+        kube_api.core.list_namespaced_pod.assert_called_once_with(
+            namespace='default',
+            timeout_seconds=10,
+            _request_timeout=10 + kubernetes.WATCH_TIMEOUT_MARGIN,
+        )
+
+        FakeWatch.error = client.exceptions.ApiException(status=401)
+        try:
+            with pytest.raises(client.exceptions.ApiException):
+                async for _ in async_api.watch('core_v1', 'list_namespaced_pod'):
+                    pass
+        finally:
+            FakeWatch.error = None
+    assert kube_api.reloads == 1
+
+
+def _pod(name, resource_version):
+    return client.V1Pod(metadata=client.V1ObjectMeta(name=name, resource_version=resource_version))
+
+
+class StreamsWatch:
+    """Watch that yields prepared events or raises prepared errors, one item per stream."""
+
+    streams: list = []
+
+    def stream(self, func, **kwargs):
+        stream = StreamsWatch.streams.pop(0) if StreamsWatch.streams else []
+        if isinstance(stream, Exception):
+            raise stream
+        yield from stream
+
+    def stop(self):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_informer():
+    kube_api = FakeKubeApi()
+    list_pods = kube_api.core.list_namespaced_pod
+    list_pods.side_effect = [
+        client.V1PodList(
+            items=[_pod('pod-1', '1'), _pod('pod-2', '1')],
+            metadata=client.V1ListMeta(resource_version='1'),
+        ),
+        client.V1PodList(
+            items=[_pod('pod-1', '3')], metadata=client.V1ListMeta(resource_version='3')
+        ),
+    ]
+    async_api = kubernetes.AsyncKubeApi(kube_api=kube_api)
+    events = []
+
+    with patch.object(kubernetes.watch, 'Watch', new=StreamsWatch):
+        # the watch expires, pods are listed again
+        StreamsWatch.streams = [
+            [{'type': 'ADDED', 'object': _pod('pod-3', '2')}],
+            client.exceptions.ApiException(status=410),
+        ]
+        informer = async_api.informer('pod', 'default')
+        assert async_api.informer('pod', 'default') is informer
+        informer.add_handler(lambda event_type, pod: events.append((event_type, pod.metadata.name)))
+        await informer.wait_for(lambda: list(informer.objects) == ['pod-1'], timeout=5)
+        informer.stop()
+
+    assert events == [
+        ('ADDED', 'pod-1'),
+        ('ADDED', 'pod-2'),
+        ('ADDED', 'pod-3'),
+        ('MODIFIED', 'pod-1'),
+        ('DELETED', 'pod-2'),
+        ('DELETED', 'pod-3'),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_informer_list_error():
+    kube_api = FakeKubeApi()
+    kube_api.core.list_namespaced_pod.side_effect = client.exceptions.ApiException(status=403)
+    async_api = kubernetes.AsyncKubeApi(kube_api=kube_api)
+
+    informer = async_api.informer('pod', 'default')
+    with pytest.raises(client.exceptions.ApiException):
+        await informer.sync(timeout=5)
+    # a failed informer is replaced
+    assert async_api.informer('pod', 'default') is not informer
+    with pytest.raises(ValueError):
+        async_api.informer('secret', 'default')
+
+
+class LogWatch:
+    """Watch that streams prepared log lines, a stream fails if it ends with an exception."""
+
+    streams: list = []
+    calls: list = []
+
+    def stream(self, func, **kwargs):
+        LogWatch.calls.append(kwargs)
+        for line in LogWatch.streams.pop(0):
+            if isinstance(line, Exception):
+                raise line
+            yield line
+
+    def stop(self):
+        pass
+
+
+def _running_pod(phase='Running'):
+    return client.V1Pod(status=client.V1PodStatus(phase=phase))
+
+
+@pytest.mark.asyncio
+async def test_follow_log(monkeypatch):
+    monkeypatch.setattr(kubernetes, 'LOG_MAX_RETRY_DELAY', 0)
+    kube_api = FakeKubeApi()
+    kube_api.core.read_namespaced_pod.side_effect = [_running_pod(), _running_pod('Succeeded')]
+    async_api = kubernetes.AsyncKubeApi(kube_api=kube_api)
+    LogWatch.calls = []
+    LogWatch.streams = [
+        [
+            '2024-01-02T03:04:05.1Z line1',
+            '2024-01-02T03:04:06Z line2',
+            ConnectionResetError(),
+        ],
+        # resumed with lines before the last one
+        [
+            '2024-01-02T03:04:05.1Z line1',
+            '2024-01-02T03:04:06.000000000Z line2',
+            '2024-01-02T03:04:06Z line3',
+            '2024-01-02T03:04:07.5Z line4',
+        ],
+    ]
+    with patch.object(kubernetes.watch, 'Watch', new=LogWatch):
+        lines = [
+            line
+            async for line in async_api.follow_log('default', 'pod-1', 'program', tail_lines=10)
+        ]
+    assert lines == ['line1', 'line2', 'line3', 'line4']
+    assert LogWatch.calls[0]['tail_lines'] == 10
+    assert 'tail_lines' not in LogWatch.calls[1]
+    assert LogWatch.calls[1]['since_seconds'] > kubernetes.LOG_RESUME_MARGIN
+    assert kube_api.core.read_namespaced_pod.call_count == 2
+    assert LogWatch.calls[0]['_request_timeout'] == (
+        async_api.request_timeout,
+        kubernetes.LOG_READ_TIMEOUT,
+    )
+
+
+@pytest.mark.asyncio
+async def test_follow_log_read_timeout(monkeypatch):
+    monkeypatch.setattr(kubernetes, 'LOG_MAX_RETRY_DELAY', 0)
+    # a quiet container is not a failure
+    monkeypatch.setattr(kubernetes, 'LOG_MAX_RETRIES', 0)
+    kube_api = FakeKubeApi()
+    kube_api.core.read_namespaced_pod.side_effect = [_running_pod(), _running_pod('Succeeded')]
+    async_api = kubernetes.AsyncKubeApi(kube_api=kube_api)
+    LogWatch.calls = []
+    LogWatch.streams = [
+        [
+            '2024-01-02T03:04:05Z line1',
+            urllib3.exceptions.ReadTimeoutError(None, None, 'Read timed out.'),
+        ],
+        ['2024-01-02T03:04:05Z line1', '2024-01-02T03:04:06Z line2'],
+    ]
+    with patch.object(kubernetes.watch, 'Watch', new=LogWatch):
+        lines = [line async for line in async_api.follow_log('default', 'pod-1')]
+    assert lines == ['line1', 'line2']
+    assert 'since_seconds' in LogWatch.calls[1]
+
+
+class FakeResponse:
+    def __init__(self, data: bytes):
+        self.data = data
+
+    def stream(self, amt=None, decode_content=False):
+        yield from (self.data[index : index + 7] for index in range(0, len(self.data), 7))
+
+    def release_conn(self):
+        pass
+
+    def close(self):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_read_log():
+    kube_api = FakeKubeApi()
+    kube_api.core.read_namespaced_pod_log.return_value = FakeResponse(
+        b'2024-01-02T03:04:05Z line1\n2024-01-02T03:04:06Z line2\n'
+    )
+    async_api = kubernetes.AsyncKubeApi(kube_api=kube_api)
+    lines = [line async for line in async_api.follow_log('default', 'pod-1', follow=False)]
+    assert lines == ['line1', 'line2']
+    kwargs = kube_api.core.read_namespaced_pod_log.call_args.kwargs
+    assert kwargs['timestamps'] and kwargs['_preload_content'] is False
+
+
+@pytest.mark.asyncio
+async def test_merge_lines():
+    async def lines(*items):
+        for item in items:
+            await asyncio.sleep(0)
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+    merged = [
+        line async for line in kubernetes.merge_lines({'a: ': lines('1', '2'), 'b: ': lines('3')})
+    ]
+    assert sorted(merged) == ['a: 1', 'a: 2', 'b: 3']
+
+    with pytest.raises(ValueError):
+        async for _ in kubernetes.merge_lines({'a: ': lines('1', ValueError()), 'b: ': lines('2')}):
+            pass
@@ -0,0 +1,129 @@
+import pathlib
+
+import fsspec
+import pytest
+
+from infractl import wheelhouse
+
+
+def test_key(monkeypatch):
+    key = wheelhouse.key(['boto', 'pydantic>=2  # comment', ''])
+    assert key == wheelhouse.key(['pydantic >= 2', 'boto', 'boto'])
+    assert key != wheelhouse.key(['pydantic>=2'])
+    assert wheelhouse.key(['--extra-index-url https://example.com/#x']) != wheelhouse.key([])
+
+    monkeypatch.setenv('PIP_INDEX_URL', 'https://example.com/simple')
+    assert key != wheelhouse.key(['boto', 'pydantic>=2'])
+
+
+@pytest.fixture
+def pip(monkeypatch):
+    """Records pip calls, `pip wheel` creates a wheel for each requirement."""
+    calls = []
+
+    def run_pip(*args):
+        calls.append(args[0])
+        if args[0] == 'wheel':
+            wheel_dir = pathlib.Path(args[args.index('--wheel-dir') + 1])
+            for requirement in pathlib.Path(args[-1]).read_text().split():
+                (wheel_dir / f'{requirement}-1.0-py3-none-any.whl').write_bytes(b'wheel')
+        return True
+
+    monkeypatch.setattr(wheelhouse, '_pip', run_pip)
+    return calls
+
+
+def test_install(tmp_path: pathlib.Path, pip):
+    requirements_path = tmp_path / 'requirements.txt'
+    requirements_path.write_text('foo\nbar\n')
+    store_path = tmp_path / 'store'
+    get, put = wheelhouse.filesystem_store(fsspec.filesystem('file'), str(store_path))
+
+    assert not wheelhouse.install(requirements_path, get, put)
+    assert pip == ['wheel', 'install']
+    key = wheelhouse.key(['foo', 'bar'])
+    assert sorted(file.name for file in (store_path / key).iterdir()) == [
+        wheelhouse.MARKER_NAME,
+        'bar-1.0-py3-none-any.whl',
+        'foo-1.0-py3-none-any.whl',
+    ]
+
+    pip.clear()
+    assert wheelhouse.install(requirements_path, get, put)
+    assert pip == ['install']
+
+
+def test_install_incomplete(tmp_path: pathlib.Path, pip):
+    requirements_path = tmp_path / 'requirements.txt'
+    requirements_path.write_text('foo\n')
+    store_path = tmp_path / 'store'
+    (store_path / wheelhouse.key(['foo'])).mkdir(parents=True)
+    get, put = wheelhouse.filesystem_store(fsspec.filesystem('file'), str(store_path))
+
+    # a wheelhouse without the marker is rebuilt
+    assert not wheelhouse.install(requirements_path, get, put)
+    assert pip == ['wheel', 'install']
+
+
+def test_key_for_platform():
+    key = wheelhouse.key(['foo'], platform_tags=['python:3.11'], environment={})
+    assert key == wheelhouse.key(['foo'], platform_tags=['python:3.11'], environment={'FOO': '1'})
+    assert key != wheelhouse.key(['foo'], platform_tags=['python:3.12'], environment={})
+    assert key != wheelhouse.key(
+        ['foo'], platform_tags=['python:3.11'], environment={'PIP_PRE': '1'}
+    )
+
+
+def test_install_archive(tmp_path: pathlib.Path, pip):
+    requirements_path = tmp_path / 'requirements.txt'
+    requirements_path.write_text('foo\n')
+    archives = {}
+
+    def get(key: str, path: pathlib.Path):
+        if key in archives:
+            wheelhouse.unpack(archives[key], path)
+
+    def put(path: pathlib.Path, key: str):
+        archives[key] = wheelhouse.pack(path)
+
+    assert not wheelhouse.install(requirements_path, get, put, wheelhouse_key='key')
+    assert list(archives) == ['key']
+    assert wheelhouse.install(requirements_path, get, put, wheelhouse_key='key')
+    assert pip == ['wheel', 'install', 'install']
+
+
+def test_install_other_platform(tmp_path: pathlib.Path, pip, monkeypatch):
+    requirements_path = tmp_path / 'requirements.txt'
+    requirements_path.write_text('foo\n')
+    store_path = tmp_path / 'store'
+    get, put = wheelhouse.filesystem_store(fsspec.filesystem('file'), str(store_path))
+    assert not wheelhouse.install(requirements_path, get, put, wheelhouse_key='image')
+
+    # the same key for an interpreter with other tags, for example, after the image tag moves
+    monkeypatch.setattr(wheelhouse, 'tags', lambda: ['cpython-313', 'linux-aarch64', 'glibc-2.39'])
+    pip.clear()
+    assert not wheelhouse.install(requirements_path, get, put, wheelhouse_key='image')
+    assert pip == ['wheel', 'install']
+    marker = store_path / 'image' / wheelhouse.MARKER_NAME
+    assert marker.read_text().splitlines() == wheelhouse.tags()
+
+
+def test_install_without_put(tmp_path: pathlib.Path, pip):
+    requirements_path = tmp_path / 'requirements.txt'
+    requirements_path.write_text('foo\n')
+    archives = {}
+
+    def get(key: str, path: pathlib.Path):
+        if key in archives:
+            wheelhouse.unpack(archives[key], path)
+
+    def put(path: pathlib.Path, key: str):
+        archives[key] = wheelhouse.pack(path)
+
+    # a missing wheelhouse is built only by the runtime that can upload it
+    assert not wheelhouse.install(requirements_path, get, None, wheelhouse_key='key')
+    assert pip == ['install']
+    assert not wheelhouse.install(requirements_path, get, put, wheelhouse_key='key')
+    pip.clear()
+    assert wheelhouse.install(requirements_path, get, None, wheelhouse_key='key')
+    assert pip == ['install']
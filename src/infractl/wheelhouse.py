@@ -0,0 +1,248 @@
+"""Shared wheelhouse for runtime dependencies.
+
+Installs pip requirements in runtime from a wheelhouse in object storage. The wheelhouse is keyed by
+a hash of the normalized requirements, pip index settings and Python and platform tags of the
+runtime. The first runtime with a new key resolves and builds wheels for all requirements and
+uploads them, later runtimes install offline from the wheelhouse. The wheelhouse records the tags
+of the interpreter that built it, and a wheelhouse built for other tags is rebuilt, for example, if
+the key is computed from an image name outside of runtime and the image changes.
+
+This module is executed in runtime before dependencies are installed, so it must depend only on the
+standard library:
+
+    python wheelhouse.py requirements.txt --store s3://bucket/_wheelhouse \
+        --get-command "s3cmd get --recursive --force" --put-command "s3cmd put --force"
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import io
+import os
+import pathlib
+import platform
+import shlex
+import subprocess  # nosec B404
+import sys
+import sysconfig
+import tarfile
+import tempfile
+from typing import Callable, Dict, List, Optional
+
+# Requirements file name in deployment data
+REQUIREMENTS_NAME = 'requirements.txt'
+
+# Marker file with tags of the interpreter that built the wheels, which is uploaded after all
+# wheels, so a partially uploaded wheelhouse is not used
+MARKER_NAME = 'COMPLETE'
+
+# Environment variables with pip settings, which affect the resolved requirements
+PIP_ENVIRONMENT = ('PIP_INDEX_URL', 'PIP_EXTRA_INDEX_URL', 'PIP_FIND_LINKS', 'PIP_PRE')
+
+# Downloads the wheelhouse with the key to a local directory, does nothing if it does not exist.
+Get = Callable[[str, pathlib.Path], None]
+
+# Uploads a local directory to the wheelhouse with the key, the marker file must be uploaded last.
+Put = Callable[[pathlib.Path, str], None]
+
+
+def normalize(requirements: List[str]) -> List[str]:
+    """Returns sorted unique requirements without comments and whitespace."""
+    result = set()
+    for line in requirements:
+        line = line.split('#', 1)[0] if not line.lstrip().startswith('-') else line
+        line = ''.join(line.split())
+        if line:
+            result.add(line)
+    return sorted(result)
+
+
+def tags() -> List[str]:
+    """Returns Python and platform tags of the current interpreter."""
+    return [
+        sys.implementation.cache_tag or sys.implementation.name,
+        sysconfig.get_platform(),
+        '-'.join(platform.libc_ver()),
+    ]
+
+
+def key(
+    requirements: List[str],
+    platform_tags: Optional[List[str]] = None,
+    environment: Optional[Dict[str, str]] = None,
+) -> str:
+    """Returns the wheelhouse key for requirements.
+
+    Args:
+        requirements: pip requirements.
+        platform_tags: tags of the target platform, default is `tags()` of the current interpreter,
+            for example, an image name if the key is computed outside of runtime, then `install`
+            checks the tags of the interpreter.
+        environment: environment with pip settings, default is `os.environ`.
+    """
+    if platform_tags is None:
+        platform_tags = tags()
+    if environment is None:
+        environment = dict(os.environ)
+    data = [
+        *normalize(requirements),
+        *platform_tags,
+        *(f'{name}={environment.get(name, "")}' for name in PIP_ENVIRONMENT),
+    ]
+    return hashlib.sha256('\n'.join(data).encode('utf-8')).hexdigest()
+
+
+def _pip(*args: str) -> bool:
+    """Runs pip, returns True on success."""
+    process = subprocess.run(  # nosec B603
+        [sys.executable, '-m', 'pip', *args], stdout=sys.stdout, stderr=sys.stderr, check=False
+    )
+    return process.returncode == 0
+
+
+def install(
+    requirements_path: pathlib.Path,
+    get: Get,
+    put: Optional[Put],
+    wheelhouse_key: Optional[str] = None,
+) -> bool:
+    """Installs requirements from the wheelhouse, builds and uploads the wheelhouse if missing.
+
+    Returns True if the requirements are installed from an existing wheelhouse. Falls back to pip
+    install from the index if wheels cannot be built, or if the wheelhouse is missing and `put` is
+    None, so only one runtime builds it. The wheelhouse key is computed with `key` for the current
+    interpreter, if not specified.
+    """
+    requirements = requirements_path.read_text(encoding='utf-8').splitlines()
+    wheelhouse_key = wheelhouse_key or key(requirements)
+    with tempfile.TemporaryDirectory() as dirname:
+        wheel_dir = pathlib.Path(dirname) / 'wheels'
+        wheel_dir.mkdir()
+        get(wheelhouse_key, wheel_dir)
+        offline = ['install', '--no-index', '--find-links', str(wheel_dir), '-r']
+        marker = wheel_dir / MARKER_NAME
+        if marker.exists():
+            if marker.read_text(encoding='utf-8').splitlines() != tags():
+                print('[infractl.wheelhouse] Wheelhouse is built for another platform')
+            else:
+                print(f'[infractl.wheelhouse] Installing from wheelhouse {wheelhouse_key}')
+                if _pip(*offline, str(requirements_path)):
+                    return True
+                print('[infractl.wheelhouse] Wheelhouse is broken')
+            for file in wheel_dir.iterdir():
+                file.unlink()
+
+        if put is None:
+            print('[infractl.wheelhouse] Wheelhouse is built by another runtime, using the index')
+            if not _pip('install', '-r', str(requirements_path)):
+                raise RuntimeError(f'Cannot install requirements from {requirements_path}')
+            return False
+
+        print(f'[infractl.wheelhouse] Building wheelhouse {wheelhouse_key}')
+        if not _pip('wheel', '--wheel-dir', str(wheel_dir), '-r', str(requirements_path)):
+            print('[infractl.wheelhouse] Cannot build wheels, installing from the index')
+            if not _pip('install', '-r', str(requirements_path)):
+                raise RuntimeError(f'Cannot install requirements from {requirements_path}')
+            return False
+        if not _pip(*offline, str(requirements_path)):
+            raise RuntimeError(f'Cannot install requirements from {requirements_path}')
+
+        marker.write_text('\n'.join(tags()), encoding='utf-8')
+        put(wheel_dir, wheelhouse_key)
+    return False
+
+
+def pack(path: pathlib.Path) -> bytes:
+    """Returns an archive with files in a directory, to store a wheelhouse as a single object."""
+    data = io.BytesIO()
+    # wheels are compressed already
+    with tarfile.open(fileobj=data, mode='w') as archive:
+        for file in sorted(path.iterdir()):
+            archive.add(file, arcname=file.name)
+    return data.getvalue()
+
+
+def unpack(data: bytes, path: pathlib.Path):
+    """Extracts an archive created with `pack` to a directory."""
+    with tarfile.open(fileobj=io.BytesIO(data), mode='r') as archive:
+        for member in archive.getmembers():
+            # a wheelhouse is a flat directory of regular files
+            if not member.isfile() or member.name != pathlib.PurePath(member.name).name:
+                continue
+            source = archive.extractfile(member)
+            if source:
+                (path / member.name).write_bytes(source.read())
+
+
+def _marker_last(path: pathlib.Path) -> List[pathlib.Path]:
+    """Returns files in a directory, the marker file is the last one."""
+    return sorted(path.iterdir(), key=lambda file: (file.name == MARKER_NAME, file.name))
+
+
+def command_store(get_command: str, put_command: str, store: str) -> tuple[Get, Put]:
+    """Returns functions to download and upload a wheelhouse with commands, such as s3cmd.
+
+    The get command is called with a source and a target directory, with trailing slashes, the put
+    command is called for each file with a source file and a target URL.
+    """
+    store = store.rstrip('/')
+
+    def get(wheelhouse_key: str, path: pathlib.Path):
+        # a missing wheelhouse is not an error
+        subprocess.run(  # nosec B603
+            [*shlex.split(get_command), f'{store}/{wheelhouse_key}/', f'{path}/'],
+            stdout=subprocess.DEVNULL,
+            check=False,
+        )
+
+    def put(path: pathlib.Path, wheelhouse_key: str):
+        for file in _marker_last(path):
+            subprocess.run(  # nosec B603
+                [*shlex.split(put_command), str(file), f'{store}/{wheelhouse_key}/{file.name}'],
+                stdout=subprocess.DEVNULL,
+                check=True,
+            )
+
+    return get, put
+
+
+def filesystem_store(fs, store: str) -> tuple[Get, Put]:
+    """Returns functions to download and upload a wheelhouse with a fsspec file system."""
+    store = store.rstrip('/')
+
+    def get(wheelhouse_key: str, path: pathlib.Path):
+        if not fs.exists(f'{store}/{wheelhouse_key}/{MARKER_NAME}'):
+            return
+        for remote_path in fs.ls(f'{store}/{wheelhouse_key}', detail=False):
+            fs.get_file(remote_path, str(path / pathlib.PurePosixPath(remote_path).name))
+
+    def put(path: pathlib.Path, wheelhouse_key: str):
+        fs.makedirs(f'{store}/{wheelhouse_key}', exist_ok=True)
+        for file in _marker_last(path):
+            fs.put_file(str(file), f'{store}/{wheelhouse_key}/{file.name}')
+
+    return get, put
+
+
+def create_parser() -> argparse.ArgumentParser:
+    """Creates argument parser."""
+    parser = argparse.ArgumentParser(description='Installs requirements from a wheelhouse')
+    parser.add_argument('requirements', help='Requirements file')
+    parser.add_argument('--store', required=True, help='Wheelhouse store URL')
+    parser.add_argument(
+        '--get-command', required=True, help='Command to download a directory URL recursively'
+    )
+    parser.add_argument('--put-command', required=True, help='Command to upload a file')
+    return parser
+
+
+def main(argv: Optional[List[str]] = None):
+    """Entry point."""
+    args = create_parser().parse_args(argv)
+    get, put = command_store(args.get_command, args.put_command, args.store)
+    install(pathlib.Path(args.requirements), get, put)
+
+
+if __name__ == '__main__':
+    main()